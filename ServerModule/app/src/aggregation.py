@@ -0,0 +1,279 @@
+import heapq
+import math
+import time
+from typing import Hashable
+
+STRATEGY_MEAN = "mean"
+STRATEGY_MEDIAN = "median"
+STRATEGY_TRIMMED_MEAN = "trimmed_mean"
+STRATEGY_FRESHNESS = "freshness_weighted"
+
+STRATEGIES = (STRATEGY_MEAN, STRATEGY_MEDIAN, STRATEGY_TRIMMED_MEAN, STRATEGY_FRESHNESS)
+
+# Rebase the freshness weights before 2 ** exponent can overflow a float
+_MAX_WEIGHT_EXPONENT = 512
+
+
+class _LazyHeap:
+    """
+    Heap of floats that can also remove any value it holds. Removed values
+    are only counted, and dropped once they reach the top (or when they make
+    up most of the heap), so every operation is O(log n) amortized.
+    'sign' -1 makes it a max-heap.
+    """
+
+    def __init__(self, sign: int = 1):
+        self._sign = sign
+        self._heap: list[float] = []
+        self._removed: dict[float, int] = {}
+        self.size = 0
+        self.sum = 0.0
+
+    def push(self, value: float):
+        heapq.heappush(self._heap, self._sign * value)
+        self.size += 1
+        self.sum += value
+
+    def remove(self, value: float):
+        key = self._sign * value
+        self._removed[key] = self._removed.get(key, 0) + 1
+        self.size -= 1
+        self.sum -= value
+        if len(self._heap) > 2 * self.size + 16:
+            self._compact()
+
+    def top(self) -> float:
+        self._prune()
+        return self._sign * self._heap[0]
+
+    def pop(self) -> float:
+        self._prune()
+        value = self._sign * heapq.heappop(self._heap)
+        self.size -= 1
+        self.sum -= value
+        return value
+
+    def _take_removed(self, key: float) -> bool:
+        count = self._removed.get(key)
+        if not count:
+            return False
+        if count == 1:
+            del self._removed[key]
+        else:
+            self._removed[key] = count - 1
+        return True
+
+    def _prune(self):
+        heap = self._heap
+        while heap and self._removed and self._take_removed(heap[0]):
+            heapq.heappop(heap)
+
+    def _compact(self):
+        heap = [key for key in self._heap if not self._take_removed(key)]
+        heapq.heapify(heap)
+        self._heap = heap
+        self._removed = {}
+
+
+class _TrimmedSums:
+    """
+    Multiset of floats kept in three ordered parts: the smallest values, the
+    middle and the largest values, with a running sum per part. 'middle_mean'
+    moves values between the parts until 'trim' values are on each side, so
+    the trimmed mean (and the median, trimming all but the one or two middle
+    values) costs O(log n) amortized per change instead of a sort or a sum.
+    """
+
+    def __init__(self):
+        self._low = _LazyHeap(-1)
+        self._high = _LazyHeap(1)
+        # The middle part in two heaps, for its smallest and its largest value
+        self._mid_min = _LazyHeap(1)
+        self._mid_max = _LazyHeap(-1)
+
+    def add(self, value: float):
+        if self._low.size and value < self._low.top():
+            self._low.push(value)
+        elif self._high.size and value > self._high.top():
+            self._high.push(value)
+        else:
+            self._mid_min.push(value)
+            self._mid_max.push(value)
+
+    def discard(self, value: float):
+        # Parts are ordered, so a value equal to a part's boundary can be taken from that part
+        if self._low.size and value <= self._low.top():
+            self._low.remove(value)
+        elif self._high.size and value >= self._high.top():
+            self._high.remove(value)
+        else:
+            self._mid_min.remove(value)
+            self._mid_max.remove(value)
+
+    def middle_mean(self, trim: int) -> float:
+        """Mean of the values left after dropping the 'trim' smallest and largest (needs more than 2 * trim)."""
+        low, high, mid_min, mid_max = self._low, self._high, self._mid_min, self._mid_max
+        while low.size > trim:
+            value = low.pop()
+            mid_min.push(value)
+            mid_max.push(value)
+        while high.size > trim:
+            value = high.pop()
+            mid_min.push(value)
+            mid_max.push(value)
+        while low.size < trim:
+            value = mid_min.pop()
+            mid_max.remove(value)
+            low.push(value)
+        while high.size < trim:
+            value = mid_max.pop()
+            mid_min.remove(value)
+            high.push(value)
+        return mid_min.sum / mid_min.size
+
+
+class MetricAggregator:
+    """
+    Merges the latest reading of every sensor of one plant metric.
+    Each source contributes only its newest value; readings older than
+    'max_age_seconds' are dropped. Updates are O(1) for the mean and the
+    freshness-weighted mean (running sums) and O(log n) amortized for the
+    median / trimmed mean (ordered heaps with running sums, see _TrimmedSums).
+    The merged value is only recomputed after a source changed.
+    Freshness weights halve every 'half_life_seconds'; they are stored
+    relative to a reference time, so ageing all readings never has to touch
+    every source.
+    """
+
+    def __init__(
+            self,
+            strategy: str = STRATEGY_MEAN,
+            max_age_seconds: float = 900.0,
+            trim_fraction: float = 0.1,
+            half_life_seconds: float = 300.0,
+        ):
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown aggregation strategy: {strategy}")
+        self.strategy = strategy
+        self.max_age = max_age_seconds
+        self.trim_fraction = trim_fraction
+        self.half_life = half_life_seconds
+
+        self._latest: dict[Hashable, tuple[float, float]] = {}
+        self._expiry: list[tuple[float, Hashable]] = []
+
+        self._sum = 0.0
+        self._ordered = _TrimmedSums()
+
+        self._reference: float | None = None
+        self._weight_sum = 0.0
+        self._weighted_sum = 0.0
+
+        # Merged value as of the last change; None with no sources
+        self._value: float | None = None
+        self._changed = False
+
+    def __len__(self) -> int:
+        return len(self._latest)
+
+    def _weight(self, ts: float) -> float:
+        return 2.0 ** ((ts - self._reference) / self.half_life)
+
+    def _rebase(self, reference: float):
+        self._reference = reference
+        self._weight_sum = 0.0
+        self._weighted_sum = 0.0
+        for ts, value in self._latest.values():
+            weight = self._weight(ts)
+            self._weight_sum += weight
+            self._weighted_sum += weight * value
+
+    def _add(self, ts: float, value: float):
+        self._changed = True
+        if self.strategy == STRATEGY_MEAN:
+            self._sum += value
+        elif self.strategy == STRATEGY_FRESHNESS:
+            if self._reference is None:
+                self._reference = ts
+            elif (ts - self._reference) / self.half_life > _MAX_WEIGHT_EXPONENT:
+                self._rebase(ts)
+            weight = self._weight(ts)
+            self._weight_sum += weight
+            self._weighted_sum += weight * value
+        else:
+            self._ordered.add(value)
+
+    def _discard(self, ts: float, value: float):
+        self._changed = True
+        if self.strategy == STRATEGY_MEAN:
+            self._sum -= value
+        elif self.strategy == STRATEGY_FRESHNESS:
+            weight = self._weight(ts)
+            self._weight_sum -= weight
+            self._weighted_sum -= weight * value
+        else:
+            self._ordered.discard(value)
+
+        if not self._latest:
+            # Reset running sums whenever the aggregator empties, so rounding errors do not pile up
+            self._sum = 0.0
+            self._ordered = _TrimmedSums()
+            self._reference = None
+            self._weight_sum = 0.0
+            self._weighted_sum = 0.0
+
+    def expire(self, now: float):
+        """Drop sources whose latest reading is older than max_age."""
+        cutoff = now - self.max_age
+        while self._expiry and self._expiry[0][0] < cutoff:
+            ts, source = heapq.heappop(self._expiry)
+            current = self._latest.get(source)
+            if current is None or current[0] != ts:
+                # Superseded by a newer reading from the same source
+                continue
+            del self._latest[source]
+            self._discard(*current)
+
+    def update(self, source: Hashable, value: float, ts: float | None = None) -> float | None:
+        """Store the newest reading of 'source' and return the merged value."""
+        ts = time.time() if ts is None else ts
+        previous = self._latest.get(source)
+        if previous is not None:
+            if ts < previous[0]:
+                # Out-of-order reading, the source already reported something newer
+                return self.value(ts)
+            del self._latest[source]
+            self._discard(*previous)
+
+        self._latest[source] = (ts, value)
+        self._add(ts, value)
+        heapq.heappush(self._expiry, (ts, source))
+        if len(self._expiry) > 4 * len(self._latest) + 16:
+            # Compact superseded expiry entries
+            self._expiry = [(ts, src) for src, (ts, _) in self._latest.items()]
+            heapq.heapify(self._expiry)
+        return self.value(ts)
+
+    def value(self, now: float | None = None) -> float | None:
+        """The merged value of all fresh sources, None if there are none."""
+        self.expire(time.time() if now is None else now)
+        if self._changed:
+            self._value = self._merge()
+            self._changed = False
+        return self._value
+
+    def _merge(self) -> float | None:
+        count = len(self._latest)
+        if count == 0:
+            return None
+
+        if self.strategy == STRATEGY_MEAN:
+            return self._sum / count
+        if self.strategy == STRATEGY_FRESHNESS:
+            return self._weighted_sum / self._weight_sum
+        if self.strategy == STRATEGY_MEDIAN:
+            # Trim all but the middle value (odd count) or the two middle values
+            return self._ordered.middle_mean((count - 1) // 2)
+
+        trim = int(math.floor(count * self.trim_fraction))
+        return self._ordered.middle_mean(trim if count - 2 * trim > 0 else 0)
@@ -0,0 +1,427 @@
+import operator
+import sys
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+
+# Values of AlertRule.rule_type, the same as db.base.AlertRuleTypeEnum (the server
+# image does not ship the db package; db/scripts/test_db_module.py checks they match)
+RULE_THRESHOLD = "threshold"
+RULE_WINDOW_AVERAGE = "window_average"
+RULE_RATE_OF_CHANGE = "rate_of_change"
+RULE_TIME_OUT_OF_RANGE = "time_out_of_range"
+RULE_NO_DATA = "no_data"
+RULE_TYPES = (RULE_THRESHOLD, RULE_WINDOW_AVERAGE, RULE_RATE_OF_CHANGE, RULE_TIME_OUT_OF_RANGE, RULE_NO_DATA)
+
+OPERATORS = {
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "==": operator.eq,
+    "!=": operator.ne,
+}
+
+# Every window is split into this many time buckets, so memory per series
+# stays constant no matter how often a device reports.
+DEFAULT_BUCKETS = 60
+DEFAULT_MAX_SERIES = 100_000
+# WindowAggregate re-centres its regression sums once readings are this many
+# windows past the origin, before the squared offsets lose precision
+REBASE_WINDOWS = 16
+
+
+@dataclass(frozen=True)
+class WindowRule:
+    """Runtime copy of an AlertRule, bound to the device that feeds it."""
+    id: int
+    device_id: int
+    rule_type: str
+    condition_operator: str
+    threshold_value: float
+    window_minutes: int | None = None
+    duration_minutes: int | None = None
+
+    @classmethod
+    def from_alert_rule(cls, rule, device_id: int):
+        """Build a WindowRule from a db.AlertRule row."""
+        return cls(
+            id=rule.id,
+            device_id=device_id,
+            rule_type=rule.rule_type,
+            condition_operator=rule.condition_operator,
+            threshold_value=rule.threshold_value,
+            window_minutes=rule.window_minutes,
+            duration_minutes=rule.duration_minutes,
+        )
+
+    @property
+    def window_seconds(self) -> float:
+        return (self.window_minutes or 0) * 60.0
+
+    def series_key(self) -> tuple | None:
+        """Key of the aggregate this rule reads, shared between rules where possible."""
+        if self.rule_type in (RULE_WINDOW_AVERAGE, RULE_RATE_OF_CHANGE):
+            return (self.device_id, self.window_seconds)
+        if self.rule_type == RULE_TIME_OUT_OF_RANGE:
+            return (self.device_id, self.window_seconds, self.condition_operator, self.threshold_value)
+        return None
+
+
+@dataclass(frozen=True)
+class RuleResult:
+    rule: WindowRule
+    value: float
+    timestamp: float
+
+
+class _BucketRing(ABC):
+    """
+    Fixed ring of time buckets covering the last 'window_seconds'.
+    Subclasses keep their per-bucket sums in parallel lists and clear a slot
+    in '_clear' when its bucket falls out of the window.
+    """
+
+    def __init__(self, window_seconds: float, buckets: int = DEFAULT_BUCKETS):
+        if window_seconds <= 0:
+            raise ValueError("window_seconds must be positive")
+        self.window = float(window_seconds)
+        self.size = buckets
+        self.width = self.window / buckets
+        self._ids = [-1] * buckets
+        self._head: int | None = None
+
+    @abstractmethod
+    def _clear(self, slot: int):
+        pass
+
+    def _bucket_id(self, ts: float) -> int:
+        return int(ts // self.width)
+
+    def _advance(self, bucket_id: int):
+        """Move the head forward, clearing at most 'size' expired buckets."""
+        if self._head is not None and bucket_id <= self._head:
+            return
+        start = bucket_id - self.size + 1
+        if self._head is not None:
+            start = max(start, self._head + 1)
+        for bid in range(start, bucket_id + 1):
+            slot = bid % self.size
+            self._clear(slot)
+            self._ids[slot] = bid
+        self._head = bucket_id
+
+    def _slot(self, bucket_id: int) -> int | None:
+        """Slot of a bucket that is still inside the window, else None."""
+        if self._head is None or bucket_id <= self._head - self.size:
+            return None
+        return bucket_id % self.size
+
+    def expire(self, now: float):
+        self._advance(self._bucket_id(now))
+
+    def nbytes(self) -> int:
+        size = sys.getsizeof(self)
+        for value in vars(self).values():
+            if isinstance(value, list):
+                size += sys.getsizeof(value)
+        return size
+
+
+class WindowAggregate(_BucketRing):
+    """
+    Running count/sum and least-squares sums for one (device, window) series.
+    Times inside a bucket are stored relative to the bucket start, and the
+    window totals relative to an origin that is moved up every REBASE_WINDOWS
+    windows, to keep the regression sums numerically stable.
+    """
+
+    def __init__(self, window_seconds: float, buckets: int = DEFAULT_BUCKETS):
+        super().__init__(window_seconds, buckets)
+        self._count = [0] * buckets
+        self._sum_v = [0.0] * buckets
+        self._sum_t = [0.0] * buckets
+        self._sum_tt = [0.0] * buckets
+        self._sum_tv = [0.0] * buckets
+        self.count = 0
+        self.total = 0.0
+        # Window totals of x = t - origin: sum x, sum x^2, sum x*v
+        self._origin: float | None = None
+        self._sx = 0.0
+        self._sxx = 0.0
+        self._sxv = 0.0
+
+    def _bucket_sums(self, slot: int) -> tuple[float, float, float]:
+        """(sum x, sum x^2, sum x*v) of one bucket relative to the origin."""
+        offset = self._ids[slot] * self.width - self._origin
+        count = self._count[slot]
+        sum_t = self._sum_t[slot]
+        return (
+            offset * count + sum_t,
+            offset * offset * count + 2 * offset * sum_t + self._sum_tt[slot],
+            offset * self._sum_v[slot] + self._sum_tv[slot],
+        )
+
+    def _clear(self, slot: int):
+        if self._count[slot]:
+            sx, sxx, sxv = self._bucket_sums(slot)
+            self._sx -= sx
+            self._sxx -= sxx
+            self._sxv -= sxv
+        self.count -= self._count[slot]
+        self.total -= self._sum_v[slot]
+        self._count[slot] = 0
+        self._sum_v[slot] = 0.0
+        self._sum_t[slot] = 0.0
+        self._sum_tt[slot] = 0.0
+        self._sum_tv[slot] = 0.0
+        if self.count == 0:
+            # Drop accumulated rounding error whenever the window empties
+            self.total = 0.0
+            self._sx = self._sxx = self._sxv = 0.0
+
+    def _rebase(self):
+        """Move the origin to the start of the window and recompute the totals from the buckets."""
+        self._origin = (self._head - self.size + 1) * self.width
+        self._sx = self._sxx = self._sxv = 0.0
+        for slot in range(self.size):
+            if self._count[slot]:
+                sx, sxx, sxv = self._bucket_sums(slot)
+                self._sx += sx
+                self._sxx += sxx
+                self._sxv += sxv
+
+    def add(self, ts: float, value: float):
+        bucket_id = self._bucket_id(ts)
+        self._advance(bucket_id)
+        slot = self._slot(bucket_id)
+        if slot is None:
+            # Reading older than the window
+            return
+        if self._origin is None or self.count == 0 or ts - self._origin > REBASE_WINDOWS * self.window:
+            self._rebase()
+
+        dt = ts - bucket_id * self.width
+        self._count[slot] += 1
+        self._sum_v[slot] += value
+        self._sum_t[slot] += dt
+        self._sum_tt[slot] += dt * dt
+        self._sum_tv[slot] += dt * value
+        self.count += 1
+        self.total += value
+
+        x = ts - self._origin
+        self._sx += x
+        self._sxx += x * x
+        self._sxv += x * value
+
+    def mean(self) -> float | None:
+        if self.count == 0:
+            return None
+        return self.total / self.count
+
+    def slope_per_hour(self) -> float | None:
+        """Least-squares slope of the readings in the window, in units per hour."""
+        if self.count < 2:
+            return None
+        n = self.count
+        denominator = n * self._sxx - self._sx * self._sx
+        # Readings (almost) all at the same instant: no slope
+        if denominator <= 1e-9 * n * self._sxx:
+            return None
+        return (n * self._sxv - self._sx * self.total) / denominator * 3600.0
+
+
+class OutOfRangeAggregate(_BucketRing):
+    """Seconds spent out of range within the window for one (device, window, condition)."""
+
+    def __init__(self, window_seconds: float, condition, threshold: float, buckets: int = DEFAULT_BUCKETS):
+        super().__init__(window_seconds, buckets)
+        self._condition = condition
+        self._threshold = threshold
+        self._seconds = [0.0] * buckets
+        self.total = 0.0
+        self.last_ts: float | None = None
+        self.last_out = False
+
+    def _clear(self, slot: int):
+        self.total -= self._seconds[slot]
+        self._seconds[slot] = 0.0
+
+    def _add_span(self, start: float, end: float):
+        """Spread an out-of-range span over the buckets it covers (at most 'size')."""
+        start = max(start, end - self.window)
+        self._advance(self._bucket_id(end))
+        for bucket_id in range(self._bucket_id(start), self._bucket_id(end) + 1):
+            slot = self._slot(bucket_id)
+            if slot is None:
+                continue
+            lo = max(start, bucket_id * self.width)
+            hi = min(end, (bucket_id + 1) * self.width)
+            if hi > lo:
+                self._seconds[slot] += hi - lo
+                self.total += hi - lo
+
+    def add(self, ts: float, value: float):
+        if self.last_ts is not None and ts <= self.last_ts:
+            # Out-of-order readings cannot be placed on the timeline
+            return
+        if self.last_out:
+            self._add_span(self.last_ts, ts)
+        else:
+            self._advance(self._bucket_id(ts))
+        self.last_ts = ts
+        self.last_out = self._condition(value, self._threshold)
+
+    def seconds_out_of_range(self, now: float) -> float:
+        self.expire(now)
+        seconds = self.total
+        if self.last_out and now > self.last_ts:
+            # The current out-of-range stretch has not been closed by a reading yet
+            seconds += min(now - self.last_ts, self.window)
+        return min(seconds, self.window)
+
+
+class WindowRuleEngine:
+    """
+    Evaluates AlertRules for incoming readings from in-memory aggregates.
+    Aggregates are kept per (device, window) and shared between rules, so a
+    reading costs O(1) per series instead of a 'sensor_data' history query.
+    Only devices with rules are tracked, and add_rule refuses rules that would
+    need more than 'max_series' series, so memory is bounded without ever
+    dropping (and silently resetting) the window of an active rule.
+    """
+
+    def __init__(self, buckets: int = DEFAULT_BUCKETS, max_series: int = DEFAULT_MAX_SERIES):
+        self._buckets = buckets
+        self._max_series = max_series
+
+        self._rules: dict[int, WindowRule] = {}
+        self._rules_by_device: dict[int, list[WindowRule]] = {}
+        self._keys_by_device: dict[int, list[tuple]] = {}
+        self._series: dict[tuple, _BucketRing] = {}
+        self._series_count = 0
+        self._last_seen: dict[int, float] = {}
+
+        self._started = time.time()
+
+    def add_rule(self, rule: WindowRule):
+        if rule.rule_type not in RULE_TYPES:
+            raise ValueError(f"Unknown rule type: {rule.rule_type}")
+        if rule.condition_operator not in OPERATORS:
+            raise ValueError(f"Unknown condition operator: {rule.condition_operator}")
+        if rule.rule_type != RULE_THRESHOLD and not rule.window_minutes:
+            raise ValueError(f"Rule type {rule.rule_type} requires window_minutes")
+        key = rule.series_key()
+        new_series = key is not None and key not in self._keys_by_device.get(rule.device_id, [])
+        if new_series and self._series_count >= self._max_series:
+            raise ValueError(f"Too many rule series (max_series={self._max_series})")
+
+        self.remove_rule(rule.id)
+        self._rules[rule.id] = rule
+        self._rules_by_device.setdefault(rule.device_id, []).append(rule)
+        self._reindex_device(rule.device_id)
+
+    def remove_rule(self, rule_id: int):
+        rule = self._rules.pop(rule_id, None)
+        if rule is None:
+            return
+        device_rules = [r for r in self._rules_by_device.get(rule.device_id, []) if r.id != rule_id]
+        if device_rules:
+            self._rules_by_device[rule.device_id] = device_rules
+        else:
+            self._rules_by_device.pop(rule.device_id, None)
+            self._last_seen.pop(rule.device_id, None)
+        self._reindex_device(rule.device_id)
+
+    def _reindex_device(self, device_id: int):
+        keys = []
+        for rule in self._rules_by_device.get(device_id, []):
+            key = rule.series_key()
+            if key is not None and key not in keys:
+                keys.append(key)
+
+        previous = self._keys_by_device.get(device_id, [])
+        for key in set(previous) - set(keys):
+            self._series.pop(key, None)
+        self._series_count += len(keys) - len(previous)
+
+        if keys:
+            self._keys_by_device[device_id] = keys
+        else:
+            self._keys_by_device.pop(device_id, None)
+
+    def _get_series(self, key: tuple) -> _BucketRing:
+        # Created on the first reading; at most one per key of _keys_by_device
+        series = self._series.get(key)
+        if series is not None:
+            return series
+
+        if len(key) == 2:
+            series = WindowAggregate(key[1], self._buckets)
+        else:
+            _, window, op, threshold = key
+            series = OutOfRangeAggregate(window, OPERATORS[op], threshold, self._buckets)
+        self._series[key] = series
+        return series
+
+    def record(self, device_id: int, value: float, ts: float | None = None) -> list[RuleResult]:
+        """Feed one reading and return the rules it triggered."""
+        rules = self._rules_by_device.get(device_id)
+        if not rules:
+            return []
+
+        ts = time.time() if ts is None else ts
+        self._last_seen[device_id] = max(ts, self._last_seen.get(device_id, ts))
+
+        for key in self._keys_by_device.get(device_id, []):
+            self._get_series(key).add(ts, value)
+
+        results = []
+        for rule in rules:
+            observed = self._observe(rule, value, ts)
+            if observed is None:
+                continue
+            if self._is_triggered(rule, observed):
+                results.append(RuleResult(rule, observed, ts))
+        return results
+
+    def check_no_data(self, now: float | None = None) -> list[RuleResult]:
+        """Return 'no_data' rules whose device has been silent for the whole window."""
+        now = time.time() if now is None else now
+        results = []
+        for rule in self._rules.values():
+            if rule.rule_type != RULE_NO_DATA:
+                continue
+            silent_for = now - self._last_seen.get(rule.device_id, self._started)
+            if silent_for >= rule.window_seconds:
+                results.append(RuleResult(rule, silent_for, now))
+        return results
+
+    def _observe(self, rule: WindowRule, value: float, ts: float) -> float | None:
+        if rule.rule_type == RULE_THRESHOLD:
+            return value
+        if rule.rule_type == RULE_WINDOW_AVERAGE:
+            return self._get_series(rule.series_key()).mean()
+        if rule.rule_type == RULE_RATE_OF_CHANGE:
+            return self._get_series(rule.series_key()).slope_per_hour()
+        if rule.rule_type == RULE_TIME_OUT_OF_RANGE:
+            return self._get_series(rule.series_key()).seconds_out_of_range(ts)
+        return None
+
+    def _is_triggered(self, rule: WindowRule, observed: float) -> bool:
+        if rule.rule_type == RULE_TIME_OUT_OF_RANGE:
+            return observed >= (rule.duration_minutes or 0) * 60.0
+        return OPERATORS[rule.condition_operator](observed, rule.threshold_value)
+
+    def memory_usage(self) -> dict:
+        """Approximate memory held by the aggregates."""
+        series_bytes = sum(series.nbytes() for series in self._series.values())
+        return {
+            "rules": len(self._rules),
+            "series": len(self._series),
+            "max_series": self._max_series,
+            "buckets_per_series": self._buckets,
+            "series_bytes": series_bytes,
+            "last_seen_bytes": sys.getsizeof(self._last_seen),
+        }
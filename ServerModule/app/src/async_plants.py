@@ -0,0 +1,201 @@
+import asyncio
+import heapq
+import itertools
+import random
+import time
+
+from plants import Plant
+from logger import Logger
+
+
+class ConcurrencyLimits:
+    """
+    One semaphore per actuator type (metric name, plus "alert" for alert sends).
+    Types without an explicit limit share the default size.
+    """
+
+    def __init__(self, limits: dict[str, int] | None = None, default: int = 64):
+        self._limits = dict(limits or {})
+        self._default = default
+        self._semaphores: dict[str, asyncio.Semaphore] = {}
+
+    def get(self, key: str) -> asyncio.Semaphore:
+        semaphore = self._semaphores.get(key)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self._limits.get(key, self._default))
+            self._semaphores[key] = semaphore
+        return semaphore
+
+
+class AsyncPlantManager:
+    """
+    asyncio counterpart of PlantThreadManager.
+    A single dispatcher coroutine keeps every plant's next due time in a heap
+    and starts one short-lived task per due plant, so hundreds of thousands of
+    plants share one event loop and device commands never hold an OS thread.
+    """
+
+    def __init__(
+            self,
+            plants: list[Plant] = None,
+            interval_seconds: int = 300,
+            actuator_limits: dict[str, int] | None = None,
+            default_actuator_limit: int = 64,
+            max_concurrent_cycles: int = 10_000,
+            jitter: float = 0.1,
+        ):
+        self._interval = interval_seconds
+        self._intervals: dict[str, float] = {}
+        self._jitter = jitter
+        self._max_concurrent_cycles = max_concurrent_cycles
+        self._limits = ConcurrencyLimits(actuator_limits, default_actuator_limit)
+
+        self._heap: list[tuple[float, int, Plant]] = []
+        self._scheduled: dict[Plant, float] = {}
+        self._seq = itertools.count()
+        self._running: dict[Plant, asyncio.Task] = {}
+
+        self._wakeup: asyncio.Event | None = None
+        self._cycle_slots: asyncio.Semaphore | None = None
+        self._dispatcher: asyncio.Task | None = None
+
+        self.runs = 0
+        self.skipped = 0
+        self.overruns = 0
+        self.errors = 0
+
+        self.logger = Logger(name="AsyncPlantManager")
+
+        for plant in plants or []:
+            self.add_plant(plant)
+
+    def add_plant(self, plant: Plant, interval_seconds: float | None = None, delay: float | None = None):
+        """Add a plant to be managed. The first cycle is spread over one interval unless 'delay' is given."""
+        if interval_seconds is not None:
+            self._intervals[plant.id] = interval_seconds
+        interval = self._intervals.get(plant.id, self._interval)
+        if delay is None:
+            delay = random.uniform(0, interval)
+        self._push(plant, time.monotonic() + delay)
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def remove_plant(self, plant: Plant):
+        """Remove a plant from being managed. Its heap entry is dropped lazily."""
+        self._scheduled.pop(plant, None)
+        self._intervals.pop(plant.id, None)
+
+    def _push(self, plant: Plant, due: float):
+        self._scheduled[plant] = due
+        heapq.heappush(self._heap, (due, next(self._seq), plant))
+
+    async def start(self):
+        """Start the dispatcher on the running event loop (if not already running)."""
+        if self._dispatcher and not self._dispatcher.done():
+            return
+        self._wakeup = asyncio.Event()
+        self._cycle_slots = asyncio.Semaphore(self._max_concurrent_cycles)
+        self._dispatcher = asyncio.create_task(self._dispatch_loop())
+
+    async def stop(self, timeout: float | None = None):
+        """
+        Stop dispatching, give the cycles in progress 'timeout' seconds to
+        finish, then cancel the rest and wait until they are unwound.
+        """
+        if self._dispatcher:
+            self._dispatcher.cancel()
+            await asyncio.gather(self._dispatcher, return_exceptions=True)
+            self._dispatcher = None
+
+        pending = list(self._running.values())
+        if not pending:
+            return
+        _, still_running = await asyncio.wait(pending, timeout=timeout)
+        for task in still_running:
+            task.cancel()
+        await asyncio.gather(*still_running, return_exceptions=True)
+
+    async def _dispatch_loop(self):
+        while True:
+            if not self._heap:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            wait = self._heap[0][0] - time.monotonic()
+            if wait > 0:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), wait)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            now = time.monotonic()
+            while self._heap and self._heap[0][0] <= now:
+                due, _, plant = heapq.heappop(self._heap)
+                if self._scheduled.get(plant) != due:
+                    # Removed or re-scheduled since this entry was pushed
+                    continue
+
+                interval = self._intervals.get(plant.id, self._interval)
+                next_due = due + interval + random.uniform(-self._jitter, self._jitter) * interval / 2
+                self._push(plant, next_due if next_due > now else now + interval)
+
+                if plant in self._running:
+                    self.skipped += 1
+                    self.logger.warning(f"Plant {plant.id} is still running, skipped this cycle.")
+                    continue
+
+                await self._cycle_slots.acquire()
+                task = asyncio.create_task(self._run_keep_alive_once(plant, interval))
+                self._running[plant] = task
+
+    async def _run_keep_alive_once(self, plant: Plant, interval: float):
+        """
+        Wrapper so that any exception in keep_alive is caught and doesn't kill
+        the dispatcher.
+        """
+        started = time.monotonic()
+        try:
+            if getattr(plant, "keep_alive", False):
+                await plant.keep_alive_cycle_async(self._limits)
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            self.errors += 1
+            self.logger.error(f"Error in keep_alive for plant {plant.id}: {exc}")
+        finally:
+            self._running.pop(plant, None)
+            self._cycle_slots.release()
+            self.runs += 1
+
+        duration = time.monotonic() - started
+        if duration > interval:
+            self.overruns += 1
+            self.logger.warning(f"Plant {plant.id} took {duration:.3f}s, longer than its {interval}s interval.")
+
+    async def run_cycle_once(self, plants: list[Plant] | None = None):
+        """Run one care cycle for the given (default: all managed) plants concurrently."""
+        plants = list(self._scheduled) if plants is None else plants
+        if self._cycle_slots is None:
+            self._cycle_slots = asyncio.Semaphore(self._max_concurrent_cycles)
+
+        interval = self._interval
+        tasks = []
+        for plant in plants:
+            await self._cycle_slots.acquire()
+            task = asyncio.create_task(self._run_keep_alive_once(plant, interval))
+            self._running[plant] = task
+            tasks.append(task)
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {
+            "plants": len(self._scheduled),
+            "running": len(self._running),
+            "runs": self.runs,
+            "skipped": self.skipped,
+            "overruns": self.overruns,
+            "errors": self.errors,
+        }
@@ -0,0 +1,175 @@
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+
+from logger import Logger
+from scheduler import WorkerPoolScheduler
+
+MERGE_LATEST = "latest"
+MERGE_SUM = "sum"
+
+
+@dataclass(frozen=True)
+class CommandPolicy:
+    """
+    How commands to one actuator are shaped.
+    'latest' merging keeps only the newest delta of a window (every evaluation
+    reports the whole remaining gap, so older deltas are superseded); 'sum'
+    adds them up for actuators that take incremental steps.
+    """
+    merge_window_seconds: float = 5.0
+    min_interval_seconds: float = 30.0
+    max_duty_cycle: float = 1.0
+    duty_period_seconds: float = 3600.0
+    command_seconds: float = 10.0
+    merge: str = MERGE_LATEST
+
+    @property
+    def commands_per_period(self) -> int:
+        """How many commands fit in one duty period without exceeding max_duty_cycle."""
+        return max(1, int(self.max_duty_cycle * self.duty_period_seconds / self.command_seconds))
+
+
+class ActuatorCommandQueue:
+    """The pending command of one (actuator, metric) pair."""
+
+    def __init__(self, device, metric: str, policy: CommandPolicy):
+        self.device = device
+        self.metric = metric
+        self._policy = policy
+        self._lock = threading.Lock()
+
+        self._pending: float | None = None
+        self._window_end = 0.0
+        self._last_issued: float | None = None
+        self._issued_at: deque[float] = deque()
+
+        self.requested = 0
+        self.issued = 0
+        self.superseded = 0
+        self.merged = 0
+        self.deferred = 0
+
+    def _due(self, now: float) -> float:
+        policy = self._policy
+        due = self._window_end
+        if self._last_issued is not None:
+            due = max(due, self._last_issued + policy.min_interval_seconds)
+
+        while self._issued_at and self._issued_at[0] <= now - policy.duty_period_seconds:
+            self._issued_at.popleft()
+        if len(self._issued_at) >= policy.commands_per_period:
+            # Wait until the oldest command leaves the duty period
+            due = max(due, self._issued_at[0] + policy.duty_period_seconds)
+        return due
+
+    def submit(self, delta: float, now: float) -> float:
+        """Queue a requested delta and return when it may be issued."""
+        with self._lock:
+            self.requested += 1
+            if self._pending is None:
+                self._pending = delta
+                self._window_end = now + self._policy.merge_window_seconds
+            elif self._policy.merge == MERGE_SUM:
+                self._pending += delta
+                self.merged += 1
+            else:
+                self._pending = delta
+                self.superseded += 1
+            return self._due(now)
+
+    def flush(self, now: float) -> float | None:
+        """
+        Issue the pending command if it is due. Returns the time to try again
+        if it is still held back, None otherwise.
+        """
+        with self._lock:
+            if self._pending is None:
+                return None
+            due = self._due(now)
+            if due > now:
+                self.deferred += 1
+                return due
+
+            delta = self._pending
+            self._pending = None
+            self._last_issued = now
+            self._issued_at.append(now)
+            self.issued += 1
+
+        getattr(self.device, f"change_{self.metric}")(delta)
+        return None
+
+
+class CommandDispatcher:
+    """
+    Shapes actuator commands for many DeviceCollections.
+    DeviceCollection.send_command hands each per-device delta to 'submit'; the
+    merged command is issued later from a one-shot job on the scheduler.
+    """
+
+    def __init__(self, policy: CommandPolicy | None = None, scheduler: WorkerPoolScheduler | None = None):
+        self.policy = policy or CommandPolicy()
+        self._own_scheduler = scheduler is None
+        if scheduler is None:
+            scheduler = WorkerPoolScheduler(workers=2, spread_start=False, name="CommandDispatcher")
+        self._scheduler = scheduler
+        self._queues: dict[tuple[int, str], ActuatorCommandQueue] = {}
+        self._lock = threading.Lock()
+        self.logger = Logger(name="CommandDispatcher")
+
+    def start(self):
+        """Start the dispatcher's own scheduler (no-op when it shares one)."""
+        if self._own_scheduler:
+            self._scheduler.start()
+
+    def stop(self):
+        if self._own_scheduler:
+            self._scheduler.stop()
+
+    def _queue_for(self, device, metric: str) -> ActuatorCommandQueue:
+        key = (id(device), metric)
+        queue = self._queues.get(key)
+        if queue is None:
+            with self._lock:
+                queue = self._queues.setdefault(key, ActuatorCommandQueue(device, metric, self.policy))
+        return queue
+
+    def forget_device(self, device):
+        """Drop the queues of a removed device (its pending commands are discarded)."""
+        with self._lock:
+            for key in [key for key in self._queues if key[0] == id(device)]:
+                self._queues.pop(key)
+                self._scheduler.unschedule(("command",) + key)
+
+    def submit(self, device, metric: str, delta: float):
+        queue = self._queue_for(device, metric)
+        now = time.monotonic()
+        due = queue.submit(delta, now)
+        self._scheduler.schedule_once(
+            ("command", id(device), metric), lambda: self._flush(queue), max(0.0, due - now)
+        )
+
+    def _flush(self, queue: ActuatorCommandQueue):
+        now = time.monotonic()
+        try:
+            retry_at = queue.flush(now)
+        except Exception as exc:
+            self.logger.error(f"Command change_{queue.metric} failed on {queue.device!r}: {exc}")
+            return
+        if retry_at is not None:
+            self._scheduler.schedule_once(
+                ("command", id(queue.device), queue.metric), lambda: self._flush(queue), retry_at - now
+            )
+
+    def stats(self) -> dict:
+        queues = list(self._queues.values())
+        return {
+            "actuators": len(queues),
+            "requested": sum(q.requested for q in queues),
+            "issued": sum(q.issued for q in queues),
+            "superseded": sum(q.superseded for q in queues),
+            "merged": sum(q.merged for q in queues),
+            "deferred": sum(q.deferred for q in queues),
+        }
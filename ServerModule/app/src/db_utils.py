@@ -4,7 +4,7 @@ import psycopg2
 from psycopg2._psycopg import cursor
 from contextlib import contextmanager
 
-from measurements import Brightness, Moisture
+from measurements import Brightness, Moisture, brightness_from_lux, moisture_from_water_frequency
 
 
 class DBInterface:
@@ -43,15 +43,82 @@ class DBInterface:
                 logging.info("Closed database connection.")
 
     def get_plant_details(self, plant_type: str) -> tuple[Brightness, float, float, Moisture]:
-        """Unfinished as we don't yet know the database structure."""
-        with self.connect_to_db as (cur, conn):
+        """Required (brightness, humidity, temperature, moisture) of a plant type, by name."""
+        with self.connect_to_db() as (cur, conn):
             cur: cursor
 
             cur.execute(
-                F"SELECT * FROM plants WHERE plant_type={plant_type}"
+                """
+                SELECT optimal_light, optimal_humidity, optimal_temperature, water_frequency_days
+                FROM plant_types
+                WHERE name = %s
+                """,
+                (plant_type,),
             )
+            row = cur.fetchone()
 
-            results = cur.fetchall()
-            # Here we need to process and format the results
+        if row is None:
+            raise LookupError(f"Unknown plant type: {plant_type}")
+        light, humidity, temperature, water_frequency_days = row
+        return (
+            brightness_from_lux(light),
+            humidity,
+            temperature,
+            moisture_from_water_frequency(water_frequency_days),
+        )
 
-            return results
+    def iter_plant_rows(
+            self,
+            user_id: int | None = None,
+            plant_ids: list[int] | None = None,
+            shard: int | None = None,
+            shards: int | None = None,
+            batch_size: int = 10000,
+        ):
+        """
+        Every plant with its type and active device assignments, as one joined
+        query. Rows are streamed through a server-side cursor in 'batch_size'
+        chunks, ordered by plant id; a plant without devices yields one row
+        with NULL device columns. With 'shard'/'shards' only the plants that
+        sharding.shard_for routes to that shard are selected.
+        """
+        conditions = []
+        params = []
+        if user_id is not None:
+            conditions.append("p.user_id = %s")
+            params.append(user_id)
+        if plant_ids is not None:
+            conditions.append("p.id = ANY(%s)")
+            params.append(list(plant_ids))
+        if shards:
+            conditions.append("p.id %% %s = %s")
+            params.extend([shards, shard])
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        with self.connect_to_db() as (cur, conn):
+            named = conn.cursor(name="plant_loader")
+            named.itersize = batch_size
+            try:
+                named.execute(
+                    f"""
+                    SELECT p.id, p.user_id, u.email, pt.name,
+                           pt.optimal_light, pt.optimal_humidity, pt.optimal_temperature,
+                           pt.water_frequency_days,
+                           d.id, d.device_name, d.unique_identifier,
+                           pda.assignment_type, dt.device_type
+                    FROM plants p
+                    JOIN plant_types pt ON pt.id = p.plant_type_id
+                    JOIN users u ON u.id = p.user_id
+                    LEFT JOIN plant_device_assignments pda
+                           ON pda.plant_id = p.id AND pda.is_active
+                    LEFT JOIN devices d
+                           ON d.id = pda.device_id AND d.is_active
+                    LEFT JOIN device_types dt ON dt.id = d.device_type_id
+                    {where}
+                    ORDER BY p.id
+                    """,
+                    params,
+                )
+                yield from named
+            finally:
+                named.close()
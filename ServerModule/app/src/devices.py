@@ -1,36 +1,61 @@
+import inspect
 from abc import ABC, abstractmethod
+from enum import IntFlag
 from measurements import Moisture, Brightness
 from textbook import Textbook, MetricMessages
-from logger import Logger
+from logger import Logger, LogLevel
 
 # Bejön az üzenet egy adott eszköztől -> frissítjük annak az eszköznek az adatát
 # Le tudjuk kérni az eszköz által mért értéket
 # A növény az egyes azonos típusú eszközei által mért értékeket "átlagolja"
 
+class Capability(IntFlag):
+    MOISTURE_READ = 1
+    MOISTURE_WRITE = 2
+    BRIGHTNESS_READ = 4
+    BRIGHTNESS_WRITE = 8
+    TEMPERATURE_READ = 16
+    TEMPERATURE_WRITE = 32
+    HUMIDITY_READ = 64
+    HUMIDITY_WRITE = 128
+
+    @property
+    def label(self) -> str:
+        """'moisture:read' style name of a single capability."""
+        metric, access = self.name.lower().split("_")
+        return f"{metric}:{access}"
+
+    @classmethod
+    def read(cls, metric: str) -> "Capability":
+        return cls[f"{metric.upper()}_READ"]
+
+    @classmethod
+    def write(cls, metric: str) -> "Capability":
+        return cls[f"{metric.upper()}_WRITE"]
+
+
 class Device(ABC):
+    # Computed once per class in __init_subclass__
+    capability_mask: Capability = Capability(0)
+    _capabilities: frozenset[str] = frozenset()
+    _capability_members: tuple[Capability, ...] = ()
+
     def __init__(self, name: str):
         self.name = name
 
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        mask = Capability(0)
+        for role, capability in _CAPABILITY_ROLES:
+            if issubclass(cls, role):
+                mask |= capability
+        cls.capability_mask = mask
+        cls._capability_members = tuple(c for c in Capability if c & mask)
+        cls._capabilities = frozenset(c.label for c in cls._capability_members)
+
     @property
-    def capabilities(self) -> set[str]:
-        capabilities = set()
-        if isinstance(self, MoistureSensor):
-            capabilities.add("moisture:read")
-        if isinstance(self, MoisturizeActuator):
-            capabilities.add("moisture:write")
-        if isinstance(self, BrightnessSensor):
-            capabilities.add("brightness:read")
-        if isinstance(self, BrightnessActuator):
-            capabilities.add("brightness:write")
-        if isinstance(self, TemperatureSensor):
-            capabilities.add("temperature:read")
-        if isinstance(self, TemperatureActuator):
-            capabilities.add("temperature:write")
-        if isinstance(self, HumiditySensor):
-            capabilities.add("humidity:read")
-        if isinstance(self, HumidityActuator):
-            capabilities.add("humidity:write")
-        return capabilities
+    def capabilities(self) -> frozenset[str]:
+        return self._capabilities
 
     def __repr__(self) -> str:
         return f"{self.__class__.__name__}(name={self.name!r})"
@@ -129,6 +154,19 @@ class HumidityActuator(ABC):
         pass
 
 
+# Role class -> capability it grants, used by Device.__init_subclass__
+_CAPABILITY_ROLES = (
+    (MoistureSensor, Capability.MOISTURE_READ),
+    (MoistureActuator, Capability.MOISTURE_WRITE),
+    (BrightnessSensor, Capability.BRIGHTNESS_READ),
+    (BrightnessActuator, Capability.BRIGHTNESS_WRITE),
+    (TemperatureSensor, Capability.TEMPERATURE_READ),
+    (TemperatureActuator, Capability.TEMPERATURE_WRITE),
+    (HumiditySensor, Capability.HUMIDITY_READ),
+    (HumidityActuator, Capability.HUMIDITY_WRITE),
+)
+
+
 class SimpleMoisturizer(Device, MoistureSensor):
     def __init__(self, name: str):
         super().__init__(name)
@@ -138,8 +176,11 @@ class SimpleMoisturizer(Device, MoistureSensor):
     def read_moisture(self) -> float:
         return self._moisture
 
+    def update_moisture(self, moisture: Moisture):
+        self._moisture = moisture
+
 
-class ComplexMoistureDevice(Device, MoistureSensor, MoisturizeActuator):
+class ComplexMoistureDevice(Device, MoistureSensor, MoistureActuator):
     def __init__(self, name: str):
         super().__init__(name)
         self._moisture = None
@@ -148,41 +189,188 @@ class ComplexMoistureDevice(Device, MoistureSensor, MoisturizeActuator):
     def read_moisture(self) -> float:
         return self._moisture
 
+    def update_moisture(self, moisture: Moisture):
+        self._moisture = moisture
+
 
     def change_moisture(self, delta: float) -> None:
         self._moisture = self._moisture + delta
 
 
+class RemoteDevice(Device):
+    """
+    A device registered in the database. Readings are stored as they arrive,
+    commands are recorded per metric until they are sent out. Its roles (and
+    so its capabilities) come from remote_device_class.
+    """
+    def __init__(self, name: str, device_id: int | None = None, unique_identifier: str | None = None):
+        super().__init__(name)
+        self.device_id = device_id
+        self.unique_identifier = unique_identifier
+        self.readings: dict[str, object] = {}
+        self.commands: dict[str, float] = {}
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(name={self.name!r}, device_id={self.device_id!r})"
+
+    def _command(self, metric: str, delta: float):
+        """Where every change_<metric> goes; subclasses forward the command elsewhere."""
+        self.commands[metric] = delta
+
+    def read_moisture(self) -> Moisture:
+        return self.readings.get("moisture")
+
+    def update_moisture(self, moisture: Moisture):
+        self.readings["moisture"] = moisture
+
+    def change_moisture(self, delta: float):
+        self._command("moisture", delta)
+
+    def read_brightness(self) -> Brightness:
+        return self.readings.get("brightness")
+
+    def update_brightness(self, brightness: Brightness):
+        self.readings["brightness"] = brightness
+
+    def change_brightness(self, delta: float):
+        self._command("brightness", delta)
+
+    def read_temperature(self) -> float:
+        return self.readings.get("temperature")
+
+    def update_temperature(self, temperature: float):
+        self.readings["temperature"] = temperature
+
+    def change_temperature(self, delta: float):
+        self._command("temperature", delta)
+
+    def read_humidity(self) -> float:
+        return self.readings.get("humidity")
+
+    def update_humidity(self, humidity: float):
+        self.readings["humidity"] = humidity
+
+    def change_humidity(self, delta: float):
+        self._command("humidity", delta)
+
+
+_remote_device_classes: dict[tuple[type, Capability], type[RemoteDevice]] = {}
+
+
+def remote_device_class(capabilities: Capability, base: type[RemoteDevice] = RemoteDevice) -> type[RemoteDevice]:
+    """The subclass of 'base' with exactly the roles of 'capabilities' (built once per base and mask)."""
+    key = (base, capabilities)
+    cls = _remote_device_classes.get(key)
+    if cls is None:
+        roles = tuple(role for role, capability in _CAPABILITY_ROLES if capabilities & capability)
+        name = f"{base.__name__}_" + "_".join(c.label.replace(":", "_") for c in Capability if c & capabilities)
+        cls = _remote_device_classes[key] = type(name, (base, *roles), {})
+    return cls
+
+
 class DeviceCollection:
-    """The devices associated with one Plant object."""
+    """
+    The devices associated with one Plant object.
+    Devices are also indexed by capability, so looking up the actuators of a
+    metric only touches those devices, and add/remove are O(1).
+    """
     def __init__(self, plant_id: str, logger: Logger):
         self.plant_id = plant_id
-        self.devices: list[Device] = []
+        self._devices: dict[int, Device] = {}
+        # Filled on demand, most plants only use a few capabilities
+        self._by_capability: dict[Capability, dict[int, Device]] = {}
         self.logger = logger
+        # Optional commands.CommandDispatcher that merges and rate limits commands
+        self.command_dispatcher = None
+
+    @property
+    def devices(self) -> tuple[Device, ...]:
+        """The attached devices, read-only: use add_device / remove_device to change them."""
+        return tuple(self._devices.values())
+
+    def __len__(self) -> int:
+        return len(self._devices)
 
     def add_device(self, device: Device):
-        self.devices.append(device)
+        key = id(device)
+        if key in self._devices:
+            return
+        self._devices[key] = device
+        for capability in device._capability_members:
+            self._by_capability.setdefault(capability, {})[key] = device
 
     def remove_device(self, device: Device):
-        self.devices.remove(Device)
+        key = id(device)
+        if self._devices.pop(key, None) is None:
+            return
+        for capability in device._capability_members:
+            self._by_capability.get(capability, {}).pop(key, None)
+        if self.command_dispatcher is not None:
+            self.command_dispatcher.forget_device(device)
+
+    def with_capability(self, capability: Capability) -> list[Device]:
+        devices = self._by_capability.get(capability)
+        return list(devices.values()) if devices else []
+
+    def actuators(self, metric: str) -> list[Device]:
+        return self.with_capability(Capability.write(metric))
+
+    def sensors(self, metric: str) -> list[Device]:
+        return self.with_capability(Capability.read(metric))
 
     def send_command(self, metric: str, delta: float):
-        capability = f"{metric}:write"
         method_name = f"change_{metric}"
         metric_msgs: MetricMessages = getattr(Textbook, metric)
     
-        actuators = [d for d in self.devices if capability in d.capabilities]
+        actuators = self.actuators(metric)
 
         if not actuators:
-            self.logger.warning(metric_msgs.no_actuator)
+            self.logger.log_state(LogLevel.WARNING, ("actuator", metric), "missing", metric_msgs.no_actuator)
             return
+        self.logger.reset_state(("actuator", metric))
 
         delta_fragment = delta / len(actuators)
 
+        if self.command_dispatcher is not None:
+            for device in actuators:
+                self.command_dispatcher.submit(device, metric, delta_fragment)
+            return
+
         for device in actuators:
             method = getattr(device, method_name)
             method(delta_fragment)
 
+    async def send_command_async(self, metric: str, delta: float, limits=None):
+        """
+        Coroutine version of send_command. Actuators may implement change_<metric>
+        as a coroutine; 'limits' (see async_plants.ConcurrencyLimits) caps how many
+        commands of one actuator type are in flight at once.
+        """
+        method_name = f"change_{metric}"
+        metric_msgs: MetricMessages = getattr(Textbook, metric)
+
+        actuators = self.actuators(metric)
+
+        if not actuators:
+            self.logger.log_state(LogLevel.WARNING, ("actuator", metric), "missing", metric_msgs.no_actuator)
+            return
+        self.logger.reset_state(("actuator", metric))
+
+        delta_fragment = delta / len(actuators)
+
+        for device in actuators:
+            method = getattr(device, method_name)
+            if limits is None:
+                result = method(delta_fragment)
+                if inspect.isawaitable(result):
+                    await result
+                continue
+
+            async with limits.get(metric):
+                result = method(delta_fragment)
+                if inspect.isawaitable(result):
+                    await result
+
 
 
 if __name__ == "__main__":
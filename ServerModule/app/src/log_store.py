@@ -0,0 +1,266 @@
+import bisect
+import json
+import mmap
+import os
+import struct
+import time
+from dataclasses import dataclass
+from typing import Iterator
+
+from logger import LogLevel
+
+# Segment header: magic, format version
+_SEGMENT_HEADER = struct.Struct("<4sH")
+SEGMENT_MAGIC = b"PLOG"
+FORMAT_VERSION = 2
+# Record: u32 length of the rest, then created, level, name length, template id,
+# followed by the name and the JSON encoded args (utf-8)
+_LENGTH = struct.Struct("<I")
+_RECORD = struct.Struct("<dBII")
+# Sparse index entry: offset of a record, highest timestamp of every record before it
+_INDEX = struct.Struct("<Qd")
+
+SEGMENT_SUFFIX = ".seg"
+INDEX_SUFFIX = ".idx"
+# The segment's templates, u32 length prefixed, template id = position
+TEMPLATES_SUFFIX = ".tpl"
+
+
+@dataclass(frozen=True)
+class LogRecord:
+    created: float
+    level: LogLevel
+    name: str
+    template: str
+    args: tuple
+
+    @property
+    def message(self) -> str:
+        try:
+            return self.template % self.args if self.args else self.template
+        except (TypeError, ValueError):
+            return f"{self.template} {self.args!r}"
+
+    def __str__(self) -> str:
+        stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.created))
+        return f"[{stamp}] [{self.name}] [{self.level.name}] {self.message}"
+
+
+def _segment_name(sequence: int, first_created: float) -> str:
+    # Sequence first so names sort in write order, start time for skipping whole segments
+    return f"{sequence:08d}-{int(first_created * 1000):015d}"
+
+
+def _parse_segment_name(filename: str) -> tuple[int, float]:
+    sequence, first = filename[:-len(SEGMENT_SUFFIX)].split("-")
+    return int(sequence), int(first) / 1000
+
+
+class BinaryLogStore:
+    """
+    Append-only structured log: length-prefixed binary records in segment
+    files of about 'segment_bytes', rotated by size. Every 'index_every_bytes'
+    an entry (offset, highest timestamp so far) goes to the segment's sparse
+    index, which lets LogReader skip straight to a time range.
+    Message templates are interned per segment: a record only holds the id of
+    its template, the text is written once to the segment's template file.
+    Not thread-safe: it is meant to be fed by the single AsyncLogWriter thread.
+    """
+
+    def __init__(self, directory: str, segment_bytes: int = 64 * 1024 * 1024, index_every_bytes: int = 64 * 1024):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.index_every_bytes = index_every_bytes
+        os.makedirs(directory, exist_ok=True)
+
+        existing = sorted(f for f in os.listdir(directory) if f.endswith(SEGMENT_SUFFIX))
+        self._sequence = _parse_segment_name(existing[-1])[0] + 1 if existing else 0
+        self._segment = None
+        self._index = None
+        self._templates = None
+        self._template_ids: dict[str, int] = {}
+        self._size = 0
+        self._next_index_at = 0
+        self._max_created = float("-inf")
+
+    def _open_segment(self, created: float):
+        self.close()
+        base = os.path.join(self.directory, _segment_name(self._sequence, created))
+        self._sequence += 1
+        self._segment = open(base + SEGMENT_SUFFIX, "ab")
+        self._index = open(base + INDEX_SUFFIX, "ab")
+        self._templates = open(base + TEMPLATES_SUFFIX, "ab")
+        self._template_ids = {}
+        self._segment.write(_SEGMENT_HEADER.pack(SEGMENT_MAGIC, FORMAT_VERSION))
+        self._size = _SEGMENT_HEADER.size
+        self._next_index_at = 0
+        self._max_created = float("-inf")
+
+    def _template_id(self, template: str) -> int:
+        template_id = self._template_ids.get(template)
+        if template_id is None:
+            data = template.encode("utf-8")
+            self._templates.write(_LENGTH.pack(len(data)) + data)
+            template_id = self._template_ids[template] = len(self._template_ids)
+        return template_id
+
+    def append(self, created: float, level: LogLevel, name: str, template: str, args: tuple = ()):
+        if self._segment is None or self._size >= self.segment_bytes:
+            self._open_segment(created)
+
+        if self._size >= self._next_index_at:
+            self._index.write(_INDEX.pack(self._size, self._max_created))
+            self._next_index_at = self._size + self.index_every_bytes
+
+        name_bytes = name.encode("utf-8")
+        args_bytes = json.dumps(args, default=str, separators=(",", ":")).encode("utf-8") if args else b""
+        body = _RECORD.pack(created, int(level), len(name_bytes), self._template_id(template))
+        length = len(body) + len(name_bytes) + len(args_bytes)
+
+        self._segment.write(_LENGTH.pack(length) + body + name_bytes + args_bytes)
+        self._size += _LENGTH.size + length
+        if created > self._max_created:
+            self._max_created = created
+
+    def append_batch(self, records: list[tuple]):
+        """Append (created, level, name, template, args) records and flush once."""
+        for record in records:
+            self.append(*record)
+        self.flush()
+
+    def flush(self):
+        if self._segment is not None:
+            # Templates first, so no flushed record refers to a template that is not
+            self._templates.flush()
+            self._segment.flush()
+            self._index.flush()
+
+    def close(self):
+        if self._segment is not None:
+            self._templates.close()
+            self._segment.close()
+            self._index.close()
+            self._segment = None
+            self._index = None
+            self._templates = None
+
+
+class LogReader:
+    """
+    Queries a BinaryLogStore directory. Segments are memory-mapped; records
+    before the time range are skipped through the sparse index and records of
+    other loggers or lower levels are rejected from their fixed header without
+    decoding the message. Records are assumed to be in time order up to
+    'max_skew' seconds (the writer thread appends them in submission order).
+    Segments of another format version are skipped.
+    """
+
+    def __init__(self, directory: str, max_skew: float = 5.0):
+        self.directory = directory
+        self.max_skew = max_skew
+
+    def segments(self) -> list[tuple[str, float]]:
+        """(path without suffix, first timestamp) of every segment, oldest first."""
+        names = sorted(f for f in os.listdir(self.directory) if f.endswith(SEGMENT_SUFFIX))
+        return [
+            (os.path.join(self.directory, name[:-len(SEGMENT_SUFFIX)]), _parse_segment_name(name)[1])
+            for name in names
+        ]
+
+    @staticmethod
+    def _start_offset(base: str, start: float | None) -> int:
+        if start is None:
+            return _SEGMENT_HEADER.size
+        try:
+            with open(base + INDEX_SUFFIX, "rb") as f:
+                data = f.read()
+        except OSError:
+            return _SEGMENT_HEADER.size
+        entries = [_INDEX.unpack_from(data, i) for i in range(0, len(data) - _INDEX.size + 1, _INDEX.size)]
+        # Last entry whose preceding records are all older than 'start'
+        position = bisect.bisect_left([max_before for _, max_before in entries], start) - 1
+        return entries[position][0] if position >= 0 else _SEGMENT_HEADER.size
+
+    @staticmethod
+    def _templates(base: str) -> list[str]:
+        try:
+            with open(base + TEMPLATES_SUFFIX, "rb") as f:
+                data = f.read()
+        except OSError:
+            return []
+        templates = []
+        offset = 0
+        while offset + _LENGTH.size <= len(data):
+            (length,) = _LENGTH.unpack_from(data, offset)
+            offset += _LENGTH.size
+            if offset + length > len(data):
+                break  # Torn write at the tail
+            templates.append(str(data[offset:offset + length], "utf-8"))
+            offset += length
+        return templates
+
+    def query(
+            self,
+            name: str | None = None,
+            min_level: LogLevel | None = None,
+            start: float | None = None,
+            end: float | None = None,
+            limit: int | None = None,
+        ) -> Iterator[LogRecord]:
+        """Records of logger 'name' (e.g. a plant id) at 'min_level' or above within [start, end]."""
+        name_bytes = name.encode("utf-8") if name is not None else None
+        level_floor = int(min_level) if min_level is not None else 0
+        segments = self.segments()
+        found = 0
+
+        for i, (base, _) in enumerate(segments):
+            if end is not None and segments[i][1] > end + self.max_skew:
+                break
+            # The next segment starts before 'start': nothing in this one can match
+            if start is not None and i + 1 < len(segments) and segments[i + 1][1] < start - self.max_skew:
+                continue
+
+            with open(base + SEGMENT_SUFFIX, "rb") as f:
+                if os.fstat(f.fileno()).st_size < _SEGMENT_HEADER.size:
+                    continue
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+                    if _SEGMENT_HEADER.unpack_from(view) != (SEGMENT_MAGIC, FORMAT_VERSION):
+                        continue
+                    templates = self._templates(base)
+                    for record in self._scan(view, self._start_offset(base, start), templates,
+                                             name_bytes, level_floor, start, end):
+                        yield record
+                        found += 1
+                        if limit is not None and found >= limit:
+                            return
+
+    def _scan(self, view, offset: int, templates: list[str], name_bytes, level_floor, start, end) -> Iterator[LogRecord]:
+        size = len(view)
+        header = _LENGTH.size + _RECORD.size
+        while offset + header <= size:
+            (length,) = _LENGTH.unpack_from(view, offset)
+            record_end = offset + _LENGTH.size + length
+            if record_end > size:
+                break  # Torn write at the tail
+
+            created, level, name_length, template_id = _RECORD.unpack_from(view, offset + _LENGTH.size)
+            if end is not None and created > end + self.max_skew:
+                break
+
+            name_start = offset + header
+            if (
+                level >= level_floor
+                and (start is None or created >= start)
+                and (end is None or created <= end)
+                and (name_bytes is None or view[name_start:name_start + name_length] == name_bytes)
+            ):
+                args_start = name_start + name_length
+                args = tuple(json.loads(view[args_start:record_end])) if args_start < record_end else ()
+                yield LogRecord(
+                    created,
+                    LogLevel(level),
+                    str(view[name_start:args_start], "utf-8") if name_bytes is None else name_bytes.decode(),
+                    templates[template_id] if template_id < len(templates) else f"<unknown template {template_id}>",
+                    args,
+                )
+            offset = record_end
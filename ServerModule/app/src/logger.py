@@ -1,3 +1,8 @@
+import os
+import queue
+import sys
+import threading
+import time
 from datetime import datetime
 from enum import IntEnum
 
@@ -9,7 +14,271 @@ class LogLevel(IntEnum):
     ERROR = 40
 
 
+class AsyncLogWriter:
+    """
+    Background writer shared by every Logger once started (see start_async_logging).
+    Callers only put (time, level, name, template, args) on a queue; the writer
+    thread formats the records, stamps them with a timestamp string cached per
+    second and writes them in batches. Files are rotated by size into
+    'path.1' .. 'path.<backups>'. When more than 'max_pending' records are
+    waiting, new ones are dropped and counted instead of blocking the caller.
+    With a 'store' (log_store.BinaryLogStore) every batch is also appended
+    there as structured records; 'text=False' skips the text output.
+    """
+
+    def __init__(
+            self,
+            path: str | None = None,
+            max_bytes: int = 10 * 1024 * 1024,
+            backups: int = 5,
+            batch_size: int = 512,
+            flush_interval: float = 0.2,
+            max_pending: int = 100_000,
+            store=None,
+            text: bool = True,
+        ):
+        self.path = path
+        self.store = store
+        self.text = text
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._thread: threading.Thread | None = None
+        self._stream = None
+        self._size = 0
+        self._stamp_second: int | None = None
+        self._stamp = ""
+
+        self.written = 0
+        # Incremented by the callers, reported and reset by the writer thread
+        self.dropped = 0
+        self._dropped_lock = threading.Lock()
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._open()
+        self._thread = threading.Thread(target=self._run, name="AsyncLogWriter", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float | None = 5.0):
+        """
+        Write everything still queued, then stop the thread. The thread closes
+        the file (and the store) on its way out, so if it is still writing
+        after 'timeout' it finishes in the background.
+        """
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            print(f"AsyncLogWriter: still writing after {timeout}s, finishing in the background", file=sys.stderr)
+            return
+        self._thread = None
+
+    def submit(self, created: float, level: LogLevel, name: str, template: str, args: tuple):
+        if self._queue.qsize() >= self.max_pending:
+            with self._dropped_lock:
+                self.dropped += 1
+            return
+        self._queue.put((created, level, name, template, args))
+
+    def _open(self):
+        if not self.text:
+            return
+        if self.path is None:
+            self._stream = sys.stdout
+            return
+        self._stream = open(self.path, "a", encoding="utf-8")
+        self._size = self._stream.tell()
+
+    def _close(self):
+        if self.path and self._stream:
+            self._stream.close()
+        self._stream = None
+        if self.store is not None:
+            self.store.close()
+
+    def _rotate(self):
+        self._stream.close()
+        # Reopened by the next write if the renames fail
+        self._stream = None
+        for i in range(self.backups - 1, 0, -1):
+            source = f"{self.path}.{i}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{i + 1}")
+        if self.backups > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self._stream = open(self.path, "w", encoding="utf-8")
+        self._size = 0
+
+    def _timestamp(self, created: float) -> str:
+        second = int(created)
+        if second != self._stamp_second:
+            self._stamp_second = second
+            self._stamp = datetime.fromtimestamp(second).strftime("%Y-%m-%d %H:%M:%S")
+        return self._stamp
+
+    def _format(self, record) -> str:
+        created, level, name, template, args = record
+        try:
+            message = template % args if args else template
+        except (TypeError, ValueError) as exc:
+            message = f"{template} {args!r} (format error: {exc})"
+        return f"[{self._timestamp(created)}] [{name}] [{level.name}] {message}\n"
+
+    def _write(self, lines: list[str]):
+        data = "".join(lines)
+        if self._stream is None:
+            self._open()
+        if self.path is not None:
+            size = len(data.encode("utf-8"))
+            if self._size and self._size + size > self.max_bytes:
+                self._rotate()
+            self._size += size
+        self._stream.write(data)
+        self._stream.flush()
+
+    def _run(self):
+        try:
+            self._loop()
+        finally:
+            self._close()
+
+    def _loop(self):
+        running = True
+        while running:
+            try:
+                record = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+
+            records = []
+            while True:
+                if record is None:
+                    running = False
+                    # Drain whatever was queued before the stop request
+                    try:
+                        record = self._queue.get_nowait()
+                        continue
+                    except queue.Empty:
+                        break
+                records.append(record)
+                if running and len(records) >= self.batch_size:
+                    break
+                try:
+                    record = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+
+            if self.dropped:
+                with self._dropped_lock:
+                    dropped, self.dropped = self.dropped, 0
+                records.append((time.time(), LogLevel.WARNING, "AsyncLogWriter",
+                                "Dropped %d log records, the writer could not keep up.", (dropped,)))
+            if not records:
+                continue
+            try:
+                if self.text:
+                    self._write([self._format(record) for record in records])
+                if self.store is not None:
+                    self.store.append_batch(records)
+                self.written += len(records)
+            except Exception as exc:
+                # Never let one bad batch (or store) stop the logging thread
+                print(f"AsyncLogWriter: could not write {len(records)} records: {exc!r}", file=sys.stderr)
+
+
+class LogThrottle:
+    """
+    Decides whether a keyed message is worth emitting. Each key (logger name,
+    message key) remembers the state it last logged: a new state is always
+    emitted, a repeat of the same state only every 'repeat_after' seconds
+    (hourly by default, None for never) and/or every 'sample_every'-th time.
+    Emitted repeats and state changes report how many similar messages were
+    suppressed before. Safe to share between threads.
+    """
+
+    def __init__(self, repeat_after: float | None = 3600.0, sample_every: int = 0):
+        self.repeat_after = repeat_after
+        self.sample_every = sample_every
+        # key -> [state, last emitted at, suppressed since then]
+        self._states: dict[tuple, list] = {}
+        self._lock = threading.Lock()
+        self.emitted = 0
+        self.suppressed = 0
+
+    def __len__(self) -> int:
+        return len(self._states)
+
+    def check(self, key: tuple, state, now: float) -> tuple[int, bool] | None:
+        """
+        None to suppress the message, otherwise (suppressed, changed): how many
+        repeats of the previously logged state were suppressed, and whether
+        the state changed.
+        """
+        with self._lock:
+            entry = self._states.get(key)
+            if entry is None:
+                self._states[key] = [state, now, 0]
+                self.emitted += 1
+                return 0, True
+
+            changed = entry[0] != state
+            if not changed:
+                suppressed = entry[2] + 1
+                due = self.repeat_after is not None and now - entry[1] >= self.repeat_after
+                sampled = self.sample_every and suppressed % self.sample_every == 0
+                if not (due or sampled):
+                    entry[2] = suppressed
+                    self.suppressed += 1
+                    return None
+
+            suppressed = entry[2]
+            entry[0], entry[1], entry[2] = state, now, 0
+            self.emitted += 1
+            return suppressed, changed
+
+    def reset(self, key: tuple):
+        """Forget the state of 'key', its next message is emitted."""
+        with self._lock:
+            self._states.pop(key, None)
+
+
+_writer: AsyncLogWriter | None = None
+
+
+def start_async_logging(path: str | None = None, **options) -> AsyncLogWriter:
+    """
+    Route every Logger through one background AsyncLogWriter (stdout when
+    'path' is None). 'options' are passed to AsyncLogWriter.
+    """
+    global _writer
+    stop_async_logging()
+    writer = AsyncLogWriter(path, **options)
+    writer.start()
+    _writer = writer
+    return writer
+
+
+def stop_async_logging():
+    """Flush the background writer and go back to synchronous printing."""
+    global _writer
+    writer, _writer = _writer, None
+    if writer is not None:
+        writer.stop()
+
+
 class Logger:
+    # Shared by every Logger for log_state, replace it to change the policy
+    throttle = LogThrottle()
+
     def __init__(self, name: str, level: LogLevel = LogLevel.INFO):
         self.name = name
         self.level = level
@@ -25,20 +294,58 @@ class Logger:
     def _write(self, formatted: str) -> None:
         print(formatted)
 
-    def log(self, level: LogLevel, message: str) -> None:
+    def log(self, level: LogLevel, message: str, *args) -> None:
+        """
+        Log 'message', %-formatted with 'args' only if it is emitted. With
+        async logging started the record is queued and formatted by the writer
+        thread, so pass immutable arguments.
+        """
         if not self._should_log(level):
             return
-        formatted = self._format(level, message)
+        writer = _writer
+        if writer is not None:
+            writer.submit(time.time(), level, self.name, message, args)
+            return
+        formatted = self._format(level, message % args if args else message)
         self._write(formatted)
 
-    def debug(self, message: str) -> None:
-        self.log(LogLevel.DEBUG, message)
+    def log_state(self, level: LogLevel, key, state, message: str, *args) -> None:
+        """
+        Log a message describing the current 'state' of 'key' (e.g. the
+        "ok" / "low" / "high" state of one metric), rate limited per
+        (logger, key) by Logger.throttle: by default changes of state are
+        logged, and a state that persists once an hour, with a count of the
+        similar messages suppressed in between.
+        """
+        if not self._should_log(level):
+            return
+        decision = self.throttle.check((self.name, key), state, time.time())
+        if decision is None:
+            return
+        suppressed, changed = decision
+        if suppressed:
+            # The count goes in the args, so the template stays one of a few per message
+            if not args:
+                message = message.replace("%", "%%")
+            if changed:
+                message += " (previous message repeated %d more times)"
+            else:
+                message += " (suppressed %d similar messages)"
+            args += (suppressed,)
+        self.log(level, message, *args)
+
+    def reset_state(self, key) -> None:
+        """Forget the logged state of 'key', so its next log_state message is emitted."""
+        self.throttle.reset((self.name, key))
+
+    def debug(self, message: str, *args) -> None:
+        self.log(LogLevel.DEBUG, message, *args)
 
-    def info(self, message: str) -> None:
-        self.log(LogLevel.INFO, message)
+    def info(self, message: str, *args) -> None:
+        self.log(LogLevel.INFO, message, *args)
 
-    def warning(self, message: str) -> None:
-        self.log(LogLevel.WARNING, message)
+    def warning(self, message: str, *args) -> None:
+        self.log(LogLevel.WARNING, message, *args)
 
-    def error(self, message: str) -> None:
-        self.log(LogLevel.ERROR, message)
+    def error(self, message: str, *args) -> None:
+        self.log(LogLevel.ERROR, message, *args)
@@ -4,6 +4,14 @@ from enum import IntEnum
 TEMPERATURE_THRESHOLD = 5.0
 HUMIDITY_THRESHOLD = 5.0
 
+
+def within_threshold(delta, threshold):
+    """
+    Whether a deviation from the required value is acceptable: on target, or
+    closer than the metric's threshold. Works on floats and NumPy arrays alike.
+    """
+    return (delta == 0) | (abs(delta) < threshold)
+
 class Brightness(IntEnum):
     NO_LIGHT = 1
     LOW_LIGHT = 2
@@ -16,3 +24,33 @@ class Moisture(IntEnum):
     DRY = 1
     MOIST = 2
     WET = 3
+
+
+# Upper lux bound of each brightness level (the last level is open ended)
+_BRIGHTNESS_LUX = (
+    (100, Brightness.NO_LIGHT),
+    (800, Brightness.LOW_LIGHT),
+    (2500, Brightness.MEDIUM_LIGHT),
+    (10000, Brightness.BRIGHT_INDIRECT_LIGHT),
+)
+
+
+def brightness_from_lux(lux: float | None, default: Brightness = Brightness.MEDIUM_LIGHT) -> Brightness:
+    """Brightness level of a plant type's optimal_light (lux)."""
+    if lux is None:
+        return default
+    for bound, level in _BRIGHTNESS_LUX:
+        if lux < bound:
+            return level
+    return Brightness.DIRECT_LIGHT
+
+
+def moisture_from_water_frequency(days: int | None, default: Moisture = Moisture.MOIST) -> Moisture:
+    """Soil moisture a plant type wants, judged by how often it is watered."""
+    if days is None:
+        return default
+    if days <= 3:
+        return Moisture.WET
+    if days <= 10:
+        return Moisture.MOIST
+    return Moisture.DRY
@@ -0,0 +1,113 @@
+import time
+from functools import lru_cache
+
+from devices import Capability, RemoteDevice, remote_device_class
+from db_utils import DBInterface
+from measurements import brightness_from_lux, moisture_from_water_frequency
+from plants import Plant
+from logger import Logger
+
+# plant_device_assignments.assignment_type -> metric the device serves
+ASSIGNMENT_METRICS = {
+    "soil_moisture": "moisture",
+    "moisture": "moisture",
+    "pump": "moisture",
+    "light": "brightness",
+    "brightness": "brightness",
+    "lamp": "brightness",
+    "temperature": "temperature",
+    "heater": "temperature",
+    "humidity": "humidity",
+    "humidifier": "humidity",
+}
+
+# device_types.device_type -> (reads, writes)
+DEVICE_ACCESS = {
+    "sensor": (True, False),
+    "actuator": (False, True),
+    "combined": (True, True),
+}
+
+logger = Logger(name="PlantLoader")
+
+
+@lru_cache(maxsize=None)
+def _device_capabilities(assignment_type: str | None, device_type: str | None) -> Capability:
+    metric = ASSIGNMENT_METRICS.get((assignment_type or "").lower())
+    if metric is None:
+        return Capability(0)
+    # SQLAlchemy stores the enum name ('SENSOR'), accept the value as well
+    reads, writes = DEVICE_ACCESS.get((device_type or "").lower(), (True, False))
+    mask = Capability(0)
+    if reads:
+        mask |= Capability.read(metric)
+    if writes:
+        mask |= Capability.write(metric)
+    return mask
+
+
+def build_plants(rows) -> list[Plant]:
+    """
+    Build Plant objects (with their DeviceCollections) from the rows of
+    DBInterface.iter_plant_rows. A device assigned to several plants, or to
+    one plant for several metrics, becomes one RemoteDevice shared by all of
+    them, with the union of its capabilities.
+    """
+    plants: dict[int, Plant] = {}
+    device_rows: dict[int, tuple[str, str]] = {}
+    device_masks: dict[int, Capability] = {}
+    links: list[tuple[int, int]] = []
+
+    for (
+        plant_id, _user_id, email, type_name,
+        light, humidity, temperature, water_frequency_days,
+        device_id, device_name, unique_identifier, assignment_type, device_type,
+    ) in rows:
+        if plant_id not in plants:
+            plants[plant_id] = Plant(
+                id=str(plant_id),
+                plant_type=type_name,
+                req_brightness=brightness_from_lux(light),
+                req_humidity=humidity,
+                req_temperature=temperature,
+                req_moisture=moisture_from_water_frequency(water_frequency_days),
+                alert_address=email,
+            )
+
+        if device_id is None:
+            continue
+        device_rows[device_id] = (device_name, unique_identifier)
+        device_masks[device_id] = device_masks.get(device_id, Capability(0)) | _device_capabilities(
+            assignment_type, device_type
+        )
+        links.append((plant_id, device_id))
+
+    devices: dict[int, RemoteDevice] = {}
+    for device_id, mask in device_masks.items():
+        name, unique_identifier = device_rows[device_id]
+        devices[device_id] = remote_device_class(mask)(name, device_id, unique_identifier)
+
+    for plant_id, device_id in links:
+        plants[plant_id].register_device(devices[device_id])
+
+    return list(plants.values())
+
+
+def load_plants(
+        db: DBInterface | None = None,
+        user_id: int | None = None,
+        plant_ids: list[int] | None = None,
+        shard: int | None = None,
+        shards: int | None = None,
+    ) -> list[Plant]:
+    """
+    Load the plants of one user, a list of plants, one shard or the whole
+    system with a single streamed query, instead of one connection per plant.
+    A shard ('shard' of 'shards') is selected by the query itself, so a shard
+    worker only reads its own plants.
+    """
+    db = db or DBInterface()
+    started = time.perf_counter()
+    plants = build_plants(db.iter_plant_rows(user_id=user_id, plant_ids=plant_ids, shard=shard, shards=shards))
+    logger.info(f"Loaded {len(plants)} plants in {time.perf_counter() - started:.2f}s.")
+    return plants
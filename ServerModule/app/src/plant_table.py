@@ -0,0 +1,190 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+from plants import Plant
+from measurements import TEMPERATURE_THRESHOLD, HUMIDITY_THRESHOLD, within_threshold
+from textbook import Textbook, MetricMessages
+from logger import LogLevel
+
+# Row order of the metric columns, same order as Plant._metric_checks
+METRICS = ("moisture", "brightness", "temperature", "humidity")
+METRIC_INDEX = {metric: i for i, metric in enumerate(METRICS)}
+THRESHOLDS = np.array([0.0, 0.0, TEMPERATURE_THRESHOLD, HUMIDITY_THRESHOLD])
+
+
+@dataclass
+class CareEvaluation:
+    """Result of one vectorized pass, every array has shape (len(METRICS), plants)."""
+    delta: np.ndarray
+    evaluated: np.ndarray
+    out_of_range: np.ndarray
+    too_high: np.ndarray
+
+    def out_of_range_rows(self, metric: str) -> np.ndarray:
+        return np.flatnonzero(self.out_of_range[METRIC_INDEX[metric]])
+
+
+class PlantTable:
+    """
+    Struct-of-arrays view of many plants: required and actual values live in
+    one float column per metric (NaN for "no reading yet"), so a care cycle is
+    a handful of NumPy operations over the whole fleet. Only the out-of-range
+    plants are handed back to Python for actuator commands and alerts.
+    Rows are removed by swapping in the last row, so add/remove are O(1).
+    """
+
+    def __init__(self, capacity: int = 1024):
+        capacity = max(capacity, 1)
+        self._size = 0
+        self.required = np.full((len(METRICS), capacity), np.nan)
+        self.actual = np.full((len(METRICS), capacity), np.nan)
+        self.keep_alive = np.zeros(capacity, dtype=bool)
+        self._ids: list[str] = []
+        self._plants: list[Plant | None] = []
+        self._rows: dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _grow(self, needed: int):
+        capacity = self.keep_alive.shape[0]
+        if needed <= capacity:
+            return
+        new_capacity = max(needed, capacity * 2)
+        for name in ("required", "actual"):
+            old = getattr(self, name)
+            new = np.full((len(METRICS), new_capacity), np.nan)
+            new[:, :self._size] = old[:, :self._size]
+            setattr(self, name, new)
+        keep_alive = np.zeros(new_capacity, dtype=bool)
+        keep_alive[:self._size] = self.keep_alive[:self._size]
+        self.keep_alive = keep_alive
+
+    @staticmethod
+    def _as_float(value) -> float:
+        return np.nan if value is None else float(value)
+
+    def add_plant(self, plant: Plant):
+        """Add a plant (or refresh its row if it is already in the table)."""
+        row = self._rows.get(plant.id)
+        if row is None:
+            self._grow(self._size + 1)
+            row = self._size
+            self._size += 1
+            self._rows[plant.id] = row
+            self._ids.append(plant.id)
+            self._plants.append(plant)
+        else:
+            self._plants[row] = plant
+
+        for i, (_, act_value, req_value, _) in enumerate(plant._metric_checks()):
+            self.required[i, row] = self._as_float(req_value)
+            self.actual[i, row] = self._as_float(act_value)
+        self.keep_alive[row] = plant.keep_alive
+
+    @classmethod
+    def from_plants(cls, plants: list[Plant]) -> "PlantTable":
+        table = cls(capacity=len(plants))
+        for plant in plants:
+            table.add_plant(plant)
+        return table
+
+    @classmethod
+    def from_arrays(cls, ids: list[str], required: np.ndarray, actual: np.ndarray) -> "PlantTable":
+        """Build a table without Plant objects (bulk loads, benchmarks)."""
+        count = len(ids)
+        table = cls(capacity=count)
+        table.required[:, :count] = required
+        table.actual[:, :count] = actual
+        table.keep_alive[:count] = True
+        table._size = count
+        table._ids = list(ids)
+        table._plants = [None] * count
+        table._rows = {plant_id: row for row, plant_id in enumerate(ids)}
+        return table
+
+    def remove_plant(self, plant_id: str):
+        row = self._rows.pop(plant_id, None)
+        if row is None:
+            return
+        last = self._size - 1
+        if row != last:
+            self.required[:, row] = self.required[:, last]
+            self.actual[:, row] = self.actual[:, last]
+            self.keep_alive[row] = self.keep_alive[last]
+            self._ids[row] = self._ids[last]
+            self._plants[row] = self._plants[last]
+            self._rows[self._ids[row]] = row
+        self.required[:, last] = np.nan
+        self.actual[:, last] = np.nan
+        self.keep_alive[last] = False
+        self._ids.pop()
+        self._plants.pop()
+        self._size = last
+
+    def update(self, plant_id: str, metric: str, value):
+        """Store a new actual value for one plant."""
+        self.actual[METRIC_INDEX[metric], self._rows[plant_id]] = self._as_float(value)
+
+    def set_keep_alive(self, plant_id: str, keep_alive: bool):
+        self.keep_alive[self._rows[plant_id]] = keep_alive
+
+    def refresh_actuals(self):
+        """Copy the current act_* values (and keep_alive flags) of every Plant into the columns."""
+        for row, plant in enumerate(self._plants):
+            if plant is None:
+                continue
+            for i, (_, act_value, _, _) in enumerate(plant._metric_checks()):
+                self.actual[i, row] = self._as_float(act_value)
+            self.keep_alive[row] = plant.keep_alive
+
+    def evaluate(self) -> CareEvaluation:
+        """
+        Evaluate every metric of every plant at once, with the same rules as
+        Plant.check_metric: a missing (or zero) reading is not evaluated, a
+        reading on target or within the metric threshold is fine (see
+        measurements.within_threshold), anything else is out of range.
+        """
+        size = self._size
+        required = self.required[:, :size]
+        actual = self.actual[:, :size]
+
+        delta = required - actual
+        evaluated = ~np.isnan(actual) & (actual != 0) & self.keep_alive[:size]
+        within = within_threshold(delta, THRESHOLDS[:, None])
+        out_of_range = evaluated & ~within
+        too_high = out_of_range & (delta < 0)
+        return CareEvaluation(delta, evaluated, out_of_range, too_high)
+
+    def run_care_cycle(self, log_ok: bool = False) -> CareEvaluation:
+        """
+        One care cycle for the whole table. Out-of-range plants are logged
+        (throttled per metric state, as in check_metric), alerted and handed to
+        their actuators exactly like check_metric does; "acceptable levels"
+        lines are only written with 'log_ok'.
+        """
+        evaluation = self.evaluate()
+
+        for i, metric in enumerate(METRICS):
+            metric_msgs: MetricMessages = getattr(Textbook, metric)
+
+            if log_ok:
+                ok_rows = np.flatnonzero(evaluation.evaluated[i] & ~evaluation.out_of_range[i])
+                for row in ok_rows:
+                    plant = self._plants[row]
+                    if plant is not None:
+                        plant.logger.log_state(LogLevel.INFO, metric, "ok", metric_msgs.ok)
+
+            rows = np.flatnonzero(evaluation.out_of_range[i])
+            for row, delta, too_high in zip(rows, evaluation.delta[i, rows], evaluation.too_high[i, rows]):
+                plant = self._plants[row]
+                if plant is None:
+                    continue
+                state, msg = ("high", metric_msgs.high) if too_high else ("low", metric_msgs.low)
+                plant.logger.log_state(LogLevel.INFO, metric, state, msg)
+                if plant.alert_address:
+                    plant.send_alert(msg)
+                plant.devices.send_command(metric, float(delta))
+
+        return evaluation
@@ -1,11 +1,37 @@
+import asyncio
+import struct
 import time
 import threading
+from time import perf_counter
+from typing import Callable, Mapping
 
 from devices import Device, DeviceCollection
 from db_utils import DBInterface
-from measurements import Brightness, Moisture, TEMPERATURE_THRESHOLD, HUMIDITY_THRESHOLD
+from scheduler import WorkerPoolScheduler
+from aggregation import MetricAggregator, STRATEGY_MEAN
+from commands import CommandDispatcher, CommandPolicy
+from snapshot import SnapshotError, read_snapshot, write_snapshot
+from profiling import PROFILER
+from measurements import Brightness, Moisture, TEMPERATURE_THRESHOLD, HUMIDITY_THRESHOLD, within_threshold
 from textbook import Textbook, MetricMessages
-from logger import Logger
+from logger import Logger, LogLevel
+
+# Metrics whose merged value is rounded back to their enum
+_DISCRETE_METRICS = {"moisture": Moisture, "brightness": Brightness}
+
+# Deviation from the required value a metric tolerates before the care cycle acts
+_METRIC_THRESHOLDS = {
+    "moisture": 0,
+    "brightness": 0,
+    "temperature": TEMPERATURE_THRESHOLD,
+    "humidity": HUMIDITY_THRESHOLD,
+}
+
+# Profiler phase names per metric, built once
+_CHECK_PHASES = {
+    metric: (f"check_metric.{metric}", f"send_command.{metric}")
+    for metric in ("moisture", "brightness", "temperature", "humidity")
+}
 
 
 class Plant:
@@ -43,13 +69,22 @@ class Plant:
 
         self.keep_alive: bool = False
 
+        # Event-driven mode: set when a reading changed since the last evaluation
+        self.dirty: bool = False
+        self._dirty_listener: Callable[["Plant"], None] | None = None
+
+        # Multi-sensor aggregation, metric -> MetricAggregator (see enable_aggregation)
+        self._aggregators: dict[str, MetricAggregator] = {}
         
 
 
     @classmethod
-    def from_database(cls, id: str, plant_type: str):
-        """Instantiate a new Plant object from existing plant types in the database."""
-        db_interface = DBInterface()
+    def from_database(cls, id: str, plant_type: str, db_interface: DBInterface | None = None):
+        """
+        Instantiate a new Plant object from existing plant types in the database.
+        For more than a handful of plants use plant_loader.load_plants instead.
+        """
+        db_interface = db_interface or DBInterface()
     
         (
             req_brightness, 
@@ -75,212 +110,405 @@ class Plant:
         """Detach device from Plant."""
         self.devices.remove_device(device)
 
-    def update_moisture(self, moisture: Moisture):
-        self.act_moisture = moisture
+    def set_dirty_listener(self, listener: Callable[["Plant"], None] | None):
+        """Register the callback invoked when the plant becomes dirty (event-driven mode)."""
+        self._dirty_listener = listener
+
+    def mark_dirty(self):
+        """Flag the plant for evaluation. The listener is only called on the clean -> dirty edge."""
+        if self.dirty:
+            return
+        self.dirty = True
+        if self._dirty_listener is not None:
+            self._dirty_listener(self)
+
+    def enable_aggregation(
+            self,
+            strategy: str = STRATEGY_MEAN,
+            metrics: tuple[str, ...] = ("moisture", "brightness", "temperature", "humidity"),
+            **options,
+        ):
+        """
+        Merge the readings of all sensors of each metric instead of keeping the
+        last one. 'options' are passed to aggregation.MetricAggregator.
+        """
+        for metric in metrics:
+            self._aggregators[metric] = MetricAggregator(strategy, **options)
+
+    def _set_metric(self, metric: str, value):
+        if value is not None and metric in _DISCRETE_METRICS:
+            enum = _DISCRETE_METRICS[metric]
+            value = enum(min(max(round(value), min(enum)), max(enum)))
+        if value != getattr(self, f"act_{metric}"):
+            setattr(self, f"act_{metric}", value)
+            self.mark_dirty()
+        elif self._out_of_range(metric, value):
+            # Unchanged but still out of range: evaluate again, as a polled plant would be
+            self.mark_dirty()
+
+    def _out_of_range(self, metric: str, value) -> bool:
+        # Same rules as _evaluate_metric: missing, zero and NaN readings are not acted on
+        if not value or value != value:
+            return False
+        delta = getattr(self, f"_req_{metric}") - value
+        return not within_threshold(delta, _METRIC_THRESHOLDS[metric])
+
+    def _update_metric(self, metric: str, value, source, ts: float | None):
+        aggregator = self._aggregators.get(metric)
+        if aggregator is None or source is None:
+            self._set_metric(metric, value)
+            return
+        merged = aggregator.update(source, float(value), ts)
+        if merged is not None:
+            self._set_metric(metric, merged)
+
+    def refresh_aggregates(self, now: float | None = None):
+        """Drop stale sensor readings; a metric without fresh readings goes back to None."""
+        for metric, aggregator in self._aggregators.items():
+            if len(aggregator):
+                self._set_metric(metric, aggregator.value(now))
 
-    def update_brightness(self, brightness: Brightness):
-        self.act_brightness = brightness
+    def update_moisture(self, moisture: Moisture, source=None, ts: float | None = None):
+        self._update_metric("moisture", moisture, source, ts)
 
-    def update_temperature(self, temperature: float):
-        self.act_temperature = temperature
+    def update_brightness(self, brightness: Brightness, source=None, ts: float | None = None):
+        self._update_metric("brightness", brightness, source, ts)
 
-    def update_humidity(self, humidity: float):
-        self.act_humidity = humidity
+    def update_temperature(self, temperature: float, source=None, ts: float | None = None):
+        self._update_metric("temperature", temperature, source, ts)
+
+    def update_humidity(self, humidity: float, source=None, ts: float | None = None):
+        self._update_metric("humidity", humidity, source, ts)
 
     def send_alert(self, subject: str):
         # TODO
         # Send email/notification
         print(subject)
 
+    async def send_alert_async(self, subject: str):
+        """send_alert on a worker thread, so a slow notification never blocks the event loop."""
+        await asyncio.to_thread(self.send_alert, subject)
+
     def start_plant_care(self):
         self.keep_alive = True
 
     def stop_plant_care(self):
         self.keep_alive = False
 
-    def check_metric(self,
+    def _evaluate_metric(self,
         metric: str,
-        act_value: str, 
+        act_value: str,
         req_value: str,
         threshold: float,
-    ):
+    ) -> tuple[str, float] | None:
+        """Log the state of one metric and return the (message, delta) to act on, if any."""
         metric_msgs: MetricMessages = getattr(Textbook, metric)
 
-        if not act_value:
-            return
+        # No reading yet (None, 0) or a NaN one: nothing to act on, as in PlantTable.evaluate
+        if not act_value or act_value != act_value:
+            return None
         
         delta = req_value - act_value
 
-        if abs(delta) < threshold:
-            self.logger.info(metric_msgs.ok)
-            return
+        if within_threshold(delta, threshold):
+            self.logger.log_state(LogLevel.INFO, metric, "ok", metric_msgs.ok)
+            return None
         elif delta < 0:
-            msg = metric_msgs.high
+            state, msg = "high", metric_msgs.high
         else:
-            msg = metric_msgs.low
+            state, msg = "low", metric_msgs.low
 
-        self.logger.info(msg)
+        self.logger.log_state(LogLevel.INFO, metric, state, msg)
+        return msg, delta
+
+    def check_metric(self,
+        metric: str,
+        act_value: str, 
+        req_value: str,
+        threshold: float,
+    ):
+        result = self._evaluate_metric(metric, act_value, req_value, threshold)
+        if result is None:
+            return
+        msg, delta = result
     
         if self.alert_address:
             self.send_alert(msg)
 
         self.devices.send_command(metric, delta)
 
-        
-    def keep_alive_cycle(self):
-        self.check_metric(
-            "moisture",
-            act_value=self.act_moisture,
-            req_value=self._req_moisture,
-            threshold=0,
-        )
+    async def check_metric_async(self,
+        metric: str,
+        act_value: str,
+        req_value: str,
+        threshold: float,
+        limits=None,
+    ):
+        """Coroutine version of check_metric; 'limits' caps concurrent commands per actuator type."""
+        result = self._evaluate_metric(metric, act_value, req_value, threshold)
+        if result is None:
+            return
+        msg, delta = result
 
-        self.check_metric(
-            "brightness",
-            act_value=self.act_brightness,
-            req_value=self._req_brightness,
-            threshold=0,
-        )
+        if self.alert_address:
+            if limits is None:
+                await self.send_alert_async(msg)
+            else:
+                async with limits.get("alert"):
+                    await self.send_alert_async(msg)
+
+        await self.devices.send_command_async(metric, delta, limits)
+
+    def _metric_checks(self) -> list[tuple[str, object, object, float]]:
+        """(metric, actual, required, threshold) for every metric of the care cycle."""
+        return [
+            ("moisture", self.act_moisture, self._req_moisture, _METRIC_THRESHOLDS["moisture"]),
+            ("brightness", self.act_brightness, self._req_brightness, _METRIC_THRESHOLDS["brightness"]),
+            ("temperature", self.act_temperature, self._req_temperature, _METRIC_THRESHOLDS["temperature"]),
+            ("humidity", self.act_humidity, self._req_humidity, _METRIC_THRESHOLDS["humidity"]),
+        ]
 
-        self.check_metric(
-            "temperature",
-            act_value=self.act_temperature,
-            req_value=self._req_temperature,
-            threshold=TEMPERATURE_THRESHOLD,
-        )
+    def keep_alive_cycle(self):
+        if PROFILER.enabled and PROFILER.sample():
+            self._keep_alive_cycle_profiled()
+            return
+        if self._aggregators:
+            self.refresh_aggregates()
+        for metric, act_value, req_value, threshold in self._metric_checks():
+            self.check_metric(
+                metric,
+                act_value=act_value,
+                req_value=req_value,
+                threshold=threshold,
+            )
 
-        self.check_metric(
-            "humidity",
-            act_value=self.act_humidity,
-            req_value=self._req_humidity,
-            threshold=HUMIDITY_THRESHOLD,
-        )
+    def _keep_alive_cycle_profiled(self):
+        """keep_alive_cycle with every phase timed into the profiler."""
+        profiler = PROFILER
+        started = perf_counter()
+        if self._aggregators:
+            self.refresh_aggregates()
+        checks = self._metric_checks()
+        profiler.record("snapshot", perf_counter() - started)
+
+        for metric, act_value, req_value, threshold in checks:
+            check_phase, command_phase = _CHECK_PHASES[metric]
+            check_started = perf_counter()
+            result = self._evaluate_metric(metric, act_value, req_value, threshold)
+            if result is not None:
+                msg, delta = result
+                if self.alert_address:
+                    phase_started = perf_counter()
+                    self.send_alert(msg)
+                    profiler.record("send_alert", perf_counter() - phase_started)
+                phase_started = perf_counter()
+                self.devices.send_command(metric, delta)
+                profiler.record(command_phase, perf_counter() - phase_started)
+            profiler.record(check_phase, perf_counter() - check_started)
+
+        profiler.record("cycle", perf_counter() - started)
+
+    async def keep_alive_cycle_async(self, limits=None):
+        if self._aggregators:
+            self.refresh_aggregates()
+        for metric, act_value, req_value, threshold in self._metric_checks():
+            await self.check_metric_async(
+                metric,
+                act_value=act_value,
+                req_value=req_value,
+                threshold=threshold,
+                limits=limits,
+            )
 
 
 class PlantThreadManager:
     """
-    Manages the threads for the registered plants.
-    Every 'interval_seconds' it wakes up and spawns worker threads for every plant
-    which has 
+    Manages the care cycles of the registered plants.
+    Every plant is scheduled on a fixed pool of worker threads, by default every
+    'interval_seconds' (plants can have their own interval). Plants whose
+    keep_alive flag is off are skipped when their turn comes.
+
+    With 'event_driven' a plant is evaluated when one of its readings changes
+    instead: changes within 'debounce_seconds' are coalesced into a single
+    evaluation. A reading that repeats an out-of-range value counts as a
+    change too, so a plant that stays too dry keeps being cared for; every
+    plant is still swept every 'sweep_interval_seconds' as a safety net.
+
+    With a 'command_policy' actuator commands of all plants are merged and
+    rate limited per device (see commands.CommandDispatcher).
+
+    With a 'snapshot_path' the runtime state of every plant is written there
+    every 'snapshot_interval_seconds' and on stop; from_snapshot restores it
+    on startup (see snapshot.py).
     """
 
-    def __init__(self, plants: list[Plant] = None, interval_seconds: int = 300):
+    def __init__(
+            self,
+            plants: list[Plant] = None,
+            interval_seconds: int = 300,
+            workers: int = 8,
+            jitter: float = 0.1,
+            event_driven: bool = False,
+            debounce_seconds: float = 5.0,
+            sweep_interval_seconds: float = 3600,
+            command_policy: CommandPolicy | None = None,
+            snapshot_path: str | None = None,
+            snapshot_interval_seconds: float = 60,
+        ):
         self._plants = list(plants) if plants is not None else []
-        self._interval = interval_seconds
+        self._interval = sweep_interval_seconds if event_driven else interval_seconds
+        self._intervals: dict[str, float] = {}
+        self._event_driven = event_driven
+        self._debounce = debounce_seconds
 
         self._lock = threading.Lock()
-        self._stop_event = threading.Event()
-        self._manager_thread: threading.Thread | None = None
+        self._scheduler = WorkerPoolScheduler(workers=workers, jitter=jitter, name="PlantThreadManager")
+        self._commands = CommandDispatcher(command_policy, self._scheduler) if command_policy else None
+        self._snapshot_path = snapshot_path
 
         self.logger = Logger(name="PlantThreadManager")
 
-    def add_plant(self, plant: Plant):
-        """Add a plant to be managed."""
+        for plant in self._plants:
+            self._schedule(plant)
+        if snapshot_path:
+            self._scheduler.schedule(("snapshot",), self.write_snapshot, snapshot_interval_seconds)
+
+    @classmethod
+    def from_snapshot(
+            cls,
+            path: str,
+            devices: Mapping[int, Device] | None = None,
+            **kwargs,
+        ) -> "PlantThreadManager":
+        """
+        Create a manager with the plants, readings, flags, intervals, devices
+        and aggregation settings of the snapshot at 'path' (raises
+        snapshot.SnapshotError if it is missing or corrupt; load the plants
+        from the database then).
+        'devices' (database id -> device) are the devices the server sends
+        commands through; plants are wired to them. Stored devices missing
+        from it are restored as RemoteDevices that only record their
+        commands, so plants using them do not act until the next reload.
+        """
+        started = time.perf_counter()
+        plants, intervals, created_at = read_snapshot(path, devices)
+        kwargs.setdefault("snapshot_path", path)
+        manager = cls(**kwargs)
+        for plant in plants:
+            manager.add_plant(plant, intervals.get(plant.id))
+        manager.logger.info(
+            f"Restored {len(plants)} plants from a {time.time() - created_at:.0f}s old snapshot "
+            f"in {(time.perf_counter() - started) * 1000:.1f}ms."
+        )
+        live = set(map(id, (devices or {}).values()))
+        detached = {id(device) for plant in plants for device in plant.devices.devices} - live
+        if detached:
+            manager.logger.warning(
+                f"{len(detached)} restored devices are not attached to live devices; "
+                f"their commands are only recorded."
+            )
+        return manager
+
+    def write_snapshot(self, path: str | None = None):
+        """Write the runtime state of every managed plant to 'path' (default: snapshot_path)."""
+        path = path or self._snapshot_path
+        with self._lock:
+            plants = list(self._plants)
+            intervals = dict(self._intervals)
+        started = perf_counter()
+        try:
+            write_snapshot(path, plants, intervals)
+            if PROFILER.enabled:
+                PROFILER.record("snapshot_write", perf_counter() - started)
+        except (OSError, struct.error, SnapshotError) as exc:
+            # The previous snapshot stays in place
+            self.logger.error(f"Could not write snapshot {path}: {exc}")
+
+    def _schedule(self, plant: Plant, delay: float | None = None):
+        interval = self._intervals.get(plant.id, self._interval)
+        if self._commands is not None:
+            plant.devices.command_dispatcher = self._commands
+        if self._event_driven:
+            plant.set_dirty_listener(self._on_plant_dirty)
+            self._scheduler.schedule(plant, lambda: self._on_plant_dirty(plant), interval, delay)
+            if plant.dirty:
+                self._on_plant_dirty(plant)
+        else:
+            self._scheduler.schedule(plant, lambda: self._run_keep_alive_once(plant), interval, delay)
+
+    def _on_plant_dirty(self, plant: Plant):
+        """Queue a debounced evaluation; further changes before it runs are coalesced."""
+        self._scheduler.schedule_once(
+            ("evaluate", plant), lambda: self._run_dirty_once(plant), self._debounce
+        )
+
+    def _run_dirty_once(self, plant: Plant):
+        # Clear first, so readings arriving during the cycle trigger another one
+        plant.dirty = False
+        self._run_keep_alive_once(plant)
+
+    def add_plant(self, plant: Plant, interval_seconds: float | None = None):
+        """Add a plant to be managed, optionally with its own interval."""
         with self._lock:
             self._plants.append(plant)
+            if interval_seconds is not None:
+                self._intervals[plant.id] = interval_seconds
+            self._schedule(plant)
 
     def remove_plant(self, plant: Plant):
         """Remove a plant from being managed."""
         with self._lock:
             self._plants = [p for p in self._plants if p is not plant]
+            self._intervals.pop(plant.id, None)
+            self._scheduler.unschedule(plant)
+            self._scheduler.unschedule(("evaluate", plant))
+            plant.set_dirty_listener(None)
+            if self._commands is not None:
+                plant.devices.command_dispatcher = None
+
+    def set_plant_interval(self, plant: Plant, interval_seconds: float):
+        """Change how often a managed plant is checked (swept, in event-driven mode)."""
+        with self._lock:
+            if not any(p is plant for p in self._plants):
+                raise ValueError(f"Plant {plant.id} is not managed by this PlantThreadManager")
+            self._intervals[plant.id] = interval_seconds
+            self._schedule(plant)
 
     def start(self):
         """
-        Start the background manager thread (if not already running).
+        Start the scheduler and its worker pool (if not already running).
         """
-        if self._manager_thread and self._manager_thread.is_alive():
-            # Main thread already running
-            return
+        self._scheduler.start()
 
-        self._stop_event.clear()
-        self._manager_thread = threading.Thread(
-            target=self._run_loop,
-            daemon=True,
-        )
-        self._manager_thread.start()
-
-    def stop(self):
+    def stop(self, drain: bool = True):
         """
-        Signal the manager thread to stop and wait for it to finish.
+        Stop scheduling new cycles. With 'drain' the cycles already handed to
+        the workers are finished before returning.
         """
-        self._stop_event.set()
-        if self._manager_thread:
-            self._manager_thread.join()
+        self._scheduler.stop(drain=drain)
+        if self._snapshot_path:
+            self.write_snapshot()
 
-    def _run_loop(self):
+    def stats(self) -> dict:
         """
-        Internal loop that wakes up every interval, spawns worker threads for
-        all plants that have keep_alive == True, waits for those workers
-        to finish, then sleeps again.
+        Run, skip and overrun counters of the scheduler, plus command counters
+        (if shaped) and the phase profile (while profiling.PROFILER is enabled).
         """
-        while not self._stop_event.is_set():
-            # Take a snapshot of the plants under a lock
-            with self._lock:
-                plants_snapshot = list(self._plants)
-
-            worker_threads: list[threading.Thread] = []
-
-            for plant in plants_snapshot:
-                if getattr(plant, "keep_alive", False):
-                    t = threading.Thread(
-                        target=self._run_keep_alive_once,
-                        args=(plant,),
-                        daemon=True,
-                    )
-                    t.start()
-                    worker_threads.append(t)
-
-            # Wait for all keep_alive calls of this cycle to complete
-            for t in worker_threads:
-                t.join()
-
-            # Sleep until the next cycle, but wake up early if stopping
-            if self._stop_event.wait(self._interval):
-                break
-
+        stats = self._scheduler.stats()
+        if self._commands is not None:
+            stats["commands"] = self._commands.stats()
+        if PROFILER.enabled:
+            stats["profile"] = PROFILER.dump()
+        return stats
 
     def _run_keep_alive_once(self, plant: Plant):
         """
         Wrapper so that any exception in keep_alive is caught and doesn't kill
-        the manager loop.
+        the worker.
         """
+        if not getattr(plant, "keep_alive", False):
+            return
         try:
             plant.keep_alive_cycle()
         except Exception as exc:
             self.logger.error(f"Error in keep_alive for plant {plant.id}: {exc}")
-
-
-def test_threads():
-    plant1 = Plant(
-        id='plant1',
-        plant_type="low_maintenance",
-        req_brightness=Brightness.LOW_LIGHT,
-        req_humidity=20.0,
-        req_temperature=21.0,
-        req_moisture=Moisture.DRY
-    )
-
-    plant2 = Plant(
-        id='plant2',
-        plant_type="high_maintenance",
-        req_brightness=Brightness.DIRECT_LIGHT,
-        req_humidity=40.0,
-        req_temperature=21.0,
-        req_moisture=Moisture.WET
-    )
-
-    plant1.act_humidity = 30
-    plant2.act_temperature = 20
-    plant2.act_moisture = Moisture.DRY
-
-    plant1.keep_alive = True
-    plant2.keep_alive = True
-
-    manager = PlantThreadManager([plant1, plant2], interval_seconds=60)
-    manager.start()
-
-    time.sleep(300)
-
-
-if __name__ == "__main__":
-    test_threads()
\ No newline at end of file
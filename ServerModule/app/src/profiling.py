@@ -0,0 +1,161 @@
+import bisect
+import itertools
+import signal
+import threading
+import time
+
+# Upper bounds of the latency buckets in seconds (1us .. 10s, 1-2-5 steps); the last bucket is open
+BUCKET_BOUNDS = tuple(
+    base * 10.0 ** exponent
+    for exponent in range(-6, 1)
+    for base in (1, 2, 5)
+) + (10.0,)
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram; recording is one bisect and a few adds."""
+
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKET_BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds: float):
+        self.counts[bisect.bisect_left(BUCKET_BOUNDS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, fraction: float) -> float:
+        """Upper bound of the bucket holding the given fraction of samples."""
+        if not self.count:
+            return 0.0
+        target = fraction * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return BUCKET_BOUNDS[i] if i < len(BUCKET_BOUNDS) else self.max
+        return self.max
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "mean_us": round(self.total / self.count * 1e6, 2) if self.count else 0.0,
+            "p50_us": round(self.percentile(0.50) * 1e6, 2),
+            "p99_us": round(self.percentile(0.99) * 1e6, 2),
+            "max_us": round(self.max * 1e6, 2),
+        }
+
+
+class Profiler:
+    """
+    Per-phase timers and counters of the care loop, off by default.
+    When enabled, one in every 'sample_every' cycles is timed phase by phase
+    (the others only pay for one attribute check and a counter), which keeps
+    the overhead low enough to leave on in production.
+    """
+
+    def __init__(self, sample_every: int = 64):
+        self.enabled = False
+        self.sample_every = sample_every
+        self._ticks = itertools.count()
+        self._lock = threading.Lock()
+        self.histograms: dict[str, LatencyHistogram] = {}
+        self.counters: dict[str, int] = {}
+        self.started_at: float | None = None
+
+    def enable(self, sample_every: int | None = None):
+        if sample_every is not None:
+            self.sample_every = max(1, sample_every)
+        self.started_at = time.time()
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        with self._lock:
+            self.histograms = {}
+            self.counters = {}
+        self.started_at = time.time() if self.enabled else None
+
+    def sample(self) -> bool:
+        """True for the cycles that should be timed."""
+        return next(self._ticks) % self.sample_every == 0
+
+    def record(self, phase: str, seconds: float):
+        with self._lock:
+            histogram = self.histograms.get(phase)
+            if histogram is None:
+                histogram = self.histograms[phase] = LatencyHistogram()
+            histogram.record(seconds)
+
+    def count(self, name: str, amount: int = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def dump(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "sample_every": self.sample_every,
+                "seconds": round(time.time() - self.started_at, 1) if self.started_at else 0.0,
+                "phases": {phase: h.summary() for phase, h in sorted(self.histograms.items())},
+                "counters": dict(sorted(self.counters.items())),
+            }
+
+    def report(self) -> str:
+        """Human readable table of the dump."""
+        dump = self.dump()
+        lines = [f"Profile over {dump['seconds']}s, 1 in {dump['sample_every']} cycles timed"]
+        lines.append(f"{'phase':<28}{'count':>10}{'mean_us':>10}{'p50_us':>10}{'p99_us':>10}{'max_us':>12}")
+        for phase, s in dump["phases"].items():
+            lines.append(
+                f"{phase:<28}{s['count']:>10}{s['mean_us']:>10}{s['p50_us']:>10}{s['p99_us']:>10}{s['max_us']:>12}"
+            )
+        for name, value in dump["counters"].items():
+            lines.append(f"{name:<28}{value:>10}")
+        return "\n".join(lines)
+
+
+PROFILER = Profiler()
+
+
+_toggle_lock = threading.Lock()
+
+
+def toggle_profiling():
+    """Enable profiling, or print the report, reset and disable it if it is on."""
+    with _toggle_lock:
+        if PROFILER.enabled:
+            print(PROFILER.report())
+            PROFILER.disable()
+            PROFILER.reset()
+        else:
+            PROFILER.enable()
+
+
+def install_signal_handler(signum: int | None = None) -> bool:
+    """
+    Toggle profiling with 'signum' (default SIGUSR1) on a running server: the
+    first signal enables it, the next one prints the report, resets and
+    disables it. Returns False, installing nothing, when no signum is given
+    and the platform has no SIGUSR1.
+    The handler only starts a thread: the report takes the profiler lock,
+    which the code the signal interrupted may be holding.
+    """
+    if signum is None:
+        signum = getattr(signal, "SIGUSR1", None)
+        if signum is None:
+            return False
+
+    def handler(_signum, _frame):
+        threading.Thread(target=toggle_profiling, name="ProfilerToggle", daemon=True).start()
+
+    signal.signal(signum, handler)
+    return True
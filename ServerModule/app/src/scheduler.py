@@ -0,0 +1,303 @@
+import heapq
+import itertools
+import queue
+import random
+import threading
+import time
+from typing import Callable, Hashable
+
+from logger import Logger
+from profiling import PROFILER
+
+
+class _Job:
+    __slots__ = ("key", "callback", "interval", "busy", "cancelled", "rerun", "due", "previous", "waiter")
+
+    def __init__(self, key: Hashable, callback: Callable[[], None], interval: float | None):
+        # interval is None for one-shot jobs
+        self.key = key
+        self.callback = callback
+        self.interval = interval
+        self.busy = False
+        self.cancelled = False
+        self.rerun: float | None = None
+        self.due = 0.0
+        # The job this one replaced while it was still queued or running; runs wait for it
+        self.previous: "_Job | None" = None
+        # A one-shot job that came due during this job's run; it is queued when the run ends
+        self.waiter: "_Job | None" = None
+
+    def _replace(self, old: "_Job | None"):
+        if old is None:
+            return
+        old.cancelled = True
+        if old.busy:
+            self.previous = old
+
+    def in_flight(self) -> bool:
+        """True while this job, or the one it replaced, is queued or running."""
+        if self.previous is not None and not self.previous.in_flight():
+            self.previous = None
+        return self.busy or self.previous is not None
+
+    def blocker(self) -> "_Job":
+        """The queued or running job an in-flight job waits for (itself or one it replaced)."""
+        job = self
+        while not job.busy:
+            job = job.previous
+        return job
+
+
+class WorkerPoolScheduler:
+    """
+    Runs periodic and one-shot jobs on a fixed pool of worker threads.
+    Due times are kept in a heap, so the dispatcher only wakes up when the next
+    job is due. A job that is still queued or running when it becomes due again
+    is skipped and counted instead of being stacked up; a one-shot job that
+    waits for the run of the job it replaced is queued as soon as that run ends.
+    """
+
+    def __init__(
+            self,
+            workers: int = 8,
+            jitter: float = 0.1,
+            spread_start: bool = True,
+            name: str = "WorkerPoolScheduler",
+        ):
+        self._worker_count = workers
+        self._jitter = jitter
+        self._spread_start = spread_start
+
+        self._heap: list[tuple[float, int, _Job]] = []
+        self._jobs: dict[Hashable, _Job] = {}
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+
+        self._dispatcher: threading.Thread | None = None
+        self._workers: list[threading.Thread] = []
+        self._stopping = False
+
+        self._stats_lock = threading.Lock()
+        self.runs = 0
+        self.skipped = 0
+        self.coalesced = 0
+        self.overruns = 0
+        self.errors = 0
+        self.max_lag = 0.0
+
+        self.logger = Logger(name=name)
+
+    def __len__(self) -> int:
+        return len(self._jobs)
+
+    def schedule(self, key: Hashable, callback: Callable[[], None], interval: float, delay: float | None = None):
+        """
+        Run 'callback' every 'interval' seconds. Re-scheduling an existing key
+        replaces its job; the new job does not start while a run of the old one
+        is still queued or in progress. Without an explicit 'delay' the first run is placed
+        randomly inside the first interval (or immediately if spread_start is off).
+        """
+        if interval <= 0:
+            raise ValueError("interval must be positive")
+        if delay is None:
+            delay = random.uniform(0, interval) if self._spread_start else 0.0
+
+        job = _Job(key, callback, interval)
+        with self._cond:
+            job._replace(self._jobs.get(key))
+            self._jobs[key] = job
+            self._push(job, time.monotonic() + delay)
+            self._cond.notify()
+
+    def schedule_once(self, key: Hashable, callback: Callable[[], None], delay: float = 0.0):
+        """
+        Run 'callback' once after 'delay' seconds. Requests for a key that is
+        already pending are coalesced into the pending run; a request arriving
+        while the run is in progress queues exactly one more run after it.
+        """
+        with self._cond:
+            job = self._jobs.get(key)
+            if job is not None and job.interval is None and not job.cancelled:
+                if job.busy and job.rerun is None:
+                    job.rerun = delay
+                else:
+                    self.coalesced += 1
+                return
+
+            new_job = _Job(key, callback, None)
+            new_job._replace(job)
+            job = self._jobs[key] = new_job
+            self._push(job, time.monotonic() + delay)
+            self._cond.notify()
+
+    def unschedule(self, key: Hashable):
+        """Cancel a job. Its heap entry is dropped lazily when it comes due."""
+        with self._cond:
+            job = self._jobs.pop(key, None)
+            if job is not None:
+                job.cancelled = True
+
+    def _push(self, job: _Job, due: float):
+        heapq.heappush(self._heap, (due, next(self._seq), job))
+
+    def _next_due(self, job: _Job, due: float, now: float) -> float:
+        next_due = due + job.interval
+        if self._jitter:
+            next_due += random.uniform(-self._jitter, self._jitter) * job.interval / 2
+        # Never schedule into the past after falling behind, start over from now
+        return next_due if next_due > now else now + job.interval
+
+    def start(self):
+        """Start the dispatcher and the worker threads (if not already running)."""
+        if self._dispatcher and self._dispatcher.is_alive():
+            return
+
+        self._stopping = False
+        self._workers = [
+            threading.Thread(target=self._work_loop, daemon=True)
+            for _ in range(self._worker_count)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+        self._dispatcher = threading.Thread(target=self._dispatch_loop, daemon=True)
+        self._dispatcher.start()
+
+    def stop(self, drain: bool = True, timeout: float | None = None):
+        """
+        Stop dispatching new runs. With 'drain' the workers finish every run
+        that was already handed to them, otherwise queued runs are dropped and
+        only the runs in progress are waited for.
+        """
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._dispatcher:
+            self._dispatcher.join(timeout)
+
+        if not drain:
+            while True:
+                try:
+                    job = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if job is None:
+                    continue
+                job.busy = False
+                if job.interval is None:
+                    with self._cond:
+                        if self._jobs.get(job.key) is job:
+                            del self._jobs[job.key]
+
+        for _ in self._workers:
+            self._queue.put(None)
+        for worker in self._workers:
+            worker.join(timeout)
+        self._workers = []
+
+    def _dispatch_loop(self):
+        while True:
+            with self._cond:
+                while not self._stopping:
+                    if not self._heap:
+                        self._cond.wait()
+                        continue
+                    wait = self._heap[0][0] - time.monotonic()
+                    if wait <= 0:
+                        break
+                    self._cond.wait(wait)
+
+                if self._stopping:
+                    return
+
+                now = time.monotonic()
+                while self._heap and self._heap[0][0] <= now:
+                    due, _, job = heapq.heappop(self._heap)
+                    if job.cancelled:
+                        continue
+
+                    if job.in_flight() and job.interval is None:
+                        # A one-shot run is never dropped: it goes after the run it waits for
+                        job.blocker().waiter = job
+                    elif job.in_flight():
+                        self.skipped += 1
+                        if PROFILER.enabled:
+                            PROFILER.count("cycles_skipped")
+                        self.logger.warning(f"Job {job.key!r} is still running, skipped this run.")
+                    else:
+                        job.busy = True
+                        job.due = due
+                        self.max_lag = max(self.max_lag, now - due)
+                        self._queue.put(job)
+
+                    if job.interval is not None:
+                        self._push(job, self._next_due(job, due, now))
+
+    def _work_loop(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+
+            started = time.monotonic()
+            if PROFILER.enabled and PROFILER.sample():
+                # Due time -> start of the run, including the wait for a free worker
+                PROFILER.record("dispatch", started - job.due)
+            failed = False
+            try:
+                job.callback()
+            except Exception as exc:
+                failed = True
+                self.logger.error(f"Error in job {job.key!r}: {exc}")
+            finally:
+                duration = time.monotonic() - started
+                if job.interval is None:
+                    self._finish_once(job)
+                else:
+                    with self._cond:
+                        job.busy = False
+                        self._release_waiter(job)
+
+            overrun = job.interval is not None and duration > job.interval
+            with self._stats_lock:
+                self.runs += 1
+                self.errors += failed
+                self.overruns += overrun
+            if overrun:
+                if PROFILER.enabled:
+                    PROFILER.count("cycles_overrun")
+                self.logger.warning(
+                    f"Job {job.key!r} took {duration:.3f}s, longer than its {job.interval}s interval."
+                )
+
+    def _finish_once(self, job: _Job):
+        """Retire a finished one-shot job, or put it back if a rerun was requested meanwhile."""
+        with self._cond:
+            job.busy = False
+            self._release_waiter(job)
+            if job.rerun is not None and not job.cancelled:
+                self._push(job, time.monotonic() + job.rerun)
+                job.rerun = None
+                self._cond.notify()
+            elif self._jobs.get(job.key) is job:
+                del self._jobs[job.key]
+
+    def _release_waiter(self, job: _Job):
+        # Called with self._cond held, once job is no longer busy
+        waiter, job.waiter = job.waiter, None
+        if waiter is not None and not waiter.cancelled:
+            self._push(waiter, time.monotonic())
+            self._cond.notify()
+
+    def stats(self) -> dict:
+        return {
+            "jobs": len(self._jobs),
+            "workers": self._worker_count,
+            "runs": self.runs,
+            "skipped": self.skipped,
+            "coalesced": self.coalesced,
+            "overruns": self.overruns,
+            "errors": self.errors,
+            "max_lag_seconds": self.max_lag,
+        }
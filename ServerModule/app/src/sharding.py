@@ -0,0 +1,566 @@
+import itertools
+import multiprocessing
+import os
+import pickle
+import queue
+import threading
+import time
+import zlib
+from collections import deque
+from multiprocessing.connection import Connection, wait
+
+from plants import Plant, PlantThreadManager
+from devices import Capability, Device, RemoteDevice, remote_device_class
+from logger import Logger, LogLevel
+from measurements import Brightness, Moisture
+
+READING_METRICS = ("moisture", "brightness", "temperature", "humidity")
+
+# What a send or receive on the pipe of a crashed shard raises
+_PIPE_ERRORS = (EOFError, OSError)
+
+
+def shard_for(plant_id: str, shards: int) -> int:
+    """
+    Stable shard index of a plant (the same in every process and run). Numeric
+    ids, as loaded from the database, go to id % shards, so a shard's plants can
+    be selected in SQL (see DBInterface.iter_plant_rows).
+    """
+    if plant_id.isascii() and plant_id.isdigit():
+        return int(plant_id) % shards
+    return zlib.crc32(plant_id.encode("utf-8")) % shards
+
+
+def plant_spec(plant: Plant) -> dict:
+    """Picklable description of a Plant, used to rebuild it inside a shard."""
+    return {
+        "id": plant.id,
+        "plant_type": plant.plant_type,
+        "req_brightness": int(plant._req_brightness),
+        "req_humidity": plant._req_humidity,
+        "req_temperature": plant._req_temperature,
+        "req_moisture": int(plant._req_moisture),
+        "alert_address": plant.alert_address,
+        "keep_alive": plant.keep_alive,
+        # (capability mask, name) per device, in DeviceCollection order
+        "devices": [(int(device.capability_mask), device.name) for device in plant.devices.devices],
+    }
+
+
+class ShardDevice(RemoteDevice):
+    """
+    Stand-in for a device of a sharded plant. Its commands are queued in the
+    shard's outbox as (plant id, device position, metric, delta) and sent back
+    to the manager, which runs them on the real device.
+    """
+    def __init__(self, name: str, plant_id: str, position: int, outbox: deque):
+        super().__init__(name)
+        self._plant_id = plant_id
+        self._position = position
+        self._outbox = outbox
+
+    def _command(self, metric: str, delta: float):
+        self._outbox.append((self._plant_id, self._position, metric, delta))
+
+
+def _plant_from_spec(spec: dict, log_level: LogLevel, outbox: deque) -> Plant:
+    plant = Plant(
+        id=spec["id"],
+        plant_type=spec["plant_type"],
+        req_brightness=Brightness(spec["req_brightness"]),
+        req_humidity=spec["req_humidity"],
+        req_temperature=spec["req_temperature"],
+        req_moisture=Moisture(spec["req_moisture"]),
+        alert_address=spec["alert_address"],
+    )
+    plant.keep_alive = spec["keep_alive"]
+    plant.logger.level = log_level
+    for position, (mask, name) in enumerate(spec.get("devices", ())):
+        plant.register_device(remote_device_class(Capability(mask), ShardDevice)(name, plant.id, position, outbox))
+    return plant
+
+
+def _send(conn: Connection, kind: str, payload=None):
+    conn.send_bytes(pickle.dumps((kind, payload), protocol=pickle.HIGHEST_PROTOCOL))
+
+
+def _recv(conn: Connection):
+    return pickle.loads(conn.recv_bytes())
+
+
+def _shard_main(
+        shard_id: int,
+        conn: Connection,
+        manager_kwargs: dict,
+        log_level: LogLevel,
+        flush_interval: float,
+    ):
+    """
+    Entry point of a shard process: one PlantThreadManager fed over a pipe.
+    Device commands of its plants are sent back every 'flush_interval', and
+    before the reply to a cycle request. Requests ("cycle", "stats") carry an
+    id that is sent back with the reply.
+    """
+    plants: dict[str, Plant] = {}
+    outbox: deque = deque()
+    send_lock = threading.Lock()
+    stopping = threading.Event()
+    manager = PlantThreadManager(**manager_kwargs)
+    manager.start()
+
+    def send(kind: str, payload=None):
+        with send_lock:
+            _send(conn, kind, payload)
+
+    def send_commands():
+        commands = []
+        while outbox:
+            commands.append(outbox.popleft())
+        if commands:
+            send("commands", commands)
+
+    def forward_commands():
+        while not stopping.wait(flush_interval):
+            try:
+                send_commands()
+            except _PIPE_ERRORS:
+                break
+
+    threading.Thread(target=forward_commands, daemon=True).start()
+
+    while True:
+        try:
+            kind, payload = _recv(conn)
+        except EOFError:
+            break
+
+        if kind == "plants":
+            for spec in payload:
+                plant = _plant_from_spec(spec, log_level, outbox)
+                old = plants.get(plant.id)
+                if old is not None:
+                    manager.remove_plant(old)
+                plants[plant.id] = plant
+                manager.add_plant(plant)
+        elif kind == "remove":
+            for plant_id in payload:
+                plant = plants.pop(plant_id, None)
+                if plant is not None:
+                    manager.remove_plant(plant)
+        elif kind == "readings":
+            for plant_id, metric, value in payload:
+                plant = plants.get(plant_id)
+                if plant is not None:
+                    getattr(plant, f"update_{metric}")(value)
+        elif kind == "cycle":
+            started = time.perf_counter()
+            for plant in plants.values():
+                manager._run_keep_alive_once(plant)
+            send_commands()
+            send("cycle", (payload, (len(plants), time.perf_counter() - started)))
+        elif kind == "stats":
+            stats = manager.stats()
+            stats["plants"] = len(plants)
+            send("stats", (payload, stats))
+        elif kind == "stop":
+            manager.stop()
+            send_commands()
+            send("stopped")
+            break
+
+    stopping.set()
+    conn.close()
+
+
+class _Shard:
+    def __init__(self, index: int):
+        self.index = index
+        self.process: multiprocessing.Process | None = None
+        self.conn: Connection | None = None
+        # Guards process, conn, buffer and the shard's entries in the manager's tables
+        self.lock = threading.Lock()
+        self.buffer: list[tuple[str, str, object]] = []
+        self.restarts = 0
+        # Bumped on every spawn, so replies of a replaced process can be told apart
+        self.generation = 0
+        # (generation, kind, (request id, result)) of the replies read by the
+        # supervisor; "lost" (payload None) when the process was replaced
+        self.replies: queue.Queue = queue.Queue()
+
+
+class ShardedPlantManager:
+    """
+    Spreads plant care over 'shards' worker processes, each running its own
+    PlantThreadManager, so keep_alive cycles are not capped by one GIL.
+    Plants are assigned by a stable hash of their id. Readings are buffered
+    per shard and sent as batched frames over a pipe.
+
+    A plant's devices stay in this process: the shard gets a stand-in per
+    device (see ShardDevice) and sends the commands back, and a command thread
+    runs them on the real devices. Devices attached after add_plant are only
+    picked up when the plant is added again.
+
+    The supervisor thread reads every reply and restarts crashed shards; a
+    restarted shard gets its plants and their last readings replayed, and
+    requests that were waiting on it are sent again. Every request carries an
+    id, so a late reply to a request that timed out is never taken for the
+    answer to the next one.
+    """
+
+    def __init__(
+            self,
+            shards: int | None = None,
+            batch_size: int = 512,
+            flush_interval: float = 0.05,
+            log_level: LogLevel = LogLevel.INFO,
+            request_timeout: float = 60.0,
+            request_retries: int = 1,
+            **manager_kwargs,
+        ):
+        self._shard_count = shards or os.cpu_count() or 1
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self._log_level = log_level
+        self._request_timeout = request_timeout
+        self._request_retries = request_retries
+        self._manager_kwargs = manager_kwargs
+
+        self._context = multiprocessing.get_context("spawn")
+        self._shards = [_Shard(i) for i in range(self._shard_count)]
+        # Per shard, guarded by its lock: plant specs, their devices and their
+        # last reading per metric (only for added plants, so it stays bounded)
+        self._specs: list[dict[str, dict]] = [{} for _ in range(self._shard_count)]
+        self._devices: list[dict[str, tuple[Device, ...]]] = [{} for _ in range(self._shard_count)]
+        self._last_readings: list[dict[str, dict[str, object]]] = [{} for _ in range(self._shard_count)]
+
+        self._request_lock = threading.Lock()
+        self._request_ids = itertools.count(1)
+        self._stopping = threading.Event()
+        self._supervisor: threading.Thread | None = None
+        self._flusher: threading.Thread | None = None
+        # (shard, commands) batches from the supervisor; a slow device does not hold up restarts
+        self._command_queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._commander: threading.Thread | None = None
+
+        # Only updated by the command thread (and by stop() once it has finished)
+        self.commands_run = 0
+        self.commands_failed = 0
+        self.commands_dropped = 0
+
+        self.logger = Logger(name="ShardedPlantManager")
+
+    def shard_of(self, plant_id: str) -> int:
+        return shard_for(plant_id, self._shard_count)
+
+    def _spawn(self, shard: _Shard):
+        # Caller holds shard.lock
+        parent_conn, child_conn = self._context.Pipe()
+        process = self._context.Process(
+            target=_shard_main,
+            args=(shard.index, child_conn, self._manager_kwargs, self._log_level, self._flush_interval),
+            daemon=True,
+        )
+        process.start()
+        child_conn.close()
+        shard.process = process
+        shard.conn = parent_conn
+        shard.generation += 1
+
+        # Replay the shard's plants and their last known readings
+        specs = list(self._specs[shard.index].values())
+        if not specs:
+            return
+        last_readings = self._last_readings[shard.index]
+        readings = [
+            (spec["id"], metric, value)
+            for spec in specs
+            for metric, value in last_readings.get(spec["id"], {}).items()
+        ]
+        try:
+            _send(parent_conn, "plants", specs)
+            if readings:
+                _send(parent_conn, "readings", readings)
+        except _PIPE_ERRORS as exc:
+            # Died right away; the supervisor notices and spawns it again
+            self.logger.error(f"Shard {shard.index} failed during replay: {exc}")
+
+    def _respawn(self, shard: _Shard, reason: str):
+        """Replace the shard's process. Caller holds shard.lock."""
+        if self._stopping.is_set():
+            return
+        old = shard.process
+        old.join(1.0)
+        if old.is_alive():
+            old.terminate()
+            old.join(1.0)
+        self.logger.error(f"Shard {shard.index} {reason} (exit code {old.exitcode}), restarting.")
+        shard.conn.close()
+        # The replay sends the last reading of every metric, buffered ones included
+        shard.buffer.clear()
+        shard.restarts += 1
+        shard.replies.put((shard.generation, "lost", None))
+        self._spawn(shard)
+
+    def _restart_if_current(self, shard: _Shard, conn: Connection, reason: str):
+        with shard.lock:
+            # Another thread may have replaced it already
+            if shard.conn is conn and shard.process is not None:
+                self._respawn(shard, reason)
+
+    def _send_to(self, shard: _Shard, kind: str, payload=None):
+        """Send a frame, restarting the shard if its pipe is broken. Caller holds shard.lock."""
+        if shard.process is None:
+            # Not started yet: start() replays the plants
+            return
+        try:
+            _send(shard.conn, kind, payload)
+        except _PIPE_ERRORS as exc:
+            # The replay carries the change this frame was for
+            self._respawn(shard, f"unreachable ({exc!r})")
+
+    def start(self):
+        """Start every shard process plus the flusher, supervisor and command threads."""
+        if self._supervisor and self._supervisor.is_alive():
+            return
+        self._stopping.clear()
+        for shard in self._shards:
+            with shard.lock:
+                self._spawn(shard)
+
+        self._flusher = threading.Thread(target=self._flush_loop, daemon=True)
+        self._flusher.start()
+        self._commander = threading.Thread(target=self._command_loop, daemon=True)
+        self._commander.start()
+        self._supervisor = threading.Thread(target=self._supervise_loop, daemon=True)
+        self._supervisor.start()
+
+    def stop(self, timeout: float = 10.0):
+        """Flush pending readings, stop every shard, run their last commands and wait for the processes."""
+        self._stopping.set()
+        for thread in (self._flusher, self._supervisor):
+            if thread:
+                thread.join(timeout)
+        if self._commander:
+            # After the batches the supervisor queued, so commands keep their order
+            self._command_queue.put(None)
+            self._commander.join(timeout)
+        self.flush()
+
+        # The supervisor is gone: the replies are read here
+        for shard in self._shards:
+            with shard.lock:
+                if shard.process is None:
+                    continue
+                try:
+                    _send(shard.conn, "stop")
+                except _PIPE_ERRORS:
+                    pass
+            try:
+                while shard.conn.poll(timeout):
+                    kind, payload = _recv(shard.conn)
+                    if kind == "commands":
+                        self._run_commands(shard, payload)
+                    elif kind == "stopped":
+                        break
+            except _PIPE_ERRORS:
+                pass
+            with shard.lock:
+                shard.process.join(timeout)
+                if shard.process.is_alive():
+                    shard.process.terminate()
+                shard.conn.close()
+                shard.process = None
+
+    def _register(self, shard: _Shard, spec: dict, plant: Plant | dict):
+        # Caller holds shard.lock
+        self._specs[shard.index][spec["id"]] = spec
+        if isinstance(plant, Plant):
+            self._devices[shard.index][spec["id"]] = plant.devices.devices
+        else:
+            self._devices[shard.index].pop(spec["id"], None)
+
+    def add_plant(self, plant: Plant | dict):
+        spec = plant if isinstance(plant, dict) else plant_spec(plant)
+        shard = self._shards[self.shard_of(spec["id"])]
+        with shard.lock:
+            self._register(shard, spec, plant)
+            self._send_to(shard, "plants", [spec])
+
+    def add_plants(self, plants: list[Plant | dict]):
+        """Add many plants with one frame per shard."""
+        per_shard: list[list[tuple[dict, Plant | dict]]] = [[] for _ in self._shards]
+        for plant in plants:
+            spec = plant if isinstance(plant, dict) else plant_spec(plant)
+            per_shard[self.shard_of(spec["id"])].append((spec, plant))
+
+        for shard, entries in zip(self._shards, per_shard):
+            if not entries:
+                continue
+            with shard.lock:
+                for spec, plant in entries:
+                    self._register(shard, spec, plant)
+                self._send_to(shard, "plants", [spec for spec, _ in entries])
+
+    def remove_plant(self, plant_id: str):
+        shard = self._shards[self.shard_of(plant_id)]
+        with shard.lock:
+            self._specs[shard.index].pop(plant_id, None)
+            self._devices[shard.index].pop(plant_id, None)
+            self._last_readings[shard.index].pop(plant_id, None)
+            self._send_to(shard, "remove", [plant_id])
+
+    def update(self, plant_id: str, metric: str, value):
+        """Route a reading to the owning shard (sent with the next batch). Readings of unknown plants are ignored."""
+        if metric not in READING_METRICS:
+            raise ValueError(f"Unknown metric: {metric}")
+
+        shard = self._shards[self.shard_of(plant_id)]
+        with shard.lock:
+            if plant_id not in self._specs[shard.index]:
+                return
+            self._last_readings[shard.index].setdefault(plant_id, {})[metric] = value
+            shard.buffer.append((plant_id, metric, value))
+            if len(shard.buffer) >= self._batch_size:
+                self._flush_shard(shard)
+
+    def _flush_shard(self, shard: _Shard):
+        # Caller holds shard.lock
+        if not shard.buffer or shard.process is None:
+            return
+        batch, shard.buffer = shard.buffer, []
+        self._send_to(shard, "readings", batch)
+
+    def flush(self):
+        for shard in self._shards:
+            with shard.lock:
+                self._flush_shard(shard)
+
+    def _flush_loop(self):
+        while not self._stopping.wait(self._flush_interval):
+            self.flush()
+
+    def _command_loop(self):
+        while True:
+            item = self._command_queue.get()
+            if item is None:
+                return
+            self._run_commands(*item)
+
+    def _run_commands(self, shard: _Shard, commands: list):
+        """Run the device commands a shard sent back on the real devices."""
+        with shard.lock:
+            devices = self._devices[shard.index]
+            targets = [(devices.get(plant_id), position, metric, delta) for plant_id, position, metric, delta in commands]
+
+        for plant_devices, position, metric, delta in targets:
+            if plant_devices is None or position >= len(plant_devices):
+                # Removed, or added as a bare spec
+                self.commands_dropped += 1
+                continue
+            device = plant_devices[position]
+            try:
+                getattr(device, f"change_{metric}")(delta)
+                self.commands_run += 1
+            except Exception as exc:
+                self.commands_failed += 1
+                self.logger.error(f"Command change_{metric} failed on {device!r}: {exc}")
+
+    def _supervise_loop(self):
+        while not self._stopping.is_set():
+            watched = {}
+            for shard in self._shards:
+                with shard.lock:
+                    if shard.process is None:
+                        continue
+                    watched[shard.conn] = (shard, shard.conn, shard.generation)
+                    watched[shard.process.sentinel] = (shard, shard.conn, shard.generation)
+            try:
+                ready = wait(list(watched), timeout=0.5)
+            except (OSError, ValueError):
+                # A pipe was closed by a restart in another thread; rebuild the list
+                continue
+
+            for handle in ready:
+                if self._stopping.is_set():
+                    return
+                shard, conn, generation = watched[handle]
+                if handle is not conn:
+                    self._restart_if_current(shard, conn, "exited")
+                    continue
+                try:
+                    kind, payload = _recv(conn)
+                except _PIPE_ERRORS:
+                    self._restart_if_current(shard, conn, "closed its pipe")
+                    continue
+                if kind == "commands":
+                    self._command_queue.put((shard, payload))
+                else:
+                    shard.replies.put((generation, kind, payload))
+
+    def _send_request(self, shard: _Shard, kind: str) -> tuple[int, int]:
+        """Send 'kind' to one shard; returns the generation of the process that got it and the request id."""
+        request_id = next(self._request_ids)
+        with shard.lock:
+            if shard.process is None:
+                raise RuntimeError(f"Shard {shard.index} is not running, call start() first")
+            self._flush_shard(shard)
+            # Taken before sending: if the send finds the shard dead, the "lost"
+            # reply of this generation makes _await_reply send the request again
+            generation = shard.generation
+            self._send_to(shard, kind, request_id)
+            return generation, request_id
+
+    def _await_reply(self, shard: _Shard, kind: str, generation: int, request_id: int):
+        """Wait for the reply to request 'request_id', sending it again if the shard is restarted meanwhile."""
+        deadline = time.monotonic() + self._request_timeout
+        retries = 0
+        while True:
+            try:
+                reply_generation, reply_kind, payload = shard.replies.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                raise TimeoutError(f"Shard {shard.index} did not answer {kind!r} within {self._request_timeout}s")
+            if reply_generation != generation:
+                continue
+            if reply_kind == "lost":
+                retries += 1
+                if retries > self._request_retries:
+                    raise RuntimeError(f"Shard {shard.index} was restarted {retries} times while answering {kind!r}")
+                generation, request_id = self._send_request(shard, kind)
+                continue
+            reply_id, result = payload
+            # Anything else is a late reply to an earlier request that timed out
+            if reply_kind == kind and reply_id == request_id:
+                return result
+
+    def _request(self, kind: str) -> list:
+        """Send 'kind' to every shard, then collect the replies (shards work in parallel)."""
+        with self._request_lock:
+            sent = [self._send_request(shard, kind) for shard in self._shards]
+            return [
+                self._await_reply(shard, kind, generation, request_id)
+                for shard, (generation, request_id) in zip(self._shards, sent)
+            ]
+
+    def run_cycle_once(self) -> dict:
+        """Run one keep_alive cycle for every plant on every shard in parallel."""
+        started = time.perf_counter()
+        results = self._request("cycle")
+        elapsed = time.perf_counter() - started
+        plants = sum(count for count, _ in results)
+        return {
+            "shards": self._shard_count,
+            "plants": plants,
+            "seconds": round(elapsed, 3),
+            "plants_per_second": round(plants / elapsed) if elapsed else None,
+        }
+
+    def stats(self) -> dict:
+        shard_stats = self._request("stats")
+        for shard, stats in zip(self._shards, shard_stats):
+            stats["restarts"] = shard.restarts
+        return {
+            "shards": shard_stats,
+            "commands_run": self.commands_run,
+            "commands_failed": self.commands_failed,
+            "commands_dropped": self.commands_dropped,
+        }
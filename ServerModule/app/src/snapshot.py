@@ -0,0 +1,250 @@
+import math
+import os
+import struct
+import time
+import zlib
+from typing import Mapping
+
+from aggregation import STRATEGIES
+from devices import Capability, Device, remote_device_class
+from measurements import Brightness, Moisture
+
+MAGIC = b"PSNP"
+VERSION = 2
+# Version 1 snapshots (no aggregator settings) can still be read
+_READABLE_VERSIONS = (1, VERSION)
+
+# magic, version, reserved, created_at, device count, plant count, payload length, payload crc32
+_HEADER = struct.Struct("<4sHHdIIII")
+_STR_LEN = struct.Struct("<H")
+# device id (-1: unknown), capability mask; followed by name and unique identifier
+_DEVICE = struct.Struct("<qB")
+# required x4, actual x4 (moisture, brightness, temperature, humidity), NaN is None
+_VALUES = struct.Struct("<8d")
+# flags, interval (NaN: manager default), device count; followed by device table indexes
+_PLANT_TAIL = struct.Struct("<BdH")
+_DEVICE_INDEX = struct.Struct("<I")
+# aggregator count; followed by one _AGGREGATOR per aggregated metric (version 2)
+_AGGREGATOR_COUNT = struct.Struct("<B")
+# metric index, strategy index, max age, trim fraction, half life
+_AGGREGATOR = struct.Struct("<BBddd")
+_METRICS = ("moisture", "brightness", "temperature", "humidity")
+
+_NONE_STR = 0xFFFF
+_FLAG_KEEP_ALIVE = 1
+_FLAG_DIRTY = 2
+
+
+class SnapshotError(Exception):
+    """The snapshot file is missing, truncated, corrupt or of another version."""
+
+
+def _pack_str(out: bytearray, value: str | None):
+    if value is None:
+        out += _STR_LEN.pack(_NONE_STR)
+        return
+    data = value.encode("utf-8")
+    if len(data) >= _NONE_STR:
+        raise SnapshotError(f"String of {len(data)} bytes is too long for a snapshot: {value[:40]!r}...")
+    out += _STR_LEN.pack(len(data))
+    out += data
+
+
+def _unpack_str(view: memoryview, offset: int) -> tuple[str | None, int]:
+    (length,) = _STR_LEN.unpack_from(view, offset)
+    offset += _STR_LEN.size
+    if length == _NONE_STR:
+        return None, offset
+    return str(view[offset:offset + length], "utf-8"), offset + length
+
+
+def _float(value) -> float:
+    return math.nan if value is None else float(value)
+
+
+def _value(number: float):
+    return None if number != number else number
+
+
+def _level(number: float, enum):
+    """The level nearest to 'number' (clamped to the enum's range, like Plant._set_metric)."""
+    if number != number:
+        return None
+    return enum(round(min(max(number, min(enum)), max(enum))))
+
+
+def encode_snapshot(plants: list, intervals: dict[str, float] | None = None) -> bytes:
+    """
+    Serialize the runtime state of 'plants': definition, last readings,
+    keep_alive / dirty flags, own interval, device wiring and aggregation
+    settings.
+    Devices are written once in a table that plants refer to by index, so
+    shared devices stay shared. A device is stored by database id, name,
+    unique identifier and capabilities; decode_snapshot attaches the live
+    device with that id if it is given one.
+    Aggregators only keep their settings: the per-sensor readings are not
+    written, their merged value is already in the act_* readings.
+    """
+    intervals = intervals or {}
+    device_table = bytearray()
+    device_index: dict[int, int] = {}
+    payload = bytearray()
+
+    for plant in plants:
+        _pack_str(payload, plant.id)
+        _pack_str(payload, plant.plant_type)
+        _pack_str(payload, plant.alert_address)
+        payload += _VALUES.pack(
+            _float(plant._req_moisture), _float(plant._req_brightness),
+            _float(plant._req_temperature), _float(plant._req_humidity),
+            _float(plant.act_moisture), _float(plant.act_brightness),
+            _float(plant.act_temperature), _float(plant.act_humidity),
+        )
+        flags = (_FLAG_KEEP_ALIVE if plant.keep_alive else 0) | (_FLAG_DIRTY if plant.dirty else 0)
+        devices = plant.devices.devices
+        payload += _PLANT_TAIL.pack(flags, _float(intervals.get(plant.id)), len(devices))
+
+        for device in devices:
+            index = device_index.get(id(device))
+            if index is None:
+                index = device_index[id(device)] = len(device_index)
+                device_id = getattr(device, "device_id", None)
+                device_table += _DEVICE.pack(-1 if device_id is None else device_id, int(device.capability_mask))
+                _pack_str(device_table, device.name)
+                _pack_str(device_table, getattr(device, "unique_identifier", None))
+            payload += _DEVICE_INDEX.pack(index)
+
+        aggregators = [(metric, plant._aggregators[metric]) for metric in _METRICS if metric in plant._aggregators]
+        payload += _AGGREGATOR_COUNT.pack(len(aggregators))
+        for metric, aggregator in aggregators:
+            payload += _AGGREGATOR.pack(
+                _METRICS.index(metric), STRATEGIES.index(aggregator.strategy),
+                aggregator.max_age, aggregator.trim_fraction, aggregator.half_life,
+            )
+
+    body = device_table + payload
+    header = _HEADER.pack(
+        MAGIC, VERSION, 0, time.time(), len(device_index), len(plants), len(body), zlib.crc32(body)
+    )
+    return header + body
+
+
+def decode_snapshot(
+        data: bytes,
+        devices: Mapping[int, Device] | None = None,
+    ) -> tuple[list, dict[str, float], float]:
+    """
+    Rebuild (plants, intervals, created_at) from encode_snapshot output.
+    Plants are wired to the device of 'devices' (database id -> device) with
+    the stored id. Any other device comes back as a RemoteDevice with the
+    stored capabilities, which only records the commands it is given: pass
+    the devices the server actually sends commands through wherever the
+    restored plants have to act.
+    Aggregators come back with their settings but no sensor readings; they
+    fill up again as readings arrive.
+    """
+    from plants import Plant
+
+    if len(data) < _HEADER.size:
+        raise SnapshotError("Snapshot is truncated.")
+    magic, version, _, created_at, device_count, plant_count, length, checksum = _HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise SnapshotError("Not a plant snapshot.")
+    if version not in _READABLE_VERSIONS:
+        raise SnapshotError(f"Unsupported snapshot version {version}.")
+
+    view = memoryview(data)[_HEADER.size:]
+    if len(view) != length or zlib.crc32(view) != checksum:
+        raise SnapshotError("Snapshot checksum mismatch.")
+
+    live = devices or {}
+    table: list[Device] = []
+    plants: list[Plant] = []
+    intervals: dict[str, float] = {}
+    offset = 0
+    try:
+        for _ in range(device_count):
+            device_id, mask = _DEVICE.unpack_from(view, offset)
+            offset += _DEVICE.size
+            name, offset = _unpack_str(view, offset)
+            unique_identifier, offset = _unpack_str(view, offset)
+            device = live.get(device_id) if device_id >= 0 else None
+            if device is None:
+                device = remote_device_class(Capability(mask))(
+                    name, None if device_id < 0 else device_id, unique_identifier
+                )
+            table.append(device)
+
+        for _ in range(plant_count):
+            plant_id, offset = _unpack_str(view, offset)
+            plant_type, offset = _unpack_str(view, offset)
+            alert_address, offset = _unpack_str(view, offset)
+            (
+                req_moisture, req_brightness, req_temperature, req_humidity,
+                act_moisture, act_brightness, act_temperature, act_humidity,
+            ) = _VALUES.unpack_from(view, offset)
+            offset += _VALUES.size
+            flags, interval, plant_devices = _PLANT_TAIL.unpack_from(view, offset)
+            offset += _PLANT_TAIL.size
+
+            plant = Plant(
+                id=plant_id,
+                plant_type=plant_type,
+                req_brightness=_level(req_brightness, Brightness),
+                req_humidity=_value(req_humidity),
+                req_temperature=_value(req_temperature),
+                req_moisture=_level(req_moisture, Moisture),
+                alert_address=alert_address,
+            )
+            plant.act_moisture = _level(act_moisture, Moisture)
+            plant.act_brightness = _level(act_brightness, Brightness)
+            plant.act_temperature = _value(act_temperature)
+            plant.act_humidity = _value(act_humidity)
+            plant.keep_alive = bool(flags & _FLAG_KEEP_ALIVE)
+            plant.dirty = bool(flags & _FLAG_DIRTY)
+            if interval == interval:
+                intervals[plant_id] = interval
+
+            for _ in range(plant_devices):
+                (index,) = _DEVICE_INDEX.unpack_from(view, offset)
+                offset += _DEVICE_INDEX.size
+                plant.register_device(table[index])
+
+            if version >= 2:
+                (aggregator_count,) = _AGGREGATOR_COUNT.unpack_from(view, offset)
+                offset += _AGGREGATOR_COUNT.size
+                for _ in range(aggregator_count):
+                    metric, strategy, max_age, trim_fraction, half_life = _AGGREGATOR.unpack_from(view, offset)
+                    offset += _AGGREGATOR.size
+                    plant.enable_aggregation(
+                        STRATEGIES[strategy], (_METRICS[metric],),
+                        max_age_seconds=max_age, trim_fraction=trim_fraction, half_life_seconds=half_life,
+                    )
+
+            plants.append(plant)
+    except (struct.error, UnicodeDecodeError, KeyError, IndexError, ValueError) as exc:
+        raise SnapshotError(f"Malformed snapshot: {exc}") from exc
+
+    return plants, intervals, created_at
+
+
+def write_snapshot(path: str, plants: list, intervals: dict[str, float] | None = None) -> int:
+    """Atomically replace 'path' with a snapshot of 'plants'. Returns the size in bytes."""
+    data = encode_snapshot(plants, intervals)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return len(data)
+
+
+def read_snapshot(path: str, devices: Mapping[int, Device] | None = None) -> tuple[list, dict[str, float], float]:
+    """decode_snapshot of the file at 'path'."""
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError as exc:
+        raise SnapshotError(f"Cannot read snapshot {path}: {exc}") from exc
+    return decode_snapshot(data, devices)
@@ -0,0 +1,7 @@
+import sys
+from pathlib import Path
+
+# The server modules import each other by bare name (the Dockerfile copies src/ to the working directory)
+SRC = Path(__file__).parent.parent / "src"
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
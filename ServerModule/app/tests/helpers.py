@@ -0,0 +1,24 @@
+from plants import Plant
+from logger import LogLevel
+from measurements import Brightness, Moisture
+
+
+def make_plant(id: str = "plant", keep_alive: bool = True, **actual) -> Plant:
+    """A plant with every reading on target (override with e.g. act_moisture=Moisture.DRY), logging muted."""
+    plant = Plant(
+        id=id,
+        plant_type="test",
+        req_brightness=Brightness.MEDIUM_LIGHT,
+        req_humidity=50.0,
+        req_temperature=21.0,
+        req_moisture=Moisture.MOIST,
+    )
+    plant.logger.level = LogLevel.ERROR
+    plant.act_brightness = Brightness.MEDIUM_LIGHT
+    plant.act_humidity = 50.0
+    plant.act_temperature = 21.0
+    plant.act_moisture = Moisture.MOIST
+    for name, value in actual.items():
+        setattr(plant, name, value)
+    plant.keep_alive = keep_alive
+    return plant
@@ -0,0 +1,88 @@
+import math
+import random
+import statistics
+
+import pytest
+
+from aggregation import (
+    MetricAggregator,
+    STRATEGY_FRESHNESS,
+    STRATEGY_MEAN,
+    STRATEGY_MEDIAN,
+    STRATEGY_TRIMMED_MEAN,
+)
+
+
+def reference(strategy: str, values: list[float], trim_fraction: float) -> float | None:
+    """The merged value by definition, from the sorted fresh values."""
+    if not values:
+        return None
+    if strategy == STRATEGY_MEAN:
+        return statistics.fmean(values)
+    if strategy == STRATEGY_MEDIAN:
+        return statistics.median(values)
+    ordered = sorted(values)
+    trim = int(math.floor(len(ordered) * trim_fraction))
+    kept = ordered[trim:len(ordered) - trim] if len(ordered) - 2 * trim > 0 else ordered
+    return statistics.fmean(kept)
+
+
+@pytest.mark.parametrize("strategy", [STRATEGY_MEAN, STRATEGY_MEDIAN, STRATEGY_TRIMMED_MEAN])
+@pytest.mark.parametrize("trim_fraction", [0.1, 0.25, 0.5])
+def test_matches_the_definition_under_replacement_and_expiry(strategy, trim_fraction):
+    rng = random.Random(11)
+    max_age = 50.0
+    aggregator = MetricAggregator(strategy, max_age_seconds=max_age, trim_fraction=trim_fraction)
+    latest: dict[int, tuple[float, float]] = {}
+
+    for step in range(3000):
+        now = float(step)
+        source = rng.randrange(40)
+        # Few distinct values, so duplicates cross the part boundaries
+        value = float(rng.randrange(12))
+        latest[source] = (now, value)
+        merged = aggregator.update(source, value, now)
+
+        fresh = [v for ts, v in latest.values() if ts >= now - max_age]
+        expected = reference(strategy, fresh, trim_fraction)
+        assert merged == pytest.approx(expected), step
+        assert len(aggregator) == len(fresh)
+
+
+def test_value_is_cached_until_a_source_changes():
+    aggregator = MetricAggregator(STRATEGY_TRIMMED_MEAN, max_age_seconds=100)
+    for source in range(10):
+        aggregator.update(source, float(source), ts=0.0)
+    first = aggregator.value(1.0)
+    aggregator._ordered = None  # would fail if the value were merged again
+    assert aggregator.value(2.0) == first
+
+
+def test_expired_sources_leave_and_empty_resets():
+    aggregator = MetricAggregator(STRATEGY_MEDIAN, max_age_seconds=10)
+    aggregator.update("a", 1.0, ts=0.0)
+    aggregator.update("b", 5.0, ts=8.0)
+    assert aggregator.value(9.0) == 3.0
+    assert aggregator.value(15.0) == 5.0
+    assert aggregator.value(30.0) is None
+    aggregator.update("c", 7.0, ts=31.0)
+    assert aggregator.value(31.0) == 7.0
+
+
+def test_out_of_order_reading_is_ignored():
+    aggregator = MetricAggregator(STRATEGY_MEAN)
+    aggregator.update("a", 10.0, ts=100.0)
+    assert aggregator.update("a", 0.0, ts=50.0) == 10.0
+
+
+def test_freshness_weights_newer_readings_more():
+    aggregator = MetricAggregator(STRATEGY_FRESHNESS, half_life_seconds=10, max_age_seconds=1000)
+    aggregator.update("old", 0.0, ts=0.0)
+    aggregator.update("new", 10.0, ts=10.0)
+    # Weights 1 and 2
+    assert aggregator.value(10.0) == pytest.approx(20.0 / 3)
+
+
+def test_unknown_strategy_is_rejected():
+    with pytest.raises(ValueError):
+        MetricAggregator("mode")
@@ -0,0 +1,122 @@
+import pytest
+
+from alert_rules import (
+    WindowRule, WindowRuleEngine, WindowAggregate, OutOfRangeAggregate, OPERATORS,
+    RULE_THRESHOLD, RULE_WINDOW_AVERAGE, RULE_RATE_OF_CHANGE, RULE_TIME_OUT_OF_RANGE, RULE_NO_DATA,
+)
+
+
+def rule(id, rule_type, op=">", threshold=0.0, device_id=1, window_minutes=10, duration_minutes=None):
+    return WindowRule(id, device_id, rule_type, op, threshold, window_minutes, duration_minutes)
+
+
+def test_window_mean_drops_expired_buckets():
+    window = WindowAggregate(600, buckets=60)
+    window.add(0, 10.0)
+    window.add(100, 20.0)
+    assert window.mean() == pytest.approx(15.0)
+    window.add(650, 30.0)       # the reading at t=0 has left the window
+    assert window.count == 2
+    assert window.mean() == pytest.approx(25.0)
+    window.expire(2000)
+    assert window.count == 0 and window.mean() is None
+
+
+def test_window_ignores_readings_older_than_the_window():
+    window = WindowAggregate(600, buckets=60)
+    window.add(1000, 5.0)
+    window.add(100, 50.0)
+    assert window.count == 1 and window.mean() == 5.0
+
+
+def test_slope_matches_a_linear_series():
+    window = WindowAggregate(3600, buckets=60)
+    for minute in range(30):
+        window.add(minute * 60, 20.0 + 0.1 * minute)   # 6 units per hour
+    assert window.slope_per_hour() == pytest.approx(6.0)
+
+
+def test_slope_stays_exact_far_from_the_origin():
+    # Thousands of windows in: the sums are re-centred instead of growing without bound
+    window = WindowAggregate(600, buckets=10)
+    start = 1_700_000_000.0
+    for i in range(20_000):
+        window.add(start + i * 30, 2.0 * i / 120)      # 2 units per hour
+    assert window.count == 20
+    assert window.slope_per_hour() == pytest.approx(2.0, rel=1e-6)
+
+
+def test_slope_needs_two_distinct_times():
+    window = WindowAggregate(600)
+    window.add(10, 1.0)
+    assert window.slope_per_hour() is None
+    window.add(10, 3.0)
+    assert window.slope_per_hour() is None
+
+
+def test_out_of_range_seconds_include_the_open_stretch():
+    series = OutOfRangeAggregate(600, OPERATORS["<"], 20.0, buckets=60)
+    series.add(0, 25.0)
+    series.add(100, 10.0)       # out of range from t=100
+    series.add(200, 25.0)       # back in range at t=200
+    assert series.seconds_out_of_range(200) == pytest.approx(100.0)
+    series.add(300, 10.0)
+    assert series.seconds_out_of_range(350) == pytest.approx(150.0)
+    assert series.seconds_out_of_range(5000) == pytest.approx(600.0)
+
+
+def test_engine_triggers_window_rules():
+    engine = WindowRuleEngine()
+    engine.add_rule(rule(1, RULE_THRESHOLD, ">", 30.0, window_minutes=None))
+    engine.add_rule(rule(2, RULE_WINDOW_AVERAGE, ">", 25.0))
+    engine.add_rule(rule(3, RULE_RATE_OF_CHANGE, ">", 50.0))
+    engine.add_rule(rule(4, RULE_TIME_OUT_OF_RANGE, ">", 28.0, duration_minutes=2))
+
+    assert engine.record(1, 20.0, ts=0) == []
+    triggered = {r.rule.id for r in engine.record(1, 31.0, ts=60)}
+    assert triggered == {1, 2, 3}       # mean 25.5, slope 660/h
+    triggered = {r.rule.id for r in engine.record(1, 31.0, ts=200)}
+    assert 4 in triggered               # above 28 since t=60
+
+
+def test_engine_no_data_after_silence():
+    engine = WindowRuleEngine()
+    engine.add_rule(rule(1, RULE_NO_DATA, window_minutes=5))
+    engine.record(1, 1.0, ts=1000)
+    assert engine.check_no_data(now=1000 + 299) == []
+    [result] = engine.check_no_data(now=1000 + 300)
+    assert result.rule.id == 1 and result.value == 300
+    engine.record(1, 1.0, ts=1400)
+    assert engine.check_no_data(now=1500) == []
+
+
+def test_engine_only_tracks_devices_with_rules():
+    engine = WindowRuleEngine()
+    engine.add_rule(rule(1, RULE_WINDOW_AVERAGE, device_id=1))
+    for device_id in range(2, 1000):
+        assert engine.record(device_id, 1.0, ts=0) == []
+    engine.record(1, 1.0, ts=0)
+    assert set(engine._last_seen) == {1}
+    engine.remove_rule(1)
+    assert engine._last_seen == {} and engine.memory_usage()["series"] == 0
+
+
+def test_engine_refuses_rules_beyond_max_series():
+    engine = WindowRuleEngine(max_series=2)
+    engine.add_rule(rule(1, RULE_WINDOW_AVERAGE, device_id=1))
+    engine.add_rule(rule(2, RULE_RATE_OF_CHANGE, device_id=1))    # shares the series of rule 1
+    engine.add_rule(rule(3, RULE_WINDOW_AVERAGE, device_id=2))
+    with pytest.raises(ValueError):
+        engine.add_rule(rule(4, RULE_WINDOW_AVERAGE, device_id=3))
+    engine.remove_rule(3)
+    engine.add_rule(rule(4, RULE_WINDOW_AVERAGE, device_id=3))
+
+
+def test_engine_rejects_invalid_rules():
+    engine = WindowRuleEngine()
+    with pytest.raises(ValueError):
+        engine.add_rule(rule(1, "bogus"))
+    with pytest.raises(ValueError):
+        engine.add_rule(rule(1, RULE_WINDOW_AVERAGE, op="~"))
+    with pytest.raises(ValueError):
+        engine.add_rule(rule(1, RULE_WINDOW_AVERAGE, window_minutes=None))
@@ -0,0 +1,122 @@
+import asyncio
+import threading
+
+from async_plants import AsyncPlantManager, ConcurrencyLimits
+from devices import Device, MoistureActuator
+from measurements import Moisture
+from tests.helpers import make_plant
+
+
+class SlowPump(Device, MoistureActuator):
+    """Moisture actuator whose command is a coroutine that waits for 'release', counting how many overlap."""
+
+    def __init__(self, name: str, tracker: dict, release: asyncio.Event):
+        super().__init__(name)
+        self._tracker = tracker
+        self._release = release
+
+    async def change_moisture(self, delta: float):
+        tracker = self._tracker
+        tracker["active"] += 1
+        tracker["peak"] = max(tracker["peak"], tracker["active"])
+        try:
+            await self._release.wait()
+        finally:
+            tracker["active"] -= 1
+            tracker["done"] += 1
+
+
+def dry_plants(count: int, tracker: dict, release: asyncio.Event):
+    plants = []
+    for i in range(count):
+        plant = make_plant(f"plant {i}", act_moisture=Moisture.DRY)
+        plant.register_device(SlowPump(f"pump {i}", tracker, release))
+        plants.append(plant)
+    return plants
+
+
+async def settle():
+    # Let every runnable task reach its next await
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+
+def test_actuator_limit_caps_concurrent_commands():
+    async def scenario():
+        tracker = {"active": 0, "peak": 0, "done": 0}
+        release = asyncio.Event()
+        manager = AsyncPlantManager(actuator_limits={"moisture": 2})
+        cycle = asyncio.create_task(manager.run_cycle_once(dry_plants(6, tracker, release)))
+        await settle()
+        assert tracker["active"] == 2
+        release.set()
+        await cycle
+        return tracker, manager
+
+    tracker, manager = asyncio.run(scenario())
+    assert tracker["peak"] == 2
+    assert tracker["done"] == 6
+    assert manager.errors == 0
+
+
+def test_cycle_limit_caps_concurrent_plants():
+    async def scenario():
+        tracker = {"active": 0, "peak": 0, "done": 0}
+        release = asyncio.Event()
+        manager = AsyncPlantManager(max_concurrent_cycles=3)
+        cycle = asyncio.create_task(manager.run_cycle_once(dry_plants(5, tracker, release)))
+        await settle()
+        running = len(manager._running)
+        release.set()
+        await cycle
+        return tracker, running
+
+    tracker, running = asyncio.run(scenario())
+    assert running == 3
+    assert tracker["peak"] == 3
+    assert tracker["done"] == 5
+
+
+def test_limits_are_per_actuator_type():
+    async def scenario():
+        limits = ConcurrencyLimits({"moisture": 1}, default=4)
+        return limits.get("moisture"), limits.get("moisture"), limits.get("brightness")
+
+    moisture, again, brightness = asyncio.run(scenario())
+    assert moisture is again
+    assert moisture._value == 1
+    assert brightness._value == 4
+
+
+def test_stop_cancels_cycles_past_the_timeout():
+    async def scenario():
+        tracker = {"active": 0, "peak": 0, "done": 0}
+        release = asyncio.Event()  # never set: the commands only end by cancellation
+        manager = AsyncPlantManager(dry_plants(4, tracker, release), interval_seconds=60)
+        for plant in list(manager._scheduled):
+            manager.add_plant(plant, delay=0)
+        await manager.start()
+        await settle()
+        started = tracker["active"]
+        await manager.stop(timeout=0.01)
+        return tracker, manager, started
+
+    tracker, manager, started = asyncio.run(scenario())
+    assert started == 4
+    assert tracker["active"] == 0
+    assert tracker["done"] == 4
+    assert manager.stats()["running"] == 0
+    assert manager.errors == 0
+    # Cancelled cycles give their slot back
+    assert manager._cycle_slots._value == manager._max_concurrent_cycles
+
+
+def test_send_alert_async_runs_off_the_event_loop():
+    threads = []
+    plant = make_plant(act_moisture=Moisture.DRY)
+    plant.alert_address = "grower@example.com"
+    plant.send_alert = lambda subject: threads.append(threading.current_thread())
+
+    asyncio.run(plant.keep_alive_cycle_async(ConcurrencyLimits()))
+    assert threads
+    assert all(thread is not threading.main_thread() for thread in threads)
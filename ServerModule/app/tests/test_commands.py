@@ -0,0 +1,118 @@
+from commands import ActuatorCommandQueue, CommandDispatcher, CommandPolicy, MERGE_SUM
+from devices import ComplexMoistureDevice
+
+
+class RecordingPump(ComplexMoistureDevice):
+    def __init__(self, name: str = "pump"):
+        super().__init__(name)
+        self.received = []
+
+    def change_moisture(self, delta: float):
+        self.received.append(delta)
+
+
+class ManualScheduler:
+    """schedule_once / unschedule of WorkerPoolScheduler, run by hand: the latest job per key wins."""
+
+    def __init__(self):
+        self.jobs = {}
+
+    def schedule_once(self, key, func, delay=0.0):
+        self.jobs[key] = (func, delay)
+
+    def unschedule(self, key):
+        self.jobs.pop(key, None)
+
+    def run_all(self):
+        jobs, self.jobs = self.jobs, {}
+        for func, _ in jobs.values():
+            func()
+
+
+def test_latest_merge_keeps_the_newest_delta_of_the_window():
+    pump = RecordingPump()
+    queue = ActuatorCommandQueue(pump, "moisture", CommandPolicy(merge_window_seconds=5, min_interval_seconds=0))
+    assert queue.submit(1.0, now=0) == 5
+    queue.submit(2.0, now=1)
+    queue.submit(0.5, now=2)
+    assert queue.flush(now=4) == 5
+    assert queue.flush(now=5) is None
+    assert pump.received == [0.5]
+    assert (queue.requested, queue.superseded, queue.issued, queue.deferred) == (3, 2, 1, 1)
+
+
+def test_sum_merge_adds_the_deltas():
+    pump = RecordingPump()
+    policy = CommandPolicy(merge_window_seconds=5, min_interval_seconds=0, merge=MERGE_SUM)
+    queue = ActuatorCommandQueue(pump, "moisture", policy)
+    for delta in (1.0, 2.0, 0.5):
+        queue.submit(delta, now=0)
+    queue.flush(now=5)
+    assert pump.received == [3.5]
+    assert queue.merged == 2
+
+
+def test_min_interval_holds_back_the_next_command():
+    pump = RecordingPump()
+    queue = ActuatorCommandQueue(pump, "moisture", CommandPolicy(merge_window_seconds=0, min_interval_seconds=30))
+    queue.submit(1.0, now=0)
+    queue.flush(now=0)
+    assert queue.submit(1.0, now=10) == 30
+    assert queue.flush(now=10) == 30
+    queue.flush(now=30)
+    assert pump.received == [1.0, 1.0]
+
+
+def test_duty_cycle_limits_commands_per_period():
+    pump = RecordingPump()
+    # 10% of 100s at 5s per command: 2 commands per period
+    policy = CommandPolicy(merge_window_seconds=0, min_interval_seconds=0, max_duty_cycle=0.1,
+                           duty_period_seconds=100, command_seconds=5)
+    assert policy.commands_per_period == 2
+    queue = ActuatorCommandQueue(pump, "moisture", policy)
+    for now in (0, 1):
+        queue.submit(1.0, now)
+        queue.flush(now)
+    queue.submit(1.0, now=2)
+    assert queue.flush(now=2) == 100
+    assert queue.flush(now=100) is None
+    assert len(pump.received) == 3
+
+
+def test_dispatcher_issues_one_merged_command_per_device():
+    scheduler = ManualScheduler()
+    dispatcher = CommandDispatcher(CommandPolicy(merge_window_seconds=0, min_interval_seconds=0), scheduler)
+    pumps = [RecordingPump(f"pump {i}") for i in range(2)]
+    for delta in (1.0, 2.0):
+        for pump in pumps:
+            dispatcher.submit(pump, "moisture", delta)
+    assert len(scheduler.jobs) == 2
+
+    scheduler.run_all()
+    assert [pump.received for pump in pumps] == [[2.0], [2.0]]
+    stats = dispatcher.stats()
+    assert (stats["actuators"], stats["requested"], stats["issued"], stats["superseded"]) == (2, 4, 2, 2)
+
+
+def test_dispatcher_forgets_removed_devices():
+    scheduler = ManualScheduler()
+    dispatcher = CommandDispatcher(CommandPolicy(), scheduler)
+    pump = RecordingPump()
+    dispatcher.submit(pump, "moisture", 1.0)
+    dispatcher.forget_device(pump)
+    assert scheduler.jobs == {}
+    assert dispatcher.stats()["actuators"] == 0
+
+
+def test_dispatcher_survives_a_failing_actuator():
+    class BrokenPump(RecordingPump):
+        def change_moisture(self, delta: float):
+            raise RuntimeError("offline")
+
+    scheduler = ManualScheduler()
+    dispatcher = CommandDispatcher(CommandPolicy(merge_window_seconds=0, min_interval_seconds=0), scheduler)
+    dispatcher.submit(BrokenPump(), "moisture", 1.0)
+    scheduler.run_all()
+    # Logged and dropped, not retried
+    assert scheduler.jobs == {}
+    assert dispatcher.stats()["issued"] == 1
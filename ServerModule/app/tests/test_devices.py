@@ -0,0 +1,42 @@
+import pytest
+
+from devices import Capability, ComplexMoistureDevice, DeviceCollection, SimpleMoisturizer
+from logger import Logger, LogLevel
+
+
+def make_collection() -> DeviceCollection:
+    return DeviceCollection("plant", Logger(name="plant", level=LogLevel.ERROR))
+
+
+def test_devices_is_read_only():
+    collection = make_collection()
+    collection.add_device(SimpleMoisturizer("probe"))
+    with pytest.raises(AttributeError):
+        collection.devices.append(ComplexMoistureDevice("pump"))
+    assert len(collection.devices) == 1
+
+
+def test_add_and_remove_keep_the_capability_index():
+    collection = make_collection()
+    pump, probe = ComplexMoistureDevice("pump"), SimpleMoisturizer("probe")
+    collection.add_device(pump)
+    collection.add_device(probe)
+    collection.add_device(pump)
+    assert collection.devices == (pump, probe)
+    assert collection.actuators("moisture") == [pump]
+    assert collection.with_capability(Capability.MOISTURE_READ) == [pump, probe]
+
+    collection.remove_device(pump)
+    assert collection.devices == (probe,)
+    assert collection.actuators("moisture") == []
+
+
+def test_send_command_splits_the_delta_between_actuators():
+    collection = make_collection()
+    pumps = [ComplexMoistureDevice(f"pump {i}") for i in range(2)]
+    for pump in pumps:
+        pump.update_moisture(1.0)
+        collection.add_device(pump)
+    collection.add_device(SimpleMoisturizer("probe"))
+    collection.send_command("moisture", 1.0)
+    assert [pump.read_moisture() for pump in pumps] == [1.5, 1.5]
@@ -0,0 +1,99 @@
+import os
+
+import pytest
+
+from log_store import TEMPLATES_SUFFIX, BinaryLogStore, LogReader
+from logger import Logger, LogLevel, LogThrottle, start_async_logging, stop_async_logging
+
+
+def write(directory, records, **options):
+    store = BinaryLogStore(str(directory), **options)
+    store.append_batch(records)
+    store.close()
+    return LogReader(str(directory))
+
+
+def test_round_trip_and_filters(tmp_path):
+    reader = write(tmp_path, [
+        (100.0, LogLevel.INFO, "plant1", "Moisture delta %s", (1,)),
+        (101.0, LogLevel.WARNING, "plant2", "No actuator for %s", ("moisture",)),
+        (102.0, LogLevel.ERROR, "plant1", "Pump failed", ()),
+    ])
+    assert [r.message for r in reader.query()] == ["Moisture delta 1", "No actuator for moisture", "Pump failed"]
+    assert [r.created for r in reader.query(name="plant1")] == [100.0, 102.0]
+    assert [r.name for r in reader.query(min_level=LogLevel.WARNING)] == ["plant2", "plant1"]
+    assert [r.created for r in reader.query(start=100.5, end=101.5)] == [101.0]
+    assert len(list(reader.query(limit=2))) == 2
+
+
+def test_fields_longer_than_64k_round_trip(tmp_path):
+    name = "plant-" + "n" * 70_000
+    template = "t" * 70_000 + " %s"
+    reader = write(tmp_path, [(1.0, LogLevel.INFO, name, template, ("end",))])
+    (record,) = reader.query(name=name)
+    assert record.template == template
+    assert record.message.endswith(" end")
+
+
+def test_templates_are_stored_once_per_segment(tmp_path):
+    template = "Plant moisture has reached critically low levels, delta %s"
+    reader = write(tmp_path, [(float(i), LogLevel.INFO, f"plant{i % 10}", template, (i,)) for i in range(1000)])
+    (tpl,) = [name for name in os.listdir(tmp_path) if name.endswith(TEMPLATES_SUFFIX)]
+    assert (tmp_path / tpl).read_bytes().count(template.encode()) == 1
+    segment_bytes = sum(os.path.getsize(tmp_path / name) for name in os.listdir(tmp_path) if name.endswith(".seg"))
+    assert segment_bytes < 1000 * len(template)
+    assert [r.message for r in reader.query(name="plant3")][:2] == [template % 3, template % 13]
+
+
+def test_indexed_query_in_later_segments_resolves_templates(tmp_path):
+    records = [(float(i), LogLevel.INFO, "plant", f"template {i % 7} %s", (i,)) for i in range(5000)]
+    reader = write(tmp_path, records, segment_bytes=20_000, index_every_bytes=512)
+    assert len([name for name in os.listdir(tmp_path) if name.endswith(".seg")]) > 2
+
+    found = list(reader.query(start=4000.0, end=4010.0))
+    assert [r.created for r in found] == [float(i) for i in range(4000, 4011)]
+    assert [r.message for r in found] == [f"template {i % 7} {i}" for i in range(4000, 4011)]
+
+
+def test_segments_of_another_format_are_skipped(tmp_path):
+    (tmp_path / "00000000-000000000000000.seg").write_bytes(b"\x10\x00\x00\x00old record format")
+    store = BinaryLogStore(str(tmp_path))
+    store.append(5.0, LogLevel.INFO, "plant", "new", ())
+    store.close()
+    assert [r.message for r in LogReader(str(tmp_path)).query()] == ["new"]
+
+
+@pytest.fixture
+def throttle(monkeypatch):
+    throttle = LogThrottle(repeat_after=None)
+    monkeypatch.setattr(Logger, "throttle", throttle)
+    return throttle
+
+
+def test_log_state_summaries_share_one_template(tmp_path, throttle):
+    start_async_logging(store=BinaryLogStore(str(tmp_path)), text=False)
+    try:
+        logger = Logger(name="plant")
+        for repeats in (3, 5, 7):
+            for _ in range(repeats):
+                logger.log_state(LogLevel.INFO, "humidity", "high", "Humidity at 100%")
+            for _ in range(2):
+                logger.log_state(LogLevel.INFO, "humidity", "ok", "Humidity ok")
+    finally:
+        stop_async_logging()
+
+    records = list(LogReader(str(tmp_path)).query())
+    # However many were suppressed: the counts are args, not new templates
+    assert {r.template for r in records} == {
+        "Humidity at 100%",
+        "Humidity ok (previous message repeated %d more times)",
+        "Humidity at 100%% (previous message repeated %d more times)",
+    }
+    assert [r.message for r in records] == [
+        "Humidity at 100%",
+        "Humidity ok (previous message repeated 2 more times)",
+        "Humidity at 100% (previous message repeated 1 more times)",
+        "Humidity ok (previous message repeated 4 more times)",
+        "Humidity at 100% (previous message repeated 1 more times)",
+        "Humidity ok (previous message repeated 6 more times)",
+    ]
@@ -0,0 +1,82 @@
+import threading
+
+import pytest
+
+from logger import Logger, LogLevel, LogThrottle
+from measurements import Moisture
+from plant_table import PlantTable
+from tests.helpers import make_plant
+
+
+@pytest.fixture
+def throttle(monkeypatch):
+    throttle = LogThrottle()
+    monkeypatch.setattr(Logger, "throttle", throttle)
+    return throttle
+
+
+def test_state_changes_pass_and_repeats_are_counted():
+    throttle = LogThrottle(repeat_after=None)
+    assert throttle.check(("plant", "moisture"), "low", 0) == (0, True)
+    assert throttle.check(("plant", "moisture"), "low", 1) is None
+    assert throttle.check(("plant", "moisture"), "low", 2) is None
+    assert throttle.check(("plant", "moisture"), "ok", 3) == (2, True)
+    assert (throttle.emitted, throttle.suppressed) == (2, 2)
+
+
+def test_persistent_state_is_repeated_by_default():
+    throttle = LogThrottle()
+    assert throttle.repeat_after is not None
+    throttle.check(("plant", "moisture"), "low", 0)
+    assert throttle.check(("plant", "moisture"), "low", throttle.repeat_after - 1) is None
+    assert throttle.check(("plant", "moisture"), "low", throttle.repeat_after) == (1, False)
+
+
+def test_sample_every_and_reset():
+    throttle = LogThrottle(repeat_after=None, sample_every=3)
+    throttle.check(("plant", "light"), "high", 0)
+    decisions = [throttle.check(("plant", "light"), "high", now) for now in range(1, 7)]
+    assert decisions == [None, None, (2, False), None, None, (2, False)]
+    throttle.reset(("plant", "light"))
+    assert throttle.check(("plant", "light"), "high", 7) == (0, True)
+    assert len(throttle) == 1
+
+
+def test_counts_stay_exact_across_threads():
+    throttle = LogThrottle(repeat_after=None)
+
+    def check_many(worker: int):
+        for i in range(2000):
+            throttle.check(("plant", i % 10), "low", float(i))
+
+    threads = [threading.Thread(target=check_many, args=(worker,)) for worker in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5.0)
+    assert throttle.emitted == 10
+    assert throttle.emitted + throttle.suppressed == 16000
+
+
+def test_log_state_writes_a_summary_when_the_state_changes(throttle, capsys):
+    logger = Logger(name="plant")
+    for _ in range(3):
+        logger.log_state(LogLevel.INFO, "moisture", "low", "Too dry")
+    logger.log_state(LogLevel.INFO, "moisture", "ok", "Fine")
+    lines = capsys.readouterr().out.splitlines()
+    assert len(lines) == 2
+    assert lines[0].endswith("Too dry")
+    assert lines[1].endswith("Fine (previous message repeated 2 more times)")
+
+
+def test_plant_table_out_of_range_messages_are_throttled(throttle, capsys):
+    plant = make_plant(act_moisture=Moisture.DRY)
+    plant.logger.level = LogLevel.INFO
+    table = PlantTable.from_plants([plant])
+    for _ in range(3):
+        table.run_care_cycle()
+
+    moisture_lines = [line for line in capsys.readouterr().out.splitlines() if "moisture" in line.lower()]
+    # Once for the low state (the missing actuator warning is throttled the same way)
+    assert len([line for line in moisture_lines if "[INFO]" in line]) == 1
+    assert throttle.suppressed >= 2
@@ -0,0 +1,95 @@
+import threading
+import time
+
+from logger import AsyncLogWriter, LogLevel
+
+WAIT = 5.0
+
+
+class FlakyStore:
+    """log_store stand-in: the first batch fails, later ones are kept; 'gate' holds appends back."""
+
+    def __init__(self, gate: threading.Event | None = None):
+        self.gate = gate
+        self.batches = []
+        self.closed = False
+        self._failed = False
+
+    def append_batch(self, records):
+        if self.gate is not None:
+            self.gate.wait(WAIT)
+        if not self._failed:
+            self._failed = True
+            raise RuntimeError("disk on fire")
+        self.batches.append(list(records))
+
+    def close(self):
+        self.closed = True
+
+
+def test_writer_survives_a_failing_batch(tmp_path, capsys):
+    store = FlakyStore()
+    writer = AsyncLogWriter(str(tmp_path / "server.log"), store=store, text=False, flush_interval=0.01)
+    writer.start()
+    writer.submit(1.0, LogLevel.INFO, "plant", "first", ())
+    # The next record must go in a batch of its own
+    deadline = time.monotonic() + WAIT
+    while not store._failed:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    writer.submit(2.0, LogLevel.INFO, "plant", "second %s", (2,))
+    writer.stop(WAIT)
+
+    assert [record[3] for batch in store.batches for record in batch] == ["second %s"]
+    assert "disk on fire" in capsys.readouterr().err
+    assert store.closed
+
+
+def test_stop_leaves_the_file_open_while_the_thread_is_writing(tmp_path):
+    gate = threading.Event()
+    store = FlakyStore(gate)
+    path = tmp_path / "server.log"
+    writer = AsyncLogWriter(str(path), store=store, flush_interval=0.01)
+    writer.start()
+    writer.submit(1.0, LogLevel.INFO, "plant", "held back", ())
+
+    writer.stop(timeout=0.05)
+    assert not store.closed
+    assert writer._stream is not None and not writer._stream.closed
+
+    thread = writer._thread
+    gate.set()
+    thread.join(WAIT)
+    assert store.closed
+    assert writer._stream is None
+    assert "held back" in path.read_text()
+
+
+def test_dropped_records_are_counted_exactly():
+    writer = AsyncLogWriter(max_pending=0)
+
+    def submit_many():
+        for i in range(2000):
+            writer.submit(float(i), LogLevel.INFO, "plant", "message", ())
+
+    threads = [threading.Thread(target=submit_many) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(WAIT)
+    assert writer.dropped == 16000
+
+
+def test_records_are_formatted_and_rotated(tmp_path):
+    path = tmp_path / "server.log"
+    writer = AsyncLogWriter(str(path), max_bytes=200, backups=2, batch_size=1)
+    writer.start()
+    for i in range(20):
+        writer.submit(0.0, LogLevel.WARNING, "plant", "moisture %s, bad %d", (i, "x") if i == 3 else (i, i))
+    writer.stop(WAIT)
+
+    lines = (tmp_path / "server.log.1").read_text().splitlines() + path.read_text().splitlines()
+    assert lines[-1].endswith("[plant] [WARNING] moisture 19, bad 19")
+    assert (tmp_path / "server.log.2").exists()
+    assert not (tmp_path / "server.log.3").exists()
+    assert writer.written == 20
@@ -0,0 +1,109 @@
+import itertools
+import random
+
+import numpy as np
+
+from plant_table import METRICS, PlantTable
+from measurements import Brightness, Moisture
+from tests.helpers import make_plant
+
+NAN = float("nan")
+
+# Readings around the required values (MOIST, MEDIUM_LIGHT, 21.0, 50.0) and
+# their thresholds, plus missing, zero and NaN ones
+READINGS = {
+    "act_moisture": [None, Moisture.DRY, Moisture.MOIST, Moisture.WET],
+    "act_brightness": [None, Brightness.NO_LIGHT, Brightness.MEDIUM_LIGHT, Brightness.DIRECT_LIGHT],
+    "act_temperature": [None, 0.0, NAN, 10.0, 16.0, 16.01, 21.0, 25.99, 26.0, 35.0],
+    "act_humidity": [None, 0.0, NAN, 20.0, 45.0, 45.01, 50.0, 54.99, 55.0, 90.0],
+}
+
+
+def make_fleet(count: int, seed: int = 7):
+    rng = random.Random(seed)
+    return [
+        make_plant(
+            f"plant {i}",
+            keep_alive=rng.random() < 0.8,
+            **{name: rng.choice(values) for name, values in READINGS.items()},
+        )
+        for i in range(count)
+    ]
+
+
+def record_commands(plants):
+    commands = []
+    for plant in plants:
+        plant.devices.send_command = lambda metric, delta, plant=plant: commands.append((plant.id, metric, delta))
+    return commands
+
+
+def scalar_cycle(plants):
+    """What PlantThreadManager does: keep_alive_cycle for every plant whose keep_alive is on."""
+    for plant in plants:
+        if plant.keep_alive:
+            plant.keep_alive_cycle()
+
+
+def test_evaluate_matches_plant_check_metric():
+    plants = make_fleet(500)
+    evaluation = PlantTable.from_plants(plants).evaluate()
+
+    for row, plant in enumerate(plants):
+        for i, (metric, act_value, req_value, threshold) in enumerate(plant._metric_checks()):
+            expected = plant._evaluate_metric(metric, act_value, req_value, threshold) if plant.keep_alive else None
+            assert evaluation.out_of_range[i, row] == (expected is not None), (plant.id, metric, act_value)
+            if expected is not None:
+                assert evaluation.delta[i, row] == expected[1]
+                assert evaluation.too_high[i, row] == (expected[1] < 0)
+
+
+def test_care_cycle_sends_the_same_commands_as_the_scalar_path():
+    scalar_plants = make_fleet(300)
+    table_plants = make_fleet(300)
+    scalar_commands = record_commands(scalar_plants)
+    table_commands = record_commands(table_plants)
+
+    scalar_cycle(scalar_plants)
+    PlantTable.from_plants(table_plants).run_care_cycle()
+
+    assert scalar_commands
+    assert sorted(table_commands) == sorted(scalar_commands)
+
+
+def test_keep_alive_and_missing_readings_every_combination():
+    # Exhaustive over keep_alive x (missing, zero, NaN, in range, out of range) temperature
+    plants = [
+        make_plant(f"plant {i}", keep_alive=keep_alive, act_temperature=temperature)
+        for i, (keep_alive, temperature) in enumerate(
+            itertools.product((True, False), (None, 0.0, NAN, 21.0, 30.0))
+        )
+    ]
+    evaluation = PlantTable.from_plants(plants).evaluate()
+    temperature = METRICS.index("temperature")
+    out_of_range = [plant.id for row, plant in enumerate(plants) if evaluation.out_of_range[temperature, row]]
+    assert out_of_range == ["plant 4"]
+    assert not evaluation.evaluated[:, [5, 6, 7, 8, 9]].any()
+
+
+def test_refresh_actuals_follows_keep_alive_and_readings():
+    plants = make_fleet(50)
+    table = PlantTable.from_plants(plants)
+    for plant in plants:
+        plant.keep_alive = not plant.keep_alive
+        plant.act_temperature = 40.0
+    table.refresh_actuals()
+    evaluation = table.evaluate()
+
+    temperature = METRICS.index("temperature")
+    expected = np.array([plant.keep_alive for plant in plants])
+    assert (evaluation.out_of_range[temperature] == expected).all()
+
+
+def test_remove_plant_moves_the_last_row():
+    plants = make_fleet(5)
+    table = PlantTable.from_plants(plants)
+    table.remove_plant("plant 1")
+    assert len(table) == 4
+    assert table._rows["plant 4"] == 1
+    assert table._plants[1] is plants[4]
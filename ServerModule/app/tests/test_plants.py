@@ -0,0 +1,73 @@
+from measurements import Brightness, Moisture
+from tests.helpers import make_plant
+
+
+def test_changed_reading_marks_the_plant_dirty():
+    plant = make_plant()
+    plant.update_temperature(22.0)
+    assert plant.dirty
+
+
+def test_repeated_in_range_reading_keeps_the_plant_clean():
+    plant = make_plant()
+    plant.update_moisture(Moisture.MOIST)
+    plant.update_temperature(21.0)
+    plant.update_temperature(23.0)
+    plant.dirty = False
+    plant.update_temperature(23.0)
+    assert not plant.dirty
+
+
+def test_repeated_out_of_range_reading_marks_the_plant_dirty_again():
+    plant = make_plant(act_moisture=Moisture.DRY, act_temperature=30.0)
+    plant.update_moisture(Moisture.DRY)
+    assert plant.dirty
+    plant.dirty = False
+    plant.update_temperature(30.0)
+    assert plant.dirty
+
+
+def test_dirty_listener_fires_on_each_clean_to_dirty_edge():
+    calls = []
+    plant = make_plant(act_moisture=Moisture.DRY)
+    plant.set_dirty_listener(calls.append)
+    plant.update_moisture(Moisture.DRY)
+    plant.update_moisture(Moisture.DRY)
+    assert calls == [plant]
+    plant.dirty = False
+    plant.update_moisture(Moisture.DRY)
+    assert calls == [plant, plant]
+
+
+def record_commands(plant):
+    commands = []
+    plant.devices.send_command = lambda metric, delta: commands.append((metric, delta))
+    return commands
+
+
+def test_reading_on_target_is_in_range_in_both_modes():
+    plant = make_plant()
+    commands = record_commands(plant)
+    # Event-driven: repeating the on-target readings does not ask for an evaluation
+    plant.update_moisture(Moisture.MOIST)
+    plant.update_brightness(Brightness.MEDIUM_LIGHT)
+    plant.update_temperature(21.0)
+    plant.update_humidity(50.0)
+    assert not plant.dirty
+    # Periodic: the care cycle does not act on them either
+    plant.keep_alive_cycle()
+    assert commands == []
+
+
+def test_dirty_trigger_and_care_cycle_agree_on_every_reading():
+    readings = {
+        "moisture": list(Moisture),
+        "brightness": list(Brightness),
+        "temperature": [0.0, float("nan"), 10.0, 16.0, 16.01, 21.0, 25.99, 26.0],
+        "humidity": [0.0, float("nan"), 20.0, 45.0, 45.01, 50.0, 54.99, 55.0],
+    }
+    plant = make_plant()
+    for metric, _, req_value, threshold in plant._metric_checks():
+        for value in readings[metric]:
+            acts = plant._evaluate_metric(metric, value, req_value, threshold) is not None
+            assert plant._out_of_range(metric, value) == acts, (metric, value)
@@ -0,0 +1,91 @@
+import os
+import signal
+import threading
+import time
+
+import pytest
+
+import profiling
+from profiling import PROFILER, LatencyHistogram, Profiler, install_signal_handler
+
+WAIT = 5.0
+
+
+@pytest.fixture
+def usr1():
+    if not hasattr(signal, "SIGUSR1"):
+        pytest.skip("no SIGUSR1 on this platform")
+    previous = signal.getsignal(signal.SIGUSR1)
+    PROFILER.disable()
+    PROFILER.reset()
+    yield signal.SIGUSR1
+    signal.signal(signal.SIGUSR1, previous)
+    PROFILER.disable()
+    PROFILER.reset()
+
+
+def wait_for(condition):
+    deadline = time.monotonic() + WAIT
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_histogram_percentiles_use_bucket_bounds():
+    histogram = LatencyHistogram()
+    for _ in range(99):
+        histogram.record(0.0000015)
+    histogram.record(0.3)
+    assert histogram.percentile(0.5) == 0.000002
+    assert histogram.percentile(0.99) == 0.000002
+    assert histogram.percentile(1.0) == 0.5
+    assert histogram.summary()["max_us"] == 300000.0
+
+
+def test_dump_and_reset():
+    profiler = Profiler()
+    profiler.enable()
+    profiler.record("cycle", 0.001)
+    profiler.count("skipped", 3)
+    dump = profiler.dump()
+    assert dump["phases"]["cycle"]["count"] == 1
+    assert dump["counters"] == {"skipped": 3}
+    profiler.reset()
+    assert profiler.dump()["phases"] == {}
+
+
+def test_no_handler_without_sigusr1(monkeypatch):
+    before = signal.getsignal(signal.SIGINT)
+    monkeypatch.delattr(signal, "SIGUSR1", raising=False)
+    assert install_signal_handler() is False
+    assert signal.getsignal(signal.SIGINT) is before
+
+
+def test_signal_while_the_profiler_lock_is_held(usr1, capsys):
+    assert install_signal_handler()
+    os.kill(os.getpid(), usr1)
+    wait_for(lambda: PROFILER.enabled)
+    PROFILER.record("cycle", 0.001)
+
+    with PROFILER._lock:
+        # The handler runs here, in the thread holding the lock: it must return
+        # at once, the report waits in its own thread until the lock is free
+        os.kill(os.getpid(), usr1)
+        time.sleep(0.05)
+        assert PROFILER.enabled
+    wait_for(lambda: not PROFILER.enabled)
+    with profiling._toggle_lock:
+        pass
+    assert "cycle" in capsys.readouterr().out
+    assert PROFILER.dump()["phases"] == {}
+
+
+def test_toggle_threads_do_not_interleave(usr1, capsys):
+    threads = [threading.Thread(target=profiling.toggle_profiling) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(WAIT)
+    # Four toggles: on, report, on, report
+    assert not PROFILER.enabled
+    assert capsys.readouterr().out.count("Profile over") == 2
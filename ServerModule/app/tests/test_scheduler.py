@@ -0,0 +1,152 @@
+import threading
+
+import pytest
+
+from scheduler import WorkerPoolScheduler
+from plants import PlantThreadManager
+from tests.helpers import make_plant
+
+WAIT = 5.0
+
+
+def test_schedule_once_coalesces_pending_requests():
+    scheduler = WorkerPoolScheduler(workers=1)
+    scheduler.schedule_once("key", lambda: None, delay=60)
+    scheduler.schedule_once("key", lambda: None, delay=60)
+    scheduler.schedule_once("key", lambda: None, delay=60)
+    assert len(scheduler) == 1
+    assert scheduler.coalesced == 2
+
+
+def test_unschedule_drops_the_job():
+    scheduler = WorkerPoolScheduler(workers=1)
+    scheduler.schedule("key", lambda: None, interval=60)
+    scheduler.unschedule("key")
+    assert len(scheduler) == 0
+
+
+def test_schedule_rejects_non_positive_interval():
+    with pytest.raises(ValueError):
+        WorkerPoolScheduler().schedule("key", lambda: None, interval=0)
+
+
+def test_one_shot_jobs_run_once_and_retire():
+    scheduler = WorkerPoolScheduler(workers=2)
+    done = threading.Event()
+    scheduler.start()
+    try:
+        scheduler.schedule_once("key", done.set)
+        assert done.wait(WAIT)
+    finally:
+        scheduler.stop()
+    assert scheduler.runs == 1 and len(scheduler) == 0
+
+
+def test_rescheduled_job_waits_for_the_running_one():
+    scheduler = WorkerPoolScheduler(workers=4, jitter=0)
+    started, release = threading.Event(), threading.Event()
+    lock = threading.Lock()
+    running = [0]
+    overlap = []
+    second_ran = threading.Event()
+
+    def first():
+        with lock:
+            running[0] += 1
+        started.set()
+        release.wait(WAIT)
+        with lock:
+            running[0] -= 1
+
+    def second():
+        with lock:
+            overlap.append(running[0])
+        second_ran.set()
+
+    scheduler.start()
+    try:
+        scheduler.schedule("plant", first, interval=60, delay=0)
+        assert started.wait(WAIT)
+        scheduler.schedule("plant", second, interval=0.01, delay=0)
+        assert not second_ran.wait(0.2)     # the replaced run is still in progress
+        release.set()
+        assert second_ran.wait(WAIT)
+    finally:
+        scheduler.stop()
+    assert overlap and overlap[0] == 0
+    assert scheduler.skipped >= 1
+
+
+def test_one_shot_job_due_during_the_replaced_run_runs_after_it():
+    scheduler = WorkerPoolScheduler(workers=4)
+    started, release = threading.Event(), threading.Event()
+    calls = []
+    ran = threading.Event()
+
+    def slow():
+        started.set()
+        release.wait(WAIT)
+        calls.append("slow")
+
+    def fast():
+        calls.append("fast")
+        ran.set()
+
+    scheduler.start()
+    try:
+        scheduler.schedule("plant", slow, interval=60, delay=0)
+        assert started.wait(WAIT)
+        scheduler.schedule_once("plant", fast)
+        assert not ran.wait(0.1)            # due, but the replaced run is still in progress
+        scheduler.schedule_once("plant", fast)
+        release.set()
+        assert ran.wait(WAIT)
+        ran.clear()
+        # Retired after its run, so the next request schedules a new one
+        scheduler.schedule_once("plant", fast)
+        assert ran.wait(WAIT)
+    finally:
+        scheduler.stop()
+    assert calls == ["slow", "fast", "fast"]
+    assert scheduler.coalesced == 1 and len(scheduler) == 0
+
+
+def test_failing_job_does_not_kill_the_worker():
+    scheduler = WorkerPoolScheduler(workers=1)
+    done = threading.Event()
+    scheduler.logger.level = 100
+
+    def boom():
+        raise RuntimeError("boom")
+
+    scheduler.start()
+    try:
+        scheduler.schedule_once("a", boom)
+        scheduler.schedule_once("b", done.set, delay=0.05)
+        assert done.wait(WAIT)
+    finally:
+        scheduler.stop()
+    assert scheduler.errors == 1
+
+
+def test_set_plant_interval_requires_a_managed_plant():
+    managed, other = make_plant("managed"), make_plant("other")
+    manager = PlantThreadManager([managed], interval_seconds=60)
+    manager.set_plant_interval(managed, 30)
+    with pytest.raises(ValueError):
+        manager.set_plant_interval(other, 30)
+    manager.remove_plant(managed)
+    with pytest.raises(ValueError):
+        manager.set_plant_interval(managed, 30)
+    assert len(manager._scheduler) == 0
+
+
+def test_manager_skips_plants_without_keep_alive():
+    plant = make_plant("plant", keep_alive=False)
+    calls = []
+    plant.keep_alive_cycle = lambda: calls.append(plant.id)
+    manager = PlantThreadManager([plant])
+    manager._run_keep_alive_once(plant)
+    plant.keep_alive = True
+    manager._run_keep_alive_once(plant)
+    assert calls == ["plant"]
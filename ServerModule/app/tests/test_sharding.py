@@ -0,0 +1,185 @@
+import threading
+import time
+from collections import deque
+
+import pytest
+
+from devices import ComplexMoistureDevice
+from logger import LogLevel
+from measurements import Moisture
+from sharding import ShardedPlantManager, _plant_from_spec, plant_spec, shard_for
+from tests.helpers import make_plant
+
+
+class RecordingPump(ComplexMoistureDevice):
+    def __init__(self, name: str = "pump"):
+        super().__init__(name)
+        self.received = []
+
+    def change_moisture(self, delta: float):
+        self.received.append(delta)
+
+
+class BlockingPump(RecordingPump):
+    def __init__(self, name: str, gate: threading.Event):
+        super().__init__(name)
+        self.gate = gate
+
+    def change_moisture(self, delta: float):
+        self.gate.wait(30)
+        super().change_moisture(delta)
+
+
+def plant_with_pump(plant_id: str = "plant"):
+    plant = make_plant(plant_id, act_moisture=Moisture.DRY)
+    pump = RecordingPump(f"{plant_id} pump")
+    plant.register_device(pump)
+    return plant, pump
+
+
+def make_manager(shards: int = 2) -> ShardedPlantManager:
+    manager = ShardedPlantManager(
+        shards=shards, log_level=LogLevel.ERROR, request_timeout=30, interval_seconds=3600, workers=1
+    )
+    manager.logger.level = LogLevel.ERROR
+    return manager
+
+
+def test_shard_for_is_stable_and_in_range():
+    shards = [shard_for(f"plant{i}", 4) for i in range(1000)]
+    assert shards == [shard_for(f"plant{i}", 4) for i in range(1000)]
+    assert set(shards) == {0, 1, 2, 3}
+
+
+def test_database_ids_shard_like_the_loader_query():
+    # iter_plant_rows selects a shard with "p.id % shards = shard"
+    ids = range(1, 1000)
+    assert [shard_for(str(plant_id), 4) for plant_id in ids] == [plant_id % 4 for plant_id in ids]
+
+
+def test_shard_devices_queue_commands_for_the_supervisor():
+    plant, _ = plant_with_pump()
+    outbox = deque()
+    copy = _plant_from_spec(plant_spec(plant), LogLevel.ERROR, outbox)
+    assert [device.capabilities for device in copy.devices.devices] == [plant.devices.devices[0].capabilities]
+
+    copy.act_moisture = Moisture.DRY
+    copy.keep_alive_cycle()
+    assert list(outbox) == [("plant", 0, "moisture", 1)]
+
+
+def test_commands_run_on_the_real_devices():
+    manager = make_manager()
+    plant, pump = plant_with_pump()
+    manager.add_plant(plant)
+    shard = manager._shards[manager.shard_of("plant")]
+
+    manager._run_commands(shard, [("plant", 0, "moisture", 1.5), ("gone", 0, "moisture", 1.0)])
+    assert pump.received == [1.5]
+    assert (manager.commands_run, manager.commands_dropped) == (1, 1)
+
+    manager.remove_plant("plant")
+    manager._run_commands(shard, [("plant", 0, "moisture", 1.5)])
+    assert manager.commands_dropped == 2
+
+
+def test_last_readings_only_kept_for_added_plants():
+    manager = make_manager()
+    plant, _ = plant_with_pump()
+    manager.add_plant(plant)
+    for i in range(100):
+        manager.update(f"unknown{i}", "moisture", 1)
+    manager.update("plant", "moisture", 1)
+    manager.update("plant", "moisture", 2)
+
+    assert sum(len(readings) for readings in manager._last_readings) == 1
+    assert manager._last_readings[manager.shard_of("plant")]["plant"] == {"moisture": 2}
+    manager.remove_plant("plant")
+    assert sum(len(readings) for readings in manager._last_readings) == 0
+
+
+def test_update_rejects_unknown_metrics():
+    with pytest.raises(ValueError):
+        make_manager().update("plant", "co2", 1)
+
+
+def test_late_reply_is_not_taken_for_the_next_request():
+    manager = make_manager(shards=1)
+    shard = manager._shards[0]
+    # The answer to request 1, which timed out, arrives after request 2 was sent
+    shard.replies.put((0, "stats", (1, {"plants": "stale"})))
+    shard.replies.put((0, "stats", (2, {"plants": "fresh"})))
+    assert manager._await_reply(shard, "stats", 0, 2) == {"plants": "fresh"}
+    assert shard.replies.empty()
+
+
+def test_request_before_start_raises():
+    with pytest.raises(RuntimeError):
+        make_manager().run_cycle_once()
+
+
+def test_sharded_cycle_commands_reach_the_devices():
+    manager = make_manager()
+    plants = [plant_with_pump(f"plant{i}") for i in range(6)]
+    manager.start()
+    try:
+        manager.add_plants([plant for plant, _ in plants])
+        for plant, _ in plants:
+            manager.update(plant.id, "moisture", Moisture.DRY)
+        result = manager.run_cycle_once()
+    finally:
+        manager.stop()
+
+    assert result["plants"] == 6
+    # At least the requested cycle (the shards' own schedule may add one)
+    assert all(pump.received and set(pump.received) == {1} for _, pump in plants)
+    assert manager.commands_run >= 6
+
+
+def test_crashed_shard_is_restarted_and_replayed():
+    manager = make_manager(shards=1)
+    plant, pump = plant_with_pump()
+    manager.start()
+    try:
+        manager.add_plant(plant)
+        manager.update("plant", "moisture", Moisture.DRY)
+        manager.flush()
+        shard = manager._shards[0]
+        shard.process.kill()
+        shard.process.join(5)
+
+        # Sent to the dead shard: restarted with the plant and its last reading replayed
+        result = manager.run_cycle_once()
+        stats = manager.stats()
+    finally:
+        manager.stop()
+
+    assert result["plants"] == 1
+    assert stats["shards"][0]["restarts"] >= 1
+    assert pump.received and set(pump.received) == {1}
+
+
+def test_slow_commands_do_not_hold_up_the_supervisor():
+    manager = make_manager(shards=1)
+    gate = threading.Event()
+    plant = make_plant("plant", act_moisture=Moisture.DRY)
+    pump = BlockingPump("pump", gate)
+    plant.register_device(pump)
+    manager.start()
+    try:
+        manager.add_plant(plant)
+        manager.update("plant", "moisture", Moisture.DRY)
+        # The pump blocks the command thread; replies and restarts go on
+        assert manager.run_cycle_once()["plants"] == 1
+        shard = manager._shards[0]
+        shard.process.kill()
+        deadline = time.monotonic() + 30
+        while shard.restarts == 0:
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+        assert manager.run_cycle_once()["plants"] == 1
+        assert not pump.received
+    finally:
+        gate.set()
+        manager.stop()
+    assert pump.received and set(pump.received) == {1}
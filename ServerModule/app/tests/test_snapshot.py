@@ -0,0 +1,142 @@
+import os
+import zlib
+
+import pytest
+
+import snapshot
+from aggregation import STRATEGY_MEDIAN
+from devices import Capability, ComplexMoistureDevice, remote_device_class
+from logger import Logger
+from measurements import Brightness, Moisture
+from plants import PlantThreadManager
+from snapshot import SnapshotError, decode_snapshot, encode_snapshot, read_snapshot, write_snapshot
+from tests.helpers import make_plant
+
+
+def make_fleet():
+    sensor = remote_device_class(Capability.TEMPERATURE_READ | Capability.HUMIDITY_READ)("Room sensor", 7, "room-7")
+    first = make_plant("first", act_temperature=18.5, act_humidity=None)
+    first.alert_address = "grower@example.com"
+    first.dirty = True
+    first.register_device(sensor)
+    first.register_device(ComplexMoistureDevice("Pot"))
+    second = make_plant("second", keep_alive=False, act_moisture=None)
+    second.register_device(sensor)
+    return [first, second]
+
+
+def test_round_trip_keeps_state_and_device_sharing():
+    plants, intervals, _ = decode_snapshot(encode_snapshot(make_fleet(), {"first": 120.0}))
+    first, second = plants
+
+    assert (first.id, first.plant_type, first.alert_address) == ("first", "test", "grower@example.com")
+    assert (first._req_moisture, first._req_brightness) == (Moisture.MOIST, Brightness.MEDIUM_LIGHT)
+    assert (first._req_temperature, first._req_humidity) == (21.0, 50.0)
+    assert (first.act_moisture, first.act_temperature, first.act_humidity) == (Moisture.MOIST, 18.5, None)
+    assert isinstance(first.act_moisture, Moisture)
+    assert (first.keep_alive, first.dirty, second.keep_alive, second.dirty) == (True, True, False, False)
+    assert second.act_moisture is None
+    assert intervals == {"first": 120.0}
+
+    sensor = first.devices.devices[0]
+    assert second.devices.devices[0] is sensor
+    assert (sensor.name, sensor.device_id, sensor.unique_identifier) == ("Room sensor", 7, "room-7")
+    # Not a RemoteDevice: restored as one with the same capabilities
+    pot = first.devices.devices[1]
+    assert (pot.name, pot.device_id, pot.capabilities) == ("Pot", None, ComplexMoistureDevice("x").capabilities)
+
+
+def test_restored_plants_act_through_the_given_live_devices():
+    live = remote_device_class(Capability.TEMPERATURE_READ | Capability.HUMIDITY_READ)("Room sensor", 7, "room-7")
+    plants, _, _ = decode_snapshot(encode_snapshot(make_fleet()), devices={7: live})
+    first, second = plants
+    assert first.devices.devices[0] is live and second.devices.devices[0] is live
+    # No live device for the pot: a stand-in that only records its commands
+    assert first.devices.devices[1].device_id is None
+
+
+def test_aggregation_settings_survive_a_round_trip():
+    plant = make_plant()
+    plant.enable_aggregation(STRATEGY_MEDIAN, ("temperature", "humidity"), max_age_seconds=60.0, half_life_seconds=30.0)
+    plant.update_temperature(20.0, source="a")
+    (restored,), _, _ = decode_snapshot(encode_snapshot([plant]))
+
+    assert sorted(restored._aggregators) == ["humidity", "temperature"]
+    aggregator = restored._aggregators["temperature"]
+    assert (aggregator.strategy, aggregator.max_age, aggregator.half_life) == (STRATEGY_MEDIAN, 60.0, 30.0)
+    assert len(aggregator) == 0 and restored.act_temperature == 20.0
+    restored.update_temperature(22.0, source="a")
+    restored.update_temperature(24.0, source="b")
+    assert restored.act_temperature == 23.0
+
+
+def test_version_1_snapshots_are_still_read():
+    data = encode_snapshot([make_plant("old")])
+    # Version 1 had no aggregator count after the device indexes
+    body = data[snapshot._HEADER.size:-snapshot._AGGREGATOR_COUNT.size]
+    header = snapshot._HEADER.unpack_from(data)
+    old = snapshot._HEADER.pack(header[0], 1, *header[2:6], len(body), zlib.crc32(body)) + body
+    (plant,), _, _ = decode_snapshot(old)
+    assert plant.id == "old" and plant._aggregators == {}
+
+
+def test_manager_warns_about_devices_without_a_live_counterpart(tmp_path, monkeypatch):
+    path = str(tmp_path / "plants.snapshot")
+    write_snapshot(path, make_fleet())
+    warnings = []
+    monkeypatch.setattr(Logger, "warning", lambda self, message, *args: warnings.append(message))
+    live = {7: remote_device_class(Capability.TEMPERATURE_READ | Capability.HUMIDITY_READ)("Room sensor", 7, "room-7")}
+
+    manager = PlantThreadManager.from_snapshot(path, devices=live)
+    assert manager._plants[0].devices.devices[0] is live[7]
+    assert warnings == ["1 restored devices are not attached to live devices; their commands are only recorded."]
+    warnings.clear()
+    PlantThreadManager.from_snapshot(path)
+    assert warnings and warnings[0].startswith("2 restored devices")
+
+
+def test_non_integral_levels_round_to_the_nearest_level():
+    plant = make_plant(act_moisture=2.4, act_brightness=9.0)
+    (restored,), _, _ = decode_snapshot(encode_snapshot([plant]))
+    assert restored.act_moisture is Moisture.MOIST
+    assert restored.act_brightness is Brightness.DIRECT_LIGHT
+
+
+@pytest.mark.parametrize("damage", [
+    lambda data: data[:10],
+    lambda data: b"XXXX" + data[4:],
+    lambda data: data[:-1] + bytes([data[-1] ^ 0xFF]),
+    lambda data: data[:-3],
+])
+def test_damaged_snapshots_raise_snapshot_error(damage):
+    with pytest.raises(SnapshotError):
+        decode_snapshot(damage(encode_snapshot(make_fleet())))
+
+
+def test_too_long_string_raises_snapshot_error():
+    plant = make_plant("x" * 70_000)
+    with pytest.raises(SnapshotError):
+        encode_snapshot([plant])
+
+
+def test_write_and_read_file(tmp_path):
+    path = str(tmp_path / "plants.snapshot")
+    size = write_snapshot(path, make_fleet())
+    assert os.path.getsize(path) == size
+    assert not os.path.exists(f"{path}.tmp")
+    plants, _, _ = read_snapshot(path)
+    assert [plant.id for plant in plants] == ["first", "second"]
+
+    with pytest.raises(SnapshotError):
+        read_snapshot(str(tmp_path / "missing.snapshot"))
+
+
+def test_manager_keeps_the_old_snapshot_when_encoding_fails(tmp_path):
+    path = str(tmp_path / "plants.snapshot")
+    manager = PlantThreadManager(make_fleet(), snapshot_path=path)
+    manager.write_snapshot()
+    before = open(path, "rb").read()
+
+    manager.add_plant(make_plant("x" * 70_000))
+    manager.write_snapshot()
+    assert open(path, "rb").read() == before
@@ -0,0 +1,3 @@
+"""
+Benchmark suite for the database, ingestion and plant-care hot paths (see run.py)
+"""
@@ -0,0 +1,76 @@
+from datetime import timedelta
+
+from benchmarks.suite import Case, benchmark
+
+LATEST_VALUE = """
+    SELECT measurement_value, measurement_unit, timestamp
+    FROM sensor_data
+    WHERE device_id = %s
+    ORDER BY timestamp DESC
+    LIMIT 1
+"""
+
+HISTORY = """
+    SELECT measurement_value, timestamp
+    FROM sensor_data
+    WHERE device_id = %s AND timestamp >= %s
+    ORDER BY timestamp
+"""
+
+
+@benchmark('db.insert_single', 'ingestion')
+def insert_single(context):
+    # One round trip and commit per reading, the path of the device gateways
+    db, device_id = context.db, context.device_ids[0]
+    count = context.scaled(500)
+
+    def run():
+        for i in range(count):
+            db.insert_sensor_data(device_id, 20 + i % 10, '°C')
+
+    return Case(run, count)
+
+
+@benchmark('db.insert_bulk', 'ingestion')
+def insert_bulk(context):
+    db, device_ids = context.db, context.device_ids
+    count = context.scaled(20_000)
+    readings = [(device_ids[i % len(device_ids)], 20 + i % 10, '°C') for i in range(count)]
+    return Case(lambda: db.insert_sensor_data_many(readings), count)
+
+
+@benchmark('db.latest_value', 'queries')
+def latest_value(context):
+    db = context.db
+    devices = context.sample(context.device_ids, 200)
+
+    def run():
+        for device_id in devices:
+            db.execute_query(LATEST_VALUE, (device_id,))
+
+    return Case(run, len(devices))
+
+
+@benchmark('db.history_24h', 'queries')
+def history_24h(context):
+    db = context.db
+    devices = context.sample(context.device_ids, 50)
+    since = context.timestamp(context.seeded_until - timedelta(days=1))
+
+    def run():
+        for device_id in devices:
+            db.execute_query(HISTORY, (device_id, since))
+
+    return Case(run, len(devices))
+
+
+@benchmark('db.dashboard', 'queries')
+def dashboard(context):
+    db = context.db
+    users = context.sample(context.user_ids, 20)
+
+    def run():
+        for user_id in users:
+            db.get_dashboard(user_id)
+
+    return Case(run, len(users))
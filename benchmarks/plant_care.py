@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+"""
+Standalone scenario benchmarks of the plant-care server modules: scheduler,
+asyncio manager, PlantTable, profiler, snapshot, sharding, logger and log store.
+Run one with 'python benchmarks/plant_care.py <name>' (see --help); run.py
+covers the per-operation hot paths with baselines.
+"""
+import os
+import sys
+import time
+import shutil
+import asyncio
+import argparse
+import threading
+from pathlib import Path
+
+import numpy as np
+
+# The server modules import each other by bare name
+SERVER_SRC = Path(__file__).parent.parent / 'ServerModule' / 'app' / 'src'
+if str(SERVER_SRC) not in sys.path:
+    sys.path.insert(0, str(SERVER_SRC))
+
+from plants import Plant  # noqa: E402
+from scheduler import WorkerPoolScheduler  # noqa: E402
+from async_plants import AsyncPlantManager  # noqa: E402
+from plant_table import PlantTable, METRICS  # noqa: E402
+from devices import Capability, remote_device_class  # noqa: E402
+from snapshot import read_snapshot, write_snapshot  # noqa: E402
+from sharding import ShardedPlantManager  # noqa: E402
+from log_store import BinaryLogStore, LogReader  # noqa: E402
+from profiling import PROFILER  # noqa: E402
+from logger import Logger, LogLevel, start_async_logging, stop_async_logging  # noqa: E402
+from measurements import Brightness, Moisture  # noqa: E402
+
+
+def make_benchmark_plants(plant_count: int) -> list:
+    """Healthy plants (every reading on target) with logging above INFO muted."""
+    plants = []
+    for i in range(plant_count):
+        plant = Plant(
+            id=f"plant{i}",
+            plant_type="benchmark",
+            req_brightness=Brightness.MEDIUM_LIGHT,
+            req_humidity=50.0,
+            req_temperature=21.0,
+            req_moisture=Moisture.MOIST,
+        )
+        plant.logger.level = LogLevel.ERROR
+        plant.act_brightness = Brightness.MEDIUM_LIGHT
+        plant.act_humidity = 50.0
+        plant.act_temperature = 21.0
+        plant.act_moisture = Moisture.MOIST
+        plant.keep_alive = True
+        plants.append(plant)
+    return plants
+
+
+def _percentile(values: list[float], fraction: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def benchmark_cycle_latency(plant_count: int, workers: int = 8) -> dict:
+    """Time one full care cycle over 'plant_count' plants on the worker pool."""
+    plants = make_benchmark_plants(plant_count)
+    scheduler = WorkerPoolScheduler(workers=workers, jitter=0, spread_start=False)
+    finished = threading.Event()
+    remaining = [plant_count]
+    remaining_lock = threading.Lock()
+    lags: list[float] = []
+
+    def make_job(plant):
+        def job():
+            lags.append(time.monotonic() - started)
+            plant.keep_alive_cycle()
+            with remaining_lock:
+                remaining[0] -= 1
+                if remaining[0] == 0:
+                    finished.set()
+        return job
+
+    started = time.monotonic()
+    for plant in plants:
+        scheduler.schedule(plant, make_job(plant), interval=3600, delay=0)
+    scheduler.start()
+    finished.wait()
+    cycle = time.monotonic() - started
+    scheduler.stop()
+
+    return {
+        "mode": "worker_pool",
+        "plants": plant_count,
+        "workers": workers,
+        "cycle_seconds": round(cycle, 3),
+        "p50_start_lag_ms": round(_percentile(lags, 0.50) * 1000, 2),
+        "p99_start_lag_ms": round(_percentile(lags, 0.99) * 1000, 2),
+    }
+
+
+def benchmark_thread_per_plant(plant_count: int) -> dict:
+    """The previous PlantThreadManager cycle (one thread per plant), for comparison."""
+    plants = make_benchmark_plants(plant_count)
+    lags: list[float] = []
+
+    def job(plant):
+        lags.append(time.monotonic() - started)
+        plant.keep_alive_cycle()
+
+    started = time.monotonic()
+    threads = []
+    for plant in plants:
+        t = threading.Thread(target=job, args=(plant,), daemon=True)
+        t.start()
+        threads.append(t)
+    for t in threads:
+        t.join()
+    cycle = time.monotonic() - started
+
+    return {
+        "mode": "thread_per_plant",
+        "plants": plant_count,
+        "cycle_seconds": round(cycle, 3),
+        "p50_start_lag_ms": round(_percentile(lags, 0.50) * 1000, 2),
+        "p99_start_lag_ms": round(_percentile(lags, 0.99) * 1000, 2),
+    }
+
+
+def benchmark_async_cycle(plant_count: int) -> dict:
+    """Time one care cycle over 'plant_count' plants on a single event loop."""
+    plants = make_benchmark_plants(plant_count)
+    manager = AsyncPlantManager(interval_seconds=3600)
+    for plant in plants:
+        manager.add_plant(plant, delay=3600)
+
+    started = time.monotonic()
+    asyncio.run(manager.run_cycle_once())
+    cycle = time.monotonic() - started
+
+    return {
+        "mode": "asyncio",
+        "plants": plant_count,
+        "cycle_seconds": round(cycle, 3),
+        "errors": manager.errors,
+    }
+
+
+def benchmark_plant_table(plant_count: int = 1_000_000, scalar_sample: int = 100_000, seed: int = 0) -> dict:
+    """
+    Vectorized evaluation of 'plant_count' plants, compared with the per-plant
+    check on 'scalar_sample' real Plant objects (results are checked for equality).
+    """
+    rng = np.random.default_rng(seed)
+    required = np.vstack([
+        rng.integers(1, 4, plant_count),
+        rng.integers(1, 6, plant_count),
+        rng.uniform(15, 28, plant_count),
+        rng.uniform(30, 80, plant_count),
+    ]).astype(float)
+    actual = np.vstack([
+        rng.integers(1, 4, plant_count),
+        rng.integers(1, 6, plant_count),
+        rng.uniform(10, 32, plant_count),
+        rng.uniform(20, 90, plant_count),
+    ]).astype(float)
+    actual[:, rng.random(plant_count) < 0.05] = np.nan
+
+    table = PlantTable.from_arrays([f"plant{i}" for i in range(plant_count)], required, actual)
+    started = time.perf_counter()
+    evaluation = table.evaluate()
+    vectorized = time.perf_counter() - started
+
+    plants = make_benchmark_plants(scalar_sample)
+    for row, plant in enumerate(plants):
+        values = [None if np.isnan(v) else v for v in actual[:, row]]
+        plant.act_moisture, plant.act_brightness, plant.act_temperature, plant.act_humidity = values
+        plant._req_moisture, plant._req_brightness, plant._req_temperature, plant._req_humidity = required[:, row]
+
+    started = time.perf_counter()
+    scalar_out = np.zeros((len(METRICS), scalar_sample), dtype=bool)
+    for row, plant in enumerate(plants):
+        for i, (metric, act_value, req_value, threshold) in enumerate(plant._metric_checks()):
+            scalar_out[i, row] = plant._evaluate_metric(metric, act_value, req_value, threshold) is not None
+    scalar = time.perf_counter() - started
+
+    return {
+        "plants": plant_count,
+        "vectorized_seconds": round(vectorized, 4),
+        "scalar_seconds_per_plant_us": round(scalar / scalar_sample * 1e6, 3),
+        "scalar_seconds_extrapolated": round(scalar / scalar_sample * plant_count, 3),
+        "out_of_range": int(evaluation.out_of_range.sum()),
+        "matches_check_metric": bool((scalar_out == evaluation.out_of_range[:, :scalar_sample]).all()),
+    }
+
+
+def benchmark_snapshot(plant_count: int = 100_000, path: str = "plants.snapshot") -> dict:
+    """Snapshot size plus write and restore times for 'plant_count' plants."""
+    plants = make_benchmark_plants(plant_count)
+    sensor = remote_device_class(Capability.TEMPERATURE_READ | Capability.HUMIDITY_READ)("Room sensor", 1, "room-1")
+    for plant in plants:
+        plant.register_device(sensor)
+
+    started = time.perf_counter()
+    size = write_snapshot(path, plants)
+    written = time.perf_counter() - started
+
+    started = time.perf_counter()
+    restored, _, _ = read_snapshot(path)
+    read = time.perf_counter() - started
+    os.remove(path)
+
+    return {
+        "plants": plant_count,
+        "bytes": size,
+        "write_seconds": round(written, 3),
+        "restore_seconds": round(read, 3),
+        "restored": len(restored),
+    }
+
+
+def benchmark_sharded_cycles(plant_count: int = 200_000, shard_counts: tuple[int, ...] = (1, 2, 4)) -> list[dict]:
+    """keep_alive_cycle throughput for the same fleet with different shard counts."""
+    specs = [
+        {
+            "id": f"plant{i}",
+            "plant_type": "benchmark",
+            "req_brightness": int(Brightness.MEDIUM_LIGHT),
+            "req_humidity": 50.0,
+            "req_temperature": 21.0,
+            "req_moisture": int(Moisture.MOIST),
+            "alert_address": None,
+            "keep_alive": True,
+        }
+        for i in range(plant_count)
+    ]
+
+    results = []
+    for shards in shard_counts:
+        manager = ShardedPlantManager(shards=shards, log_level=LogLevel.ERROR, interval_seconds=3600)
+        manager.start()
+        manager.add_plants(specs)
+        for spec in specs:
+            manager.update(spec["id"], "temperature", 21.0)
+            manager.update(spec["id"], "humidity", 50.0)
+        manager.run_cycle_once()  # warm up
+        results.append(manager.run_cycle_once())
+        manager.stop()
+    return results
+
+
+def benchmark_log_store(records: int = 1_000_000, plants: int = 10_000, directory: str = "benchmark_logs") -> dict:
+    """Write 'records' over 'plants' loggers, then look up one plant in a 1 minute window."""
+    shutil.rmtree(directory, ignore_errors=True)
+    store = BinaryLogStore(directory, segment_bytes=16 * 1024 * 1024)
+    base = time.time() - records / 100
+    started = time.perf_counter()
+    for i in range(records):
+        store.append(base + i / 100, LogLevel.INFO, f"plant{i % plants}", "Moisture delta %s", (i % 3,))
+    store.close()
+    written = time.perf_counter() - started
+    size = sum(os.path.getsize(os.path.join(directory, f)) for f in os.listdir(directory))
+
+    reader = LogReader(directory)
+    window_start = base + records / 200
+    started = time.perf_counter()
+    found = list(reader.query(name="plant42", start=window_start, end=window_start + 60))
+    queried = time.perf_counter() - started
+
+    started = time.perf_counter()
+    everything = sum(1 for _ in reader.query(name="plant42"))
+    scanned = time.perf_counter() - started
+    shutil.rmtree(directory, ignore_errors=True)
+
+    return {
+        "records": records,
+        "bytes": size,
+        "write_seconds": round(written, 3),
+        "window_query_ms": round(queried * 1000, 2),
+        "window_matches": len(found),
+        "full_scan_seconds": round(scanned, 3),
+        "full_scan_matches": everything,
+    }
+
+
+def benchmark_logging(messages: int = 200_000, path: str = "benchmark.log") -> dict:
+    """Time spent in the callers for 'messages' log calls, synchronous vs. queued."""
+    logger = Logger(name="benchmark")
+    devnull = open(os.devnull, "w")
+
+    stdout, sys.stdout = sys.stdout, devnull
+    try:
+        started = time.perf_counter()
+        for i in range(messages):
+            logger.info("Plant %s moisture is %s", i, "ok")
+        synchronous = time.perf_counter() - started
+    finally:
+        sys.stdout = stdout
+
+    writer = start_async_logging(path, max_pending=messages)
+    started = time.perf_counter()
+    for i in range(messages):
+        logger.info("Plant %s moisture is %s", i, "ok")
+    queued = time.perf_counter() - started
+    stop_async_logging()
+    drained = time.perf_counter() - started
+
+    devnull.close()
+    for name in [path] + [f"{path}.{i}" for i in range(1, writer.backups + 1)]:
+        if os.path.exists(name):
+            os.remove(name)
+
+    return {
+        "messages": messages,
+        "sync_print_caller_us": round(synchronous / messages * 1e6, 2),
+        "async_caller_us": round(queued / messages * 1e6, 2),
+        "async_total_seconds": round(drained, 3),
+        "written": writer.written,
+    }
+
+
+def benchmark_profiler_overhead(plant_count: int = 100_000, rounds: int = 5, sample_every: int = 64) -> dict:
+    """keep_alive_cycle time over 'plant_count' plants with profiling off and on."""
+    plants = make_benchmark_plants(plant_count)
+
+    def run() -> float:
+        started = time.perf_counter()
+        for plant in plants:
+            plant.keep_alive_cycle()
+        return time.perf_counter() - started
+
+    # Interleave the modes so warm-up and machine noise hit all of them alike
+    disabled = enabled = every_cycle = float("inf")
+    for _ in range(rounds):
+        PROFILER.disable()
+        disabled = min(disabled, run())
+        PROFILER.enable(sample_every)
+        enabled = min(enabled, run())
+        PROFILER.enable(1)
+        every_cycle = min(every_cycle, run())
+    PROFILER.disable()
+    PROFILER.reset()
+
+    return {
+        "plants": plant_count,
+        "disabled_seconds": round(disabled, 4),
+        "enabled_seconds": round(enabled, 4),
+        "overhead_percent": round((enabled / disabled - 1) * 100, 2),
+        "every_cycle_overhead_percent": round((every_cycle / disabled - 1) * 100, 2),
+    }
+
+
+SCENARIOS = {
+    'cycle_latency': lambda: [benchmark_thread_per_plant(n) for n in (10_000, 100_000)]
+    + [benchmark_cycle_latency(n) for n in (10_000, 100_000)],
+    'async_cycle': lambda: [benchmark_async_cycle(n) for n in (100_000, 300_000)],
+    'plant_table': lambda: [benchmark_plant_table()],
+    'snapshot': lambda: [benchmark_snapshot(n) for n in (1_000, 100_000)],
+    'sharded_cycles': benchmark_sharded_cycles,
+    'log_store': lambda: [benchmark_log_store()],
+    'logging': lambda: [benchmark_logging()],
+    'profiler_overhead': lambda: [benchmark_profiler_overhead()],
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Scenario benchmarks of the plant-care server modules')
+    parser.add_argument('scenario', nargs='*', help=f"Any of {', '.join(SCENARIOS)} (default: all)")
+    args = parser.parse_args()
+    unknown = sorted(set(args.scenario) - set(SCENARIOS))
+    if unknown:
+        parser.error(f"unknown scenario: {', '.join(unknown)}")
+    for name in args.scenario or SCENARIOS:
+        print(f"== {name}")
+        for result in SCENARIOS[name]():
+            print(result)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+import os
+import sys
+import json
+import random
+import fnmatch
+import logging
+import argparse
+import platform
+import tempfile
+import subprocess
+from pathlib import Path
+from datetime import datetime, timezone
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from benchmarks.suite import BENCHMARKS, measure
+import benchmarks.db_benchmarks  # noqa: F401 (registers the benchmarks)
+import benchmarks.server_benchmarks  # noqa: F401
+
+THRESHOLDS = Path(__file__).parent / 'thresholds.json'
+# Fixed so the seeded data, and the queries over it, are the same on every run
+SEEDED_UNTIL = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+class Context:
+    """Shared by the benchmark setups: the scale, a seeded random source and the database (built on first use)."""
+
+    def __init__(self, args):
+        self.args = args
+        self.repeat = args.repeat
+        self.random = random.Random(args.seed)
+        self.seeded_until = SEEDED_UNTIL
+        self._db = None
+        self.database = None
+        self.device_ids = []
+        self.user_ids = []
+
+    def scaled(self, count: int) -> int:
+        return max(1, int(count * self.args.scale))
+
+    def sample(self, values, count: int):
+        return self.random.sample(values, min(count, len(values)))
+
+    def timestamp(self, moment) -> str:
+        # In the text form each backend stores, so the comparison can use the index
+        if self._db.is_sqlite:
+            return moment.strftime('%Y-%m-%d %H:%M:%S.000000')
+        return moment.strftime('%Y-%m-%d %H:%M:%S+00')
+
+    @property
+    def db(self):
+        if self._db is None:
+            self._open_database()
+        return self._db
+
+    def _open_database(self):
+        from db.db_utils import DBInterface
+        from db.synthetic import SeedConfig, seed_synthetic
+
+        logging.getLogger('db.db_utils').setLevel(logging.WARNING)
+        url = self.args.url or f"sqlite:///{tempfile.mkdtemp()}/benchmark.db"
+        db = self._db = DBInterface(url)
+        config = SeedConfig(self.args.users, self.args.plants_per_user, self.args.days,
+                            self.args.interval, self.args.seed, SEEDED_UNTIL)
+        if not self.args.no_seed:
+            print(f"🌿 Seeding {config.total_readings:,} readings into {db.backend}...")
+            summary = seed_synthetic(db, config, defer_indexes=True, progress=lambda line: None)
+            print(f"✓ Seeded in {summary['total_seconds']}s")
+        self.database = {
+            'backend': db.backend,
+            'version': db.execute_query("SELECT sqlite_version()" if db.is_sqlite else "SHOW server_version")[0][0],
+            'readings': db.execute_query("SELECT COUNT(*) FROM sensor_data")[0][0],
+            'seed': {k: v for k, v in vars(config).items() if k != 'end'},
+        }
+        self.device_ids = [row[0] for row in db.execute_query("SELECT id FROM devices ORDER BY id")]
+        self.user_ids = [row[0] for row in db.execute_query("SELECT id FROM users ORDER BY id")]
+        if not self.device_ids:
+            raise RuntimeError("No devices in the database, run without --no-seed")
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+
+
+def _git(*args):
+    try:
+        return subprocess.run(['git', *args], cwd=Path(__file__).parent, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def environment(context: Context) -> dict:
+    import sqlalchemy
+
+    try:
+        import psycopg2
+        psycopg2_version = psycopg2.__version__.split()[0]
+    except ImportError:
+        psycopg2_version = None
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'git_commit': _git('rev-parse', 'HEAD'),
+        'git_dirty': bool(_git('status', '--porcelain', '--untracked-files=no')),
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'processor': platform.processor() or None,
+        'cpu_count': os.cpu_count(),
+        'sqlalchemy': sqlalchemy.__version__,
+        'psycopg2': psycopg2_version,
+        'database': context.database,
+        'scale': context.args.scale,
+        'repeat': context.args.repeat,
+    }
+
+
+def compare(results: dict, baseline: dict, thresholds: dict) -> list:
+    """
+    (name, baseline us, current us, change, allowed, regressed) for every benchmark in both runs.
+    Database benchmarks are only compared when both runs used the same backend.
+    """
+    same_backend = (
+        (results['environment'].get('database') or {}).get('backend')
+        == (baseline['environment'].get('database') or {}).get('backend')
+    )
+    rows = []
+    for name, result in results['results'].items():
+        previous = baseline['results'].get(name)
+        if previous is None or (result['group'] in ('ingestion', 'queries') and not same_backend):
+            continue
+        allowed = thresholds.get('benchmarks', {}).get(name, thresholds.get('default', 0.25))
+        change = result['per_op_us'] / previous['per_op_us'] - 1 if previous['per_op_us'] else 0.0
+        rows.append((name, previous['per_op_us'], result['per_op_us'], change, allowed, change > allowed))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the benchmark suite, write JSON results and compare with a baseline')
+    parser.add_argument('--url', default=os.environ.get('DATABASE_URL'),
+                        help='Database to benchmark (default: a fresh SQLite file); use a dedicated PostgreSQL database')
+    parser.add_argument('--only', action='append', default=[],
+                        help='Glob of benchmark names or groups to run, e.g. "db.*" or plant-care (repeatable)')
+    parser.add_argument('--list', action='store_true', help='List the benchmarks and exit')
+    parser.add_argument('--repeat', type=int, default=5, help='Timed runs per benchmark, the best counts')
+    parser.add_argument('--scale', type=float, default=1.0, help='Multiplier of the operations per run')
+    parser.add_argument('--output', help='Write the results JSON here (e.g. to keep as the next baseline)')
+    parser.add_argument('--baseline', help='Results JSON of an earlier run to compare with')
+    parser.add_argument('--thresholds', default=str(THRESHOLDS),
+                        help='Allowed slowdown per benchmark (fraction of the baseline per-op time)')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--users', type=int, default=20, help='Synthetic users to seed')
+    parser.add_argument('--plants-per-user', type=int, default=5)
+    parser.add_argument('--days', type=float, default=7)
+    parser.add_argument('--interval', type=int, default=300)
+    parser.add_argument('--no-seed', action='store_true', help='Use the data already in --url')
+    args = parser.parse_args()
+
+    selected = {
+        name: entry for name, entry in BENCHMARKS.items()
+        if not args.only or any(fnmatch.fnmatch(name, p) or entry[0] == p for p in args.only)
+    }
+    if args.list or not selected:
+        for name, (group, _) in BENCHMARKS.items():
+            print(f"{group:<12} {name}")
+        return 0 if args.list else 2
+
+    context = Context(args)
+    results = {}
+    try:
+        for name, (group, setup) in selected.items():
+            case = setup(context)
+            result = results[name] = {'group': group, **measure(case, args.repeat)}
+            print(f"{name:<34}{result['per_op_us']:>12} us/op{result['ops_per_second']:>14,} ops/s"
+                  f"   (best of {args.repeat}, median {result['median_seconds']}s)")
+        run = {'environment': environment(context), 'results': results}
+    finally:
+        context.close()
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(run, indent=2) + '\n')
+        print(f"✓ Results written to {args.output}")
+    else:
+        print(json.dumps(run, indent=2))
+
+    if not args.baseline:
+        return 0
+    baseline = json.loads(Path(args.baseline).read_text())
+    thresholds = json.loads(Path(args.thresholds).read_text())
+    rows = compare(run, baseline, thresholds)
+    print(f"\nCompared with {args.baseline} ({baseline['environment'].get('git_commit') or 'unknown commit'}):")
+    print(f"{'benchmark':<34}{'baseline_us':>12}{'current_us':>12}{'change':>9}{'allowed':>9}")
+    for name, before, after, change, allowed, regressed in rows:
+        print(f"{name:<34}{before:>12}{after:>12}{change:>+9.0%}{allowed:>+9.0%}  {'✗ REGRESSION' if regressed else '✓'}")
+    regressions = [row[0] for row in rows if row[5]]
+    if regressions:
+        print(f"\n✗ {len(regressions)} regression(s): {', '.join(regressions)}")
+        return 1
+    print("\n✓ No regressions")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,129 @@
+import os
+import tempfile
+
+from benchmarks.suite import Case, benchmark
+from benchmarks.plant_care import make_benchmark_plants
+
+
+def _assert_no_action(plant):
+    # One traced cycle: a healthy plant sends no command and logs nothing but "ok" lines
+    from logger import LogLevel
+    from textbook import Textbook
+
+    commands, logged = [], []
+    plant.logger.level = LogLevel.DEBUG
+    plant.devices.send_command = lambda metric, delta: commands.append(metric)
+    plant.logger.log = lambda level, message, *args: logged.append((level, message))
+    plant.keep_alive_cycle()
+    ok_messages = {getattr(Textbook, metric).ok for metric in ("moisture", "brightness", "temperature", "humidity")}
+    assert not commands, f"healthy plant sent commands: {commands}"
+    assert all(level < LogLevel.WARNING and message in ok_messages for level, message in logged), logged
+
+
+@benchmark('plants.keep_alive_cycle', 'plant-care')
+def keep_alive_cycle(context):
+    # Every metric in range: the cost of checking a healthy plant
+    _assert_no_action(make_benchmark_plants(1)[0])
+    plants = make_benchmark_plants(context.scaled(20_000))
+
+    def run():
+        for plant in plants:
+            plant.keep_alive_cycle()
+
+    return Case(run, len(plants))
+
+
+@benchmark('plants.keep_alive_cycle_acting', 'plant-care')
+def keep_alive_cycle_acting(context):
+    # Every plant too dry with one pump: each cycle ends in a send_command
+    from devices import ComplexMoistureDevice
+    from measurements import Moisture
+
+    plants = make_benchmark_plants(context.scaled(20_000))
+    for plant in plants:
+        pump = ComplexMoistureDevice(f"{plant.id} pump")
+        pump.update_moisture(0)
+        plant.register_device(pump)
+        plant.act_moisture = Moisture.DRY
+
+    def run():
+        for plant in plants:
+            plant.keep_alive_cycle()
+
+    return Case(run, len(plants))
+
+
+@benchmark('devices.send_command', 'plant-care')
+def send_command(context):
+    from devices import DeviceCollection, ComplexMoistureDevice, SimpleMoisturizer
+    from logger import Logger, LogLevel
+
+    collection = DeviceCollection("benchmark", Logger(name="benchmark", level=LogLevel.ERROR))
+    for i in range(4):
+        pump = ComplexMoistureDevice(f"pump {i}")
+        pump.update_moisture(0)
+        collection.add_device(pump)
+        collection.add_device(SimpleMoisturizer(f"probe {i}"))
+    count = context.scaled(100_000)
+
+    def run():
+        for _ in range(count):
+            collection.send_command("moisture", 1.0)
+
+    return Case(run, count)
+
+
+@benchmark('logger.sync', 'logging')
+def logger_sync(context):
+    # Formatting and printing in the caller (stdout goes to /dev/null while timed)
+    from logger import Logger
+
+    logger = Logger(name="benchmark")
+    count = context.scaled(50_000)
+
+    def run():
+        for i in range(count):
+            logger.info("Plant %s moisture is %s", i, "ok")
+
+    return Case(run, count, quiet=True)
+
+
+@benchmark('logger.async', 'logging')
+def logger_async(context):
+    # Caller side cost with the background writer; writing happens off the timed path
+    from logger import Logger, start_async_logging, stop_async_logging
+
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, "benchmark.log")
+    count = context.scaled(50_000)
+    writer = start_async_logging(path, max_pending=count * (context.repeat + 1))
+    logger = Logger(name="benchmark")
+
+    def run():
+        for i in range(count):
+            logger.info("Plant %s moisture is %s", i, "ok")
+
+    def teardown():
+        stop_async_logging()
+        for name in os.listdir(directory):
+            os.remove(os.path.join(directory, name))
+        os.rmdir(directory)
+        if writer.dropped:
+            print(f"  ⚠ logger.async: {writer.dropped} records dropped")
+
+    return Case(run, count, teardown)
+
+
+@benchmark('logger.filtered', 'logging')
+def logger_filtered(context):
+    # A call below the logger's level: what debug logging costs when it is off
+    from logger import Logger, LogLevel
+
+    logger = Logger(name="benchmark", level=LogLevel.ERROR)
+    count = context.scaled(200_000)
+
+    def run():
+        for i in range(count):
+            logger.debug("Plant %s moisture is %s", i, "ok")
+
+    return Case(run, count)
@@ -0,0 +1,73 @@
+import gc
+import os
+import sys
+import time
+import statistics
+from dataclasses import dataclass
+from typing import Callable
+
+# name -> (group, setup); filled by the @benchmark decorators of the *_benchmarks modules
+BENCHMARKS = {}
+
+
+@dataclass
+class Case:
+    """
+    What a benchmark setup returns: 'run' does 'operations' units of work and
+    is timed, 'teardown' (optional) runs once after the last repetition.
+    """
+    run: Callable[[], None]
+    operations: int
+    teardown: Callable[[], None] = None
+    quiet: bool = False  # send stdout to /dev/null while timing (synchronous Logger output)
+
+
+def benchmark(name: str, group: str):
+    """Register 'setup(context) -> Case' under 'name'."""
+    def register(setup):
+        BENCHMARKS[name] = (group, setup)
+        return setup
+    return register
+
+
+def measure(case: Case, repeat: int, warmup: int = 1) -> dict:
+    """
+    Time case.run 'repeat' times after 'warmup' untimed runs, with the garbage
+    collector off while timing. The best run is the headline figure (the
+    least disturbed by the machine), the median shows how noisy it was.
+    """
+    timings = []
+    devnull = open(os.devnull, 'w') if case.quiet else None
+    stdout = sys.stdout
+    gc_enabled = gc.isenabled()
+    try:
+        if devnull is not None:
+            sys.stdout = devnull
+        for i in range(warmup + repeat):
+            gc.collect()
+            gc.disable()
+            started = time.perf_counter()
+            case.run()
+            elapsed = time.perf_counter() - started
+            if gc_enabled:
+                gc.enable()
+            if i >= warmup:
+                timings.append(elapsed)
+    finally:
+        sys.stdout = stdout
+        if gc_enabled:
+            gc.enable()
+        if devnull is not None:
+            devnull.close()
+        if case.teardown is not None:
+            case.teardown()
+
+    best = min(timings)
+    return {
+        'operations': case.operations,
+        'repeat': repeat,
+        'best_seconds': round(best, 6),
+        'median_seconds': round(statistics.median(timings), 6),
+        'per_op_us': round(best / case.operations * 1e6, 3),
+        'ops_per_second': round(case.operations / best) if best else None,
+    }
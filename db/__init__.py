@@ -1,4 +1,4 @@
-from db.base import Base, DeviceTypeEnum, AlertSeverityEnum, AlertStatusEnum
+from db.base import Base, DeviceTypeEnum, AlertSeverityEnum, AlertStatusEnum, AlertRuleTypeEnum
 from db.user_models import User
 from db.device_models import Manufacturer, DeviceType, Device
 from db.plant_models import PlantType, Plant, PlantDeviceAssignment
@@ -9,6 +9,7 @@ from db.db_utils import (
     create_engine_instance, get_session, init_db, drop_all_tables,
     get_database_url
 )
+from db.async_db_utils import AsyncDBInterface, get_async_db_interface
 
 __all__ = [
     'Base',
@@ -17,8 +18,9 @@ __all__ = [
     'PlantType', 'Plant', 'PlantDeviceAssignment',
     'SensorData',
     'AlertRule', 'Alert',
-    'DeviceTypeEnum', 'AlertSeverityEnum', 'AlertStatusEnum',
+    'DeviceTypeEnum', 'AlertSeverityEnum', 'AlertStatusEnum', 'AlertRuleTypeEnum',
     'DBInterface', 'get_db_interface',
     'create_engine_instance', 'get_session', 'init_db', 'drop_all_tables',
-    'get_database_url'
+    'get_database_url',
+    'AsyncDBInterface', 'get_async_db_interface'
 ]
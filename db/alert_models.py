@@ -1,10 +1,10 @@
 from sqlalchemy import (
     Column, Integer, String, Float, DateTime, Boolean, ForeignKey,
-    Enum, Text, Index
+    Enum, Text, Index, DDL, event
 )
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, validates
 from sqlalchemy.sql import func
-from db.base import Base, AlertSeverityEnum, AlertStatusEnum
+from db.base import Base, AlertSeverityEnum, AlertStatusEnum, AlertRuleTypeEnum
 
 
 class AlertRule(Base):
@@ -14,10 +14,13 @@ class AlertRule(Base):
     user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
     plant_id = Column(Integer, ForeignKey('plants.id', ondelete='CASCADE'), nullable=False)
     rule_name = Column(String(255), nullable=False)
+    # One of the AlertRuleTypeEnum values (kept as a plain string, see _validate_rule_type)
     rule_type = Column(String(100), nullable=False)
     parameter_name = Column(String(100), nullable=False)
     condition_operator = Column(String(20), nullable=False)
     threshold_value = Column(Float, nullable=False)
+    window_minutes = Column(Integer)
+    duration_minutes = Column(Integer)
     severity = Column(Enum(AlertSeverityEnum), default=AlertSeverityEnum.WARNING, nullable=False)
     is_active = Column(Boolean, default=True, nullable=False, index=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
@@ -34,6 +37,11 @@ class AlertRule(Base):
         Index('idx_alert_rule_is_active', 'is_active'),
     )
 
+    @validates('rule_type')
+    def _validate_rule_type(self, key, value):
+        # Accepts a member or its value, stores the value; unknown types raise ValueError
+        return AlertRuleTypeEnum(value).value
+
     def __repr__(self):
         return f'<AlertRule {self.rule_name}>'
 
@@ -67,7 +75,58 @@ class Alert(Base):
         Index('idx_alert_rule', 'rule_id'),
         Index('idx_alert_status', 'status'),
         Index('idx_alert_triggered_at', 'triggered_at'),
+        # Inbox: active alerts of one user, newest first (keyset pagination on triggered_at, id)
+        Index('idx_alert_user_active_inbox', 'user_id', 'triggered_at', 'id',
+              postgresql_where=(status == AlertStatusEnum.ACTIVE)),
     )
 
     def __repr__(self):
         return f'<Alert severity={self.severity} status={self.status}>'
+
+
+# Keeps users.unresolved_alert_count in sync with the alerts table.
+# Statement-level triggers with transition tables, so a bulk UPDATE of many
+# alerts costs one counter update per affected user instead of one per row.
+sync_unresolved_alerts_function = DDL("""
+CREATE OR REPLACE FUNCTION sync_user_unresolved_alerts() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        UPDATE users u SET unresolved_alert_count = u.unresolved_alert_count + d.delta
+        FROM (SELECT user_id, COUNT(*) AS delta FROM new_rows
+              WHERE status <> 'RESOLVED' GROUP BY user_id) d
+        WHERE u.id = d.user_id;
+    ELSIF TG_OP = 'DELETE' THEN
+        UPDATE users u SET unresolved_alert_count = u.unresolved_alert_count - d.delta
+        FROM (SELECT user_id, COUNT(*) AS delta FROM old_rows
+              WHERE status <> 'RESOLVED' GROUP BY user_id) d
+        WHERE u.id = d.user_id;
+    ELSE
+        UPDATE users u SET unresolved_alert_count = u.unresolved_alert_count + d.delta
+        FROM (SELECT user_id, SUM(delta) AS delta FROM (
+                  SELECT user_id, 1 AS delta FROM new_rows WHERE status <> 'RESOLVED'
+                  UNION ALL
+                  SELECT user_id, -1 AS delta FROM old_rows WHERE status <> 'RESOLVED'
+              ) changes GROUP BY user_id) d
+        WHERE u.id = d.user_id AND d.delta <> 0;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+""")
+
+sync_unresolved_alerts_triggers = DDL("""
+CREATE TRIGGER trg_alerts_unresolved_insert AFTER INSERT ON alerts
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION sync_user_unresolved_alerts();
+CREATE TRIGGER trg_alerts_unresolved_update AFTER UPDATE ON alerts
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION sync_user_unresolved_alerts();
+CREATE TRIGGER trg_alerts_unresolved_delete AFTER DELETE ON alerts
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION sync_user_unresolved_alerts();
+""")
+
+event.listen(Alert.__table__, 'after_create',
+             sync_unresolved_alerts_function.execute_if(dialect='postgresql'))
+event.listen(Alert.__table__, 'after_create',
+             sync_unresolved_alerts_triggers.execute_if(dialect='postgresql'))
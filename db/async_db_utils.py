@@ -0,0 +1,220 @@
+import asyncio
+import logging
+import weakref
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from db.db_utils import PRIMARY, REPLICA, ConnectionSettings, DBInterface
+from db.sql_params import to_numbered_placeholders
+from db.sqlite_backend import is_memory_url
+
+logger = logging.getLogger(__name__)
+
+def _rowcount(status: str) -> int:
+    # asyncpg returns the command tag, e.g. 'INSERT 0 1' or 'UPDATE 3'
+    last = status.rsplit(" ", 1)[-1]
+    return int(last) if last.isdigit() else 0
+
+
+class AsyncDBInterface(ConnectionSettings):
+    """
+    asyncio counterpart of DBInterface, configured the same way (DATABASE_URL
+    or the POSTGRES_DB_* / POSTGRES_REPLICA_DB_* variables). The raw path
+    runs on asyncpg pools, one per role, and accepts the same psycopg2 style
+    queries; the ORM path is a SQLAlchemy AsyncEngine on the asyncpg dialect.
+    On SQLite the raw helpers run the sync DBInterface on a worker thread and
+    the ORM path needs the aiosqlite driver (an in-memory database is not
+    shared between the two). Everything is created on first use.
+    """
+    POSTGRES_DRIVER = "postgresql+asyncpg"
+    SQLITE_DRIVER = "sqlite+aiosqlite"
+
+    def __init__(self, database_url: str = None, min_pool_size: int = 2, max_pool_size: int = 10):
+        super().__init__(database_url)
+
+        self.min_pool_size = min_pool_size
+        self.max_pool_size = max_pool_size
+
+        self._pools = {}
+        # An asyncio.Lock belongs to the loop it is first used in, so each running loop gets its own
+        self._pool_locks = weakref.WeakKeyDictionary()
+        self._engine = None
+        self._session_factory = None
+        self._sync = DBInterface(database_url) if self.is_sqlite else None
+
+    @property
+    def engine(self):
+        if self._engine is None:
+            if self.is_sqlite:
+                options = {"poolclass": StaticPool} if is_memory_url(self.url) else {}
+                self._engine = create_async_engine(self.get_database_url(), echo=False, **options)
+            else:
+                self._engine = create_async_engine(
+                    self.get_database_url(),
+                    echo=False,
+                    pool_pre_ping=True,
+                    pool_recycle=3600,
+                    pool_size=self.max_pool_size,
+                    max_overflow=self.max_pool_size * 2
+                )
+        return self._engine
+
+    @property
+    def session_factory(self):
+        if self._session_factory is None:
+            self._session_factory = async_sessionmaker(bind=self.engine, expire_on_commit=False)
+        return self._session_factory
+
+    def get_session(self):
+        return self.session_factory()
+
+    def _pool_lock(self):
+        loop = asyncio.get_running_loop()
+        lock = self._pool_locks.get(loop)
+        if lock is None:
+            lock = self._pool_locks[loop] = asyncio.Lock()
+        return lock
+
+    def _connection_params(self, role: str):
+        if role == REPLICA and self.replica_enabled:
+            return dict(
+                host=self.REPLICA_DB_HOST,
+                port=int(self.REPLICA_DB_PORT),
+                user=self.REPLICA_DB_USER,
+                password=self.REPLICA_DB_PASSWORD,
+                database=self.REPLICA_DB_NAME,
+                # Replica connections refuse writes, like DBInterface's
+                server_settings={"default_transaction_read_only": "on"}
+            )
+        return dict(
+            host=self.DB_HOST,
+            port=int(self.DB_PORT),
+            user=self.DB_USER,
+            password=self.DB_PASSWORD,
+            database=self.DB_NAME
+        )
+
+    async def get_pool(self, role: str = PRIMARY):
+        role = self.resolve_role(role)
+        if role not in self._pools:
+            async with self._pool_lock():
+                if role not in self._pools:
+                    import asyncpg
+
+                    self._pools[role] = await asyncpg.create_pool(
+                        min_size=self.min_pool_size,
+                        max_size=self.max_pool_size,
+                        **self._connection_params(role)
+                    )
+                    logger.info(f"✓ Created async {role} connection pool")
+        return self._pools[role]
+
+    async def close(self):
+        pools, self._pools = self._pools, {}
+        for pool in pools.values():
+            await pool.close()
+        self._pool_locks.clear()
+        if self._engine is not None:
+            await self._engine.dispose()
+            self._engine = None
+            self._session_factory = None
+        if self._sync is not None:
+            self._sync.close()
+
+    @asynccontextmanager
+    async def connect_to_db(self, role: str = PRIMARY):
+        # Pooled asyncpg connection inside a transaction (commit on success, rollback on error);
+        # role="replica" uses the read replica when one is configured. PostgreSQL only
+        if self.is_sqlite:
+            raise NotImplementedError("connect_to_db needs PostgreSQL, use the execute_* helpers on SQLite")
+        pool = await self.get_pool(self.resolve_role(role, count=True))
+        async with pool.acquire() as conn:
+            try:
+                async with conn.transaction():
+                    yield conn
+            except Exception as e:
+                logger.error(f"✗ Database error: {e}")
+                raise
+
+    async def execute_query(self, query: str, params=None, role: str = PRIMARY):
+        # Primary by default, like DBInterface.execute_query
+        if self.is_sqlite:
+            return await asyncio.to_thread(self._sync.execute_query, query, params, role)
+        async with self.connect_to_db(role) as conn:
+            rows = await conn.fetch(to_numbered_placeholders(query), *(params or ()))
+            return [tuple(row) for row in rows]
+
+    async def execute_update(self, query: str, params=None):
+        if self.is_sqlite:
+            return await asyncio.to_thread(self._sync.execute_update, query, params)
+        self.note_write()
+        async with self.connect_to_db() as conn:
+            status = await conn.execute(to_numbered_placeholders(query), *(params or ()))
+            return _rowcount(status)
+
+    async def execute_many(self, query: str, params_seq):
+        """Run one statement for every parameter tuple, pipelined in a single transaction."""
+        if self.is_sqlite:
+            return await asyncio.to_thread(self._execute_many_sqlite, query, list(params_seq))
+        self.note_write()
+        async with self.connect_to_db() as conn:
+            await conn.executemany(to_numbered_placeholders(query), params_seq)
+
+    def _execute_many_sqlite(self, query: str, params_seq):
+        with self._sync.connect_to_db() as (cur, conn):
+            cur.executemany(query, params_seq)
+
+    async def get_device_by_id(self, device_id: int):
+        query = "SELECT * FROM devices WHERE id = %s"
+        results = await self.execute_query(query, (device_id,))
+        return results[0] if results else None
+
+    async def insert_sensor_data(self, device_id: int, measurement_value: float, measurement_unit: str):
+        query = """
+            INSERT INTO sensor_data (device_id, measurement_value, measurement_unit, timestamp)
+            VALUES (%s, %s, %s, NOW())
+        """
+        return await self.execute_update(query, (device_id, measurement_value, measurement_unit))
+
+    async def insert_sensor_data_many(self, readings, use_copy: bool = False):
+        """
+        Insert many (device_id, measurement_value, measurement_unit) readings.
+        The default pipelines one prepared INSERT per reading; 'use_copy'
+        streams them with COPY (timestamps set by the client) for large batches
+        on PostgreSQL.
+        """
+        readings = list(readings)
+        if not readings:
+            return 0
+        if use_copy and not self.is_sqlite:
+            self.note_write()
+            now = datetime.now(timezone.utc)
+            async with self.connect_to_db() as conn:
+                await conn.copy_records_to_table(
+                    'sensor_data',
+                    records=[(device_id, value, unit, now) for device_id, value, unit in readings],
+                    columns=['device_id', 'measurement_value', 'measurement_unit', 'timestamp']
+                )
+            return len(readings)
+
+        await self.execute_many(
+            """
+            INSERT INTO sensor_data (device_id, measurement_value, measurement_unit, timestamp)
+            VALUES (%s, %s, %s, NOW())
+            """,
+            readings
+        )
+        return len(readings)
+
+
+_async_db_interface = None
+
+
+def get_async_db_interface():
+    global _async_db_interface
+    if _async_db_interface is None:
+        _async_db_interface = AsyncDBInterface()
+    return _async_db_interface
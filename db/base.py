@@ -20,3 +20,11 @@ class AlertStatusEnum(PyEnum):
     ACTIVE = "active"
     ACKNOWLEDGED = "acknowledged"
     RESOLVED = "resolved"
+
+
+class AlertRuleTypeEnum(PyEnum):
+    THRESHOLD = "threshold"
+    WINDOW_AVERAGE = "window_average"
+    RATE_OF_CHANGE = "rate_of_change"
+    TIME_OUT_OF_RANGE = "time_out_of_range"
+    NO_DATA = "no_data"
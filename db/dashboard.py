@@ -0,0 +1,152 @@
+from dataclasses import dataclass, field
+
+from sqlalchemy import select
+from sqlalchemy.orm import aliased, joinedload
+from sqlalchemy.orm.attributes import set_committed_value
+
+from db.base import AlertStatusEnum
+from db.user_models import User
+from db.device_models import Device
+from db.plant_models import Plant, PlantDeviceAssignment
+from db.sensor_models import SensorData
+from db.alert_models import Alert
+
+# Queries issued by load_dashboard, whatever the number of plants and devices
+DASHBOARD_QUERIES = 5
+
+
+@dataclass
+class Dashboard:
+    """
+    A user with plants, plant types, device assignments and devices loaded,
+    plus the latest reading of every device and the open alerts of every plant.
+    Built by load_dashboard; nothing in it triggers further queries.
+    """
+    user: User
+    latest_readings: dict = field(default_factory=dict)  # device_id -> SensorData
+    open_alerts: dict = field(default_factory=dict)      # plant_id -> [Alert], newest first
+
+    @property
+    def plants(self):
+        return self.user.plants
+
+    def latest_reading(self, device):
+        return self.latest_readings.get(device.id)
+
+    def alerts(self, plant):
+        return self.open_alerts.get(plant.id, [])
+
+    def as_dict(self):
+        """The tree as plain data (e.g. for a JSON response)."""
+        return {
+            'id': self.user.id,
+            'username': self.user.username,
+            'plants': [
+                {
+                    'id': plant.id,
+                    'name': plant.plant_name,
+                    'type': plant.plant_type.name,
+                    'location': plant.location,
+                    'is_healthy': plant.is_healthy,
+                    'devices': [self._device_dict(a) for a in plant.device_assignments],
+                    'open_alerts': [
+                        {
+                            'id': alert.id,
+                            'severity': alert.severity.value,
+                            'status': alert.status.value,
+                            'message': alert.message,
+                            'triggered_at': alert.triggered_at,
+                        }
+                        for alert in self.alerts(plant)
+                    ],
+                }
+                for plant in self.plants
+            ],
+        }
+
+    def _device_dict(self, assignment):
+        device = assignment.device
+        reading = self.latest_reading(device)
+        return {
+            'id': device.id,
+            'name': device.device_name,
+            'type': device.device_type.name,
+            'assignment': assignment.assignment_type,
+            'is_active': assignment.is_active,
+            'latest_reading': None if reading is None else {
+                'value': reading.measurement_value,
+                'unit': reading.measurement_unit,
+                'timestamp': reading.timestamp,
+            },
+        }
+
+
+def latest_readings_statement(user_id: int):
+    # Newest reading id per device, each found by one backward probe of
+    # idx_sensor_data_device_timestamp, so the cost follows the device count, not the history
+    newest = aliased(SensorData)
+    newest_id = (
+        select(newest.id)
+        .where(newest.device_id == Device.id)
+        .order_by(newest.timestamp.desc(), newest.id.desc())
+        .limit(1)
+        .correlate(Device)
+        .scalar_subquery()
+    )
+    user_devices = (
+        select(PlantDeviceAssignment.device_id)
+        .join(Plant, Plant.id == PlantDeviceAssignment.plant_id)
+        .where(Plant.user_id == user_id)
+    )
+    return select(SensorData).where(
+        SensorData.id.in_(select(newest_id).where(Device.id.in_(user_devices)))
+    )
+
+
+def load_dashboard(session, user_id: int):
+    """
+    Load the dashboard tree of a user in DASHBOARD_QUERIES queries: user, plants
+    (with type), assignments (with device and device type), latest readings and
+    open alerts. Every query filters on the user, so none of them grows into
+    per-plant or per-device round trips. Returns None for an unknown user.
+    """
+    user = session.execute(select(User).where(User.id == user_id)).scalar_one_or_none()
+    if user is None:
+        return None
+
+    plants = session.execute(
+        select(Plant)
+        .options(joinedload(Plant.plant_type))
+        .where(Plant.user_id == user_id)
+        .order_by(Plant.id)
+    ).scalars().all()
+
+    assignments = session.execute(
+        select(PlantDeviceAssignment)
+        .join(Plant, Plant.id == PlantDeviceAssignment.plant_id)
+        .options(joinedload(PlantDeviceAssignment.device).joinedload(Device.device_type))
+        .where(Plant.user_id == user_id)
+        .order_by(PlantDeviceAssignment.id)
+    ).scalars().all()
+
+    readings = session.execute(latest_readings_statement(user_id)).scalars().all()
+
+    alerts = session.execute(
+        select(Alert)
+        .where(Alert.user_id == user_id, Alert.status != AlertStatusEnum.RESOLVED)
+        .order_by(Alert.triggered_at.desc(), Alert.id.desc())
+    ).scalars().all()
+
+    # Wire the collections up as if they had been loaded, so walking them does not query
+    # again (many-to-one back references like assignment.plant come from the identity map)
+    by_plant = {plant.id: [] for plant in plants}
+    for assignment in assignments:
+        by_plant[assignment.plant_id].append(assignment)
+    for plant in plants:
+        set_committed_value(plant, 'device_assignments', by_plant[plant.id])
+    set_committed_value(user, 'plants', plants)
+
+    dashboard = Dashboard(user, {reading.device_id: reading for reading in readings})
+    for alert in alerts:
+        dashboard.open_alerts.setdefault(alert.plant_id, []).append(alert)
+    return dashboard
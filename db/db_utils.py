@@ -1,26 +1,184 @@
 import os
+import time
 import logging
+import threading
+import contextvars
 import psycopg2
+import psycopg2.pool
 from contextlib import contextmanager
 
+import psycopg2.extras
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from db.base import Base
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session, sessionmaker
+from db.base import Base, AlertStatusEnum
+from db.prepared_statements import PreparedStatementRegistry, PreparingConnection
+from db.instrumentation import QueryInstrumentation
+from db.dashboard import load_dashboard
+from db.sqlite_backend import SQLiteCursor, create_sqlite_engine
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+PRIMARY = "primary"
+REPLICA = "replica"
 
-class DBInterface:
-    def __init__(self):
+_REPLICA_SETTINGS = ("HOST", "PORT", "USER", "PASSWORD", "NAME")
+# Replica connections refuse writes, so a mis-routed write fails loudly
+# even when one instance is configured as both roles
+_READ_ONLY_OPTIONS = "-c default_transaction_read_only=on"
+# Read-your-writes for the caller that wrote: a write pins the replica reads of
+# the current thread (or asyncio task) to the primary until this deadline;
+# every other caller keeps reading from the replica
+_primary_until = contextvars.ContextVar("primary_until", default=0.0)
+
+# Hot raw queries, run as named prepared statements (see execute_prepared)
+PREPARED_STATEMENTS = {
+    "get_device_by_id": "SELECT * FROM devices WHERE id = %s",
+    "insert_sensor_data": """
+        INSERT INTO sensor_data (device_id, measurement_value, measurement_unit, timestamp)
+        VALUES (%s, %s, %s, NOW())
+    """,
+    "get_plant_details": """
+        SELECT p.id, p.plant_name, pt.optimal_temperature, pt.optimal_humidity,
+               pt.optimal_light, pt.water_frequency_days
+        FROM plants p
+        JOIN plant_types pt ON pt.id = p.plant_type_id
+        WHERE pt.name = %s
+    """,
+}
+
+
+class RoutingSession(Session):
+    """
+    Session that sends reads to the replica engine and everything else to
+    the primary. A role given to get_session() pins the whole session, a
+    per-call hint goes through bind_arguments:
+
+        session.execute(stmt, bind_arguments={"role": "primary"})
+
+    Once the session has flushed or executed anything but a plain SELECT it
+    sticks to the primary, so it always reads its own writes; the write also
+    pins the replica reads of the calling thread to the primary for
+    replica_pin_seconds (see DBInterface.note_write).
+    """
+
+    def __init__(self, *args, db=None, role=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.db = db
+        self.role = role
+        self.wrote = False
+
+    def get_bind(self, mapper=None, clause=None, bind=None, role=None, **kwargs):
+        if bind is not None:
+            return bind
+        if self._flushing or clause is None or not _is_plain_select(clause):
+            self.wrote = True
+            self.db.note_write()
+        role = role or self.role
+        if role is None:
+            role = PRIMARY if self.wrote else REPLICA
+        return self.db.get_engine(role, count=True)
+
+
+def _is_plain_select(clause) -> bool:
+    # SELECT ... FOR UPDATE takes row locks, which only the primary can do
+    return getattr(clause, "is_select", False) and getattr(clause, "_for_update_arg", None) is None
+
+
+class ConnectionSettings:
+    """
+    Connection settings shared by DBInterface and AsyncDBInterface: the
+    POSTGRES_DB_* variables or a URL (argument or DATABASE_URL) that also
+    selects the backend, the optional POSTGRES_REPLICA_DB_* read replica and
+    the read-your-writes routing between primary and replica.
+    """
+    # Drivers get_database_url puts in the URLs it builds
+    POSTGRES_DRIVER = "postgresql"
+    SQLITE_DRIVER = "sqlite"
+    
+    def __init__(self, database_url: str = None):
         self.DB_HOST = os.environ.get("POSTGRES_DB_HOST", "localhost")
         self.DB_PORT = os.environ.get("POSTGRES_DB_PORT", "5432")
         self.DB_USER = os.environ.get("POSTGRES_DB_USER", "iot_user")
         self.DB_PASSWORD = os.environ.get("POSTGRES_DB_PASSWORD", "iot_password")
         self.DB_NAME = os.environ.get("POSTGRES_DB_NAME", "iot_plant_db")
         
+        # A URL (argument or DATABASE_URL) overrides the settings above and selects the
+        # backend: postgresql://... or sqlite:///path/to/file.db / sqlite:// (in-memory)
+        database_url = database_url or os.environ.get("DATABASE_URL")
+        self.url = make_url(database_url) if database_url else None
+        self.backend = self.url.get_backend_name() if self.url is not None else "postgresql"
+        if self.backend == "postgresql" and self.url is not None:
+            self.DB_HOST = self.url.host or self.DB_HOST
+            self.DB_PORT = str(self.url.port or self.DB_PORT)
+            self.DB_USER = self.url.username or self.DB_USER
+            self.DB_PASSWORD = self.url.password or self.DB_PASSWORD
+            self.DB_NAME = self.url.database or self.DB_NAME
+        elif self.backend not in ("postgresql", "sqlite"):
+            raise ValueError(f"Unsupported database backend: {self.backend}")
+        
+        # Optional read replica, every setting defaults to the primary's
+        self.replica_enabled = not self.is_sqlite and any(
+            f"POSTGRES_REPLICA_DB_{name}" in os.environ for name in _REPLICA_SETTINGS
+        )
+        self.REPLICA_DB_HOST = os.environ.get("POSTGRES_REPLICA_DB_HOST", self.DB_HOST)
+        self.REPLICA_DB_PORT = os.environ.get("POSTGRES_REPLICA_DB_PORT", self.DB_PORT)
+        self.REPLICA_DB_USER = os.environ.get("POSTGRES_REPLICA_DB_USER", self.DB_USER)
+        self.REPLICA_DB_PASSWORD = os.environ.get("POSTGRES_REPLICA_DB_PASSWORD", self.DB_PASSWORD)
+        self.REPLICA_DB_NAME = os.environ.get("POSTGRES_REPLICA_DB_NAME", self.DB_NAME)
+        
+        self.route_counts = {PRIMARY: 0, REPLICA: 0}
+        self._route_lock = threading.Lock()
+        # After a write, replica reads go to the primary for this long (replication lag)
+        self.replica_pin_seconds = float(os.environ.get("POSTGRES_REPLICA_PIN_SECONDS", "5"))
+    
+    @property
+    def is_sqlite(self):
+        return self.backend == "sqlite"
+    
+    def resolve_role(self, role: str = PRIMARY, count: bool = False):
+        # Without a configured replica, or shortly after this caller wrote, every role resolves to the primary
+        if role != REPLICA or not self.replica_enabled or time.monotonic() < _primary_until.get():
+            role = PRIMARY
+        if count:
+            with self._route_lock:
+                self.route_counts[role] += 1
+        return role
+    
+    def note_write(self):
+        # Called by the write paths: pins the calling thread's (or task's) replica
+        # reads to the primary for replica_pin_seconds
+        if self.replica_enabled:
+            _primary_until.set(time.monotonic() + self.replica_pin_seconds)
+    
+    def get_database_url(self, role: str = PRIMARY):
+        if self.is_sqlite:
+            return self.url.set(drivername=self.SQLITE_DRIVER).render_as_string(hide_password=False)
+        if role == REPLICA and self.replica_enabled:
+            return (f'{self.POSTGRES_DRIVER}://{self.REPLICA_DB_USER}:{self.REPLICA_DB_PASSWORD}'
+                    f'@{self.REPLICA_DB_HOST}:{self.REPLICA_DB_PORT}/{self.REPLICA_DB_NAME}')
+        return (f'{self.POSTGRES_DRIVER}://{self.DB_USER}:{self.DB_PASSWORD}'
+                f'@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}')
+
+
+class DBInterface(ConnectionSettings):
+    def __init__(self, database_url: str = None):
+        super().__init__(database_url)
+        
         self._engine = None
+        self._replica_engine = None
         self._session_factory = None
+        
+        # Raw psycopg2 connections are pooled per role, so prepared statements survive between calls
+        self.raw_pool_size = int(os.environ.get("POSTGRES_RAW_POOL_SIZE", "10"))
+        self._raw_pools = {}
+        self._raw_pool_lock = threading.Lock()
+        self.prepared = PreparedStatementRegistry()
+        for name, query in PREPARED_STATEMENTS.items():
+            self.prepared.register(name, query)
+        
+        self.instrumentation = None
     
     @property
     def engine(self):
@@ -28,30 +186,66 @@ class DBInterface:
             self._engine = self._create_engine()
         return self._engine
     
+    @property
+    def replica_engine(self):
+        if not self.replica_enabled:
+            return self.engine
+        if self._replica_engine is None:
+            self._replica_engine = self._create_engine(REPLICA)
+        return self._replica_engine
+    
+    def get_engine(self, role: str = PRIMARY, count: bool = False):
+        role = self.resolve_role(role, count)
+        return self.replica_engine if role == REPLICA else self.engine
+    
     @property
     def session_factory(self):
         if self._session_factory is None:
-            self._session_factory = sessionmaker(bind=self.engine)
+            if self.replica_enabled:
+                self._session_factory = sessionmaker(class_=RoutingSession, db=self)
+            else:
+                self._session_factory = sessionmaker(bind=self.engine)
         return self._session_factory
     
-    def _create_engine(self):
+    def _create_engine(self, role: str = PRIMARY):
+        if self.is_sqlite:
+            return create_sqlite_engine(self.url)
         # Connection pooling configured for production use
-        database_url = f'postgresql://{self.DB_USER}:{self.DB_PASSWORD}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}'
+        connect_args = {"options": _READ_ONLY_OPTIONS} if role == REPLICA else {}
         return create_engine(
-            database_url,
+            self.get_database_url(role),
             echo=False,
             pool_pre_ping=True,
             pool_recycle=3600,
             pool_size=10,
-            max_overflow=20
+            max_overflow=20,
+            connect_args=connect_args
         )
     
-    def get_database_url(self):
-        return f'postgresql://{self.DB_USER}:{self.DB_PASSWORD}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}'
-    
-    def get_session(self):
+    def get_session(self, role: str = None):
+        # role=None routes reads to the replica (when configured) with read-your-writes
+        # stickiness; "primary" or "replica" pins the whole session to one engine
+        if role is not None and self.replica_enabled:
+            return self.session_factory(role=role)
         return self.session_factory()
     
+    def enable_instrumentation(self, n_plus_one_threshold: int = 10):
+        # Opt-in statement statistics and N+1 detection on the SQLAlchemy engines
+        # (see db.instrumentation); the raw psycopg2 helpers are not covered
+        if self.instrumentation is None:
+            self.instrumentation = QueryInstrumentation(n_plus_one_threshold)
+            self.instrumentation.track_sessions(self.session_factory)
+        self.instrumentation.n_plus_one_threshold = n_plus_one_threshold
+        self.instrumentation.install(self.engine)
+        if self.replica_enabled:
+            self.instrumentation.install(self.replica_engine)
+        return self.instrumentation
+    
+    def disable_instrumentation(self):
+        if self.instrumentation is not None:
+            self.instrumentation.uninstall()
+            self.instrumentation = None
+    
     def init_db(self):
         try:
             Base.metadata.create_all(self.engine)
@@ -70,46 +264,111 @@ class DBInterface:
             logger.error(f"✗ Error dropping tables: {e}")
             return False
     
+    def _connection_params(self, role: str):
+        if role == REPLICA and self.replica_enabled:
+            return dict(
+                dbname=self.REPLICA_DB_NAME,
+                user=self.REPLICA_DB_USER,
+                password=self.REPLICA_DB_PASSWORD,
+                port=self.REPLICA_DB_PORT,
+                host=self.REPLICA_DB_HOST,
+                options=_READ_ONLY_OPTIONS
+            )
+        return dict(
+            dbname=self.DB_NAME,
+            user=self.DB_USER,
+            password=self.DB_PASSWORD,
+            port=self.DB_PORT,
+            host=self.DB_HOST
+        )
+    
+    def _get_raw_pool(self, role: str):
+        # (pool, slots) of the role; ThreadedConnectionPool raises when exhausted,
+        # the semaphore makes callers wait for a free connection instead
+        entry = self._raw_pools.get(role)
+        if entry is None:
+            with self._raw_pool_lock:
+                entry = self._raw_pools.get(role)
+                if entry is None:
+                    pool = psycopg2.pool.ThreadedConnectionPool(
+                        0, self.raw_pool_size,
+                        connection_factory=PreparingConnection,
+                        **self._connection_params(role)
+                    )
+                    entry = self._raw_pools[role] = (pool, threading.BoundedSemaphore(self.raw_pool_size))
+                    logger.info(f"✓ Created {role} connection pool")
+        return entry
+    
+    def close(self):
+        # Close the pooled raw connections and dispose of the engines
+        with self._raw_pool_lock:
+            pools, self._raw_pools = self._raw_pools, {}
+        for pool, _ in pools.values():
+            pool.closeall()
+        for engine in (self._engine, self._replica_engine):
+            if engine is not None:
+                engine.dispose()
+    
     @contextmanager
-    def connect_to_db(self):
-        # Context manager for raw psycopg2 connections with automatic cleanup
+    def connect_to_db(self, role: str = PRIMARY):
+        # Context manager for pooled raw psycopg2 connections: commits on success,
+        # rolls back on error; role="replica" uses the read replica when one is configured
+        role = self.resolve_role(role, count=True)
+        if self.is_sqlite:
+            with self._connect_to_sqlite() as (cur, conn):
+                yield cur, conn
+            return
+        pool, slots = self._get_raw_pool(role)
+        slots.acquire()
         cur = None
         conn = None
         try:
-            conn = psycopg2.connect(
-                dbname=self.DB_NAME,
-                user=self.DB_USER,
-                password=self.DB_PASSWORD,
-                port=self.DB_PORT,
-                host=self.DB_HOST
-            )
-            
-            if conn.closed == 0:
-                logger.info("✓ Successfully connected to database")
-                cur = conn.cursor()
-                yield cur, conn
-                conn.commit()
-                logger.info("✓ Committed changes to database")
+            conn = pool.getconn()
+            cur = conn.cursor()
+            yield cur, conn
+            conn.commit()
         
         except psycopg2.DatabaseError as e:
             logger.error(f"✗ Database error: {e}")
-            if conn:
+            if conn and conn.closed == 0:
                 conn.rollback()
             raise
         
         except Exception as e:
             logger.error(f"✗ Connection error: {e}")
+            if conn and conn.closed == 0:
+                conn.rollback()
             raise
         
         finally:
-            if cur:
+            if cur and not cur.closed:
                 cur.close()
-            if conn and conn.closed == 0:
-                conn.close()
-                logger.info("✓ Closed database connection")
+            if conn is not None:
+                # A broken connection is dropped, the next call reconnects (and prepares again)
+                pool.putconn(conn, close=conn.closed != 0)
+            slots.release()
     
-    def execute_query(self, query: str, params=None):
-        with self.connect_to_db() as (cur, conn):
+    @contextmanager
+    def _connect_to_sqlite(self):
+        # sqlite3 connection from the engine's pool (pragmas applied), behind a cursor
+        # that accepts the psycopg2 style queries used throughout this class
+        conn = self.engine.raw_connection()
+        cur = SQLiteCursor(conn.cursor(), conn)
+        try:
+            yield cur, conn
+            conn.commit()
+        except Exception as e:
+            logger.error(f"✗ Database error: {e}")
+            conn.rollback()
+            raise
+        finally:
+            cur.close()
+            conn.close()
+    
+    def execute_query(self, query: str, params=None, role: str = PRIMARY):
+        # Primary by default: also used for UPDATE ... RETURNING. Pass role="replica"
+        # for reads that can tolerate replication lag
+        with self.connect_to_db(role) as (cur, conn):
             if params:
                 cur.execute(query, params)
             else:
@@ -117,6 +376,7 @@ class DBInterface:
             return cur.fetchall()
     
     def execute_update(self, query: str, params=None):
+        self.note_write()
         with self.connect_to_db() as (cur, conn):
             if params:
                 cur.execute(query, params)
@@ -124,27 +384,166 @@ class DBInterface:
                 cur.execute(query)
             return cur.rowcount
     
+    def execute_prepared(self, name: str, params=(), role: str = PRIMARY):
+        # Like execute_query, for a statement registered in self.prepared
+        # (sqlite3 already caches compiled statements per connection)
+        if self.is_sqlite:
+            return self.execute_query(self.prepared.query(name), params, role=role)
+        with self.connect_to_db(role) as (cur, conn):
+            self.prepared.execute(cur, name, params)
+            return cur.fetchall()
+    
+    def execute_prepared_update(self, name: str, params=()):
+        self.note_write()
+        if self.is_sqlite:
+            return self.execute_update(self.prepared.query(name), params)
+        with self.connect_to_db() as (cur, conn):
+            self.prepared.execute(cur, name, params)
+            return cur.rowcount
+    
+    def insert_sensor_data_many(self, readings, page_size: int = 1000):
+        # Batched insert of (device_id, measurement_value, measurement_unit) readings in one
+        # transaction: multi-row INSERTs on PostgreSQL, one executemany on SQLite
+        readings = list(readings)
+        if not readings:
+            return 0
+        self.note_write()
+        with self.connect_to_db() as (cur, conn):
+            if self.is_sqlite:
+                cur.executemany(
+                    """
+                    INSERT INTO sensor_data (device_id, measurement_value, measurement_unit, timestamp)
+                    VALUES (%s, %s, %s, NOW())
+                    """,
+                    readings
+                )
+            else:
+                psycopg2.extras.execute_values(
+                    cur,
+                    """
+                    INSERT INTO sensor_data (device_id, measurement_value, measurement_unit, timestamp)
+                    VALUES %s
+                    """,
+                    readings,
+                    template="(%s, %s, %s, NOW())",
+                    page_size=page_size
+                )
+        return len(readings)
+    
     def get_plant_details(self, plant_type: str):
-        query = """
-            SELECT id, plant_name, min_temperature, max_temperature, 
-                   min_humidity, max_humidity, min_soil_moisture, max_soil_moisture, 
-                   min_light_intensity
-            FROM plants 
-            WHERE plant_type_id = (SELECT id FROM plant_types WHERE name = %s)
-        """
-        return self.execute_query(query, (plant_type,))
+        return self.execute_prepared("get_plant_details", (plant_type,))
     
     def get_device_by_id(self, device_id: int):
-        query = "SELECT * FROM devices WHERE id = %s"
-        results = self.execute_query(query, (device_id,))
+        results = self.execute_prepared("get_device_by_id", (device_id,))
         return results[0] if results else None
     
     def insert_sensor_data(self, device_id: int, measurement_value: float, measurement_unit: str):
+        return self.execute_prepared_update("insert_sensor_data", (device_id, measurement_value, measurement_unit))
+    
+    def get_alert_inbox(self, user_id: int, limit: int = 50, cursor=None, role: str = REPLICA):
+        # Keyset pagination over active alerts, newest first; pass the returned
+        # cursor back in to fetch the next page (served by idx_alert_user_active_inbox).
+        # Replica by default (primary right after this caller wrote), role="primary" for a fresh read
+        if cursor is None:
+            query = """
+                SELECT id, plant_id, rule_id, severity, message,
+                       triggered_value, threshold_value, triggered_at
+                FROM alerts
+                WHERE user_id = %s AND status = %s
+                ORDER BY triggered_at DESC, id DESC
+                LIMIT %s
+            """
+            params = (user_id, AlertStatusEnum.ACTIVE.name, limit)
+        else:
+            query = """
+                SELECT id, plant_id, rule_id, severity, message,
+                       triggered_value, threshold_value, triggered_at
+                FROM alerts
+                WHERE user_id = %s AND status = %s
+                  AND (triggered_at, id) < (%s, %s)
+                ORDER BY triggered_at DESC, id DESC
+                LIMIT %s
+            """
+            params = (user_id, AlertStatusEnum.ACTIVE.name, cursor[0], cursor[1], limit)
+        
+        rows = self.execute_query(query, params, role=role)
+        next_cursor = (rows[-1][7], rows[-1][0]) if len(rows) == limit else None
+        return rows, next_cursor
+    
+    def acknowledge_alerts(self, user_id: int, alert_ids=None):
+        # Set-based transition ACTIVE -> ACKNOWLEDGED; alert_ids=None acknowledges every active alert of the user
+        if alert_ids is not None and not alert_ids:
+            return []
+        query = """
+            UPDATE alerts
+            SET status = %s, acknowledged_at = NOW(), updated_at = NOW()
+            WHERE user_id = %s AND status = %s
+        """
+        params = [AlertStatusEnum.ACKNOWLEDGED.name, user_id, AlertStatusEnum.ACTIVE.name]
+        if alert_ids is not None:
+            query += " AND id = ANY(%s)"
+            params.append(list(alert_ids))
+        query += " RETURNING id, acknowledged_at"
+        self.note_write()
+        return self.execute_query(query, tuple(params))
+    
+    def resolve_alerts(self, user_id: int, alert_ids=None):
+        # Set-based transition to RESOLVED from either ACTIVE or ACKNOWLEDGED
+        if alert_ids is not None and not alert_ids:
+            return []
+        query = """
+            UPDATE alerts
+            SET status = %s, resolved_at = NOW(), updated_at = NOW()
+            WHERE user_id = %s AND status <> %s
+        """
+        params = [AlertStatusEnum.RESOLVED.name, user_id, AlertStatusEnum.RESOLVED.name]
+        if alert_ids is not None:
+            query += " AND id = ANY(%s)"
+            params.append(list(alert_ids))
+        query += " RETURNING id, resolved_at"
+        self.note_write()
+        return self.execute_query(query, tuple(params))
+    
+    def get_dashboard(self, user_id: int, role: str = REPLICA):
+        # The user's plants, devices, latest readings and open alerts in a fixed number
+        # of queries (see db.dashboard); the objects stay usable after the session closes
+        session = self.get_session(role=role)
+        try:
+            return load_dashboard(session, user_id)
+        finally:
+            session.close()
+    
+    def get_unresolved_alert_count(self, user_id: int, role: str = REPLICA):
+        # Maintained by the alerts triggers, so this is a primary key lookup
+        results = self.execute_query(
+            "SELECT unresolved_alert_count FROM users WHERE id = %s", (user_id,), role=role
+        )
+        return results[0][0] if results else 0
+    
+    def resync_unresolved_alert_counts(self):
+        # Recompute the counters from scratch (after manual data fixes or restoring a dump)
         query = """
-            INSERT INTO sensor_data (device_id, measurement_value, measurement_unit, timestamp)
-            VALUES (%s, %s, %s, NOW())
+            UPDATE users u
+            SET unresolved_alert_count = COALESCE(c.unresolved, 0)
+            FROM users u2
+            LEFT JOIN (
+                SELECT user_id, COUNT(*) AS unresolved
+                FROM alerts WHERE status <> %s
+                GROUP BY user_id
+            ) c ON c.user_id = u2.id
+            WHERE u.id = u2.id AND u.unresolved_alert_count <> COALESCE(c.unresolved, 0)
         """
-        return self.execute_update(query, (device_id, measurement_value, measurement_unit))
+        if self.is_sqlite:
+            # SQLite cannot alias the UPDATE target in a self join
+            query = """
+                UPDATE users
+                SET unresolved_alert_count = COALESCE(c.unresolved, 0)
+                FROM (SELECT u.id AS user_id, COUNT(a.id) AS unresolved
+                      FROM users u LEFT JOIN alerts a ON a.user_id = u.id AND a.status <> %s
+                      GROUP BY u.id) c
+                WHERE users.id = c.user_id AND users.unresolved_alert_count <> c.unresolved
+            """
+        return self.execute_update(query, (AlertStatusEnum.RESOLVED.name,))
 
 
 _db_interface = None
@@ -0,0 +1,268 @@
+import re
+import time
+import bisect
+import logging
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+from functools import lru_cache
+
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds of the latency buckets in seconds (10us .. 10s, 1-2-5 steps); the last bucket is open
+BUCKET_BOUNDS = tuple(base * 10.0 ** exponent for exponent in range(-5, 1) for base in (1, 2, 5)) + (10.0,)
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PARAM = re.compile(r"%\(\w+\)s|%s|\$\d+|\?|(?<!:):\w+")
+_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACE = re.compile(r"\s+")
+_SELECT_LIST = re.compile(r"SELECT [^()]+? FROM ")
+
+_current_unit = contextvars.ContextVar("query_unit_of_work", default=None)
+
+
+@lru_cache(maxsize=4096)
+def fingerprint(statement: str) -> str:
+    """Statement with literals and parameters replaced by '?', so one query shape is one key."""
+    statement = _STRING.sub("?", statement)
+    statement = _PARAM.sub("?", statement)
+    statement = _NUMBER.sub("?", statement)
+    statement = _LIST.sub("(...)", statement)
+    return _SPACE.sub(" ", statement).strip()
+
+
+def _display(key: str, width: int) -> str:
+    # ORM statements start with long column lists, the FROM / WHERE part is what identifies them
+    return _SELECT_LIST.sub("SELECT ... FROM ", key)[:width]
+
+
+class StatementStats:
+    __slots__ = ("counts", "count", "total", "max", "rows")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKET_BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.rows = 0
+
+    def record(self, seconds: float, rows: int):
+        self.counts[bisect.bisect_left(BUCKET_BOUNDS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        if rows > 0:
+            self.rows += rows
+
+    def percentile(self, fraction: float) -> float:
+        """Upper bound of the bucket holding the given fraction of executions."""
+        target = fraction * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return BUCKET_BOUNDS[i] if i < len(BUCKET_BOUNDS) else self.max
+        return self.max
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "total_ms": round(self.total * 1000, 2),
+            "mean_ms": round(self.total / self.count * 1000, 3) if self.count else 0.0,
+            "p50_ms": round(self.percentile(0.50) * 1000, 3),
+            "p99_ms": round(self.percentile(0.99) * 1000, 3),
+            "max_ms": round(self.max * 1000, 3),
+            "rows": self.rows,
+        }
+
+
+class UnitOfWork:
+    """Queries issued by one request / session transaction, by fingerprint."""
+
+    __slots__ = ("label", "queries", "seconds", "by_fingerprint")
+
+    def __init__(self, label: str):
+        self.label = label
+        self.queries = 0
+        self.seconds = 0.0
+        self.by_fingerprint = {}
+
+    def record(self, key: str, seconds: float):
+        self.queries += 1
+        self.seconds += seconds
+        self.by_fingerprint[key] = self.by_fingerprint.get(key, 0) + 1
+
+
+class QueryInstrumentation:
+    """
+    Opt-in statement statistics for SQLAlchemy engines, fed by the
+    before/after_cursor_execute events: a latency histogram and row count per
+    statement fingerprint, and query counts per unit of work. A unit of work
+    is an explicit unit_of_work() block, or else one session transaction.
+    A fingerprint executed more than 'n_plus_one_threshold' times in one
+    unit is reported as a likely N+1 (a lazy load inside a loop).
+    """
+
+    def __init__(self, n_plus_one_threshold: int = 10, max_findings: int = 100):
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.enabled = True
+        self._lock = threading.Lock()
+        self.statements = {}
+        # queries in a unit -> number of units with that many
+        self.unit_queries = {}
+        self.findings = deque(maxlen=max_findings)
+        self.n_plus_one_counts = {}
+        self._engines = []
+        self._session_targets = []
+
+    # -- wiring --
+
+    def install(self, engine):
+        # Also accepts the per-role engines; installing twice is a no-op
+        if any(engine is e for e in self._engines):
+            return
+        event.listen(engine, "before_cursor_execute", self._before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", self._after_cursor_execute)
+        self._engines.append(engine)
+
+    def track_sessions(self, target):
+        """Treat every outermost transaction of sessions made by 'target' (a sessionmaker) as a unit of work."""
+        event.listen(target, "after_begin", self._after_begin)
+        event.listen(target, "after_transaction_end", self._after_transaction_end)
+        self._session_targets.append(target)
+
+    def uninstall(self):
+        for engine in self._engines:
+            event.remove(engine, "before_cursor_execute", self._before_cursor_execute)
+            event.remove(engine, "after_cursor_execute", self._after_cursor_execute)
+        for target in self._session_targets:
+            event.remove(target, "after_begin", self._after_begin)
+            event.remove(target, "after_transaction_end", self._after_transaction_end)
+        self._engines = []
+        self._session_targets = []
+
+    @contextmanager
+    def unit_of_work(self, label: str = "unit"):
+        """Count every query in the block (across sessions and threads of this context) as one unit."""
+        unit = UnitOfWork(label)
+        token = _current_unit.set(unit)
+        try:
+            yield unit
+        finally:
+            _current_unit.reset(token)
+            self._finish_unit(unit)
+
+    # -- events --
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._query_started = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "_query_started", None)
+        if started is None or not self.enabled:
+            return
+        elapsed = time.perf_counter() - started
+        key = fingerprint(statement)
+        rows = cursor.rowcount if cursor is not None else -1
+        with self._lock:
+            stats = self.statements.get(key)
+            if stats is None:
+                stats = self.statements[key] = StatementStats()
+            stats.record(elapsed, rows)
+        unit = _current_unit.get() or conn.info.get("query_unit")
+        if unit is not None:
+            unit.record(key, elapsed)
+
+    def _after_begin(self, session, transaction, connection):
+        if _current_unit.get() is not None:
+            return
+        unit = session.info.get("query_unit")
+        if unit is None:
+            unit = session.info["query_unit"] = UnitOfWork(f"session {id(session):x}")
+            session.info["query_connections"] = []
+        # The pooled connection's info dict, still reachable after the connection is released
+        info = connection.info
+        info["query_unit"] = unit
+        session.info["query_connections"].append(info)
+
+    def _after_transaction_end(self, session, transaction):
+        if transaction.parent is not None or "query_unit" not in session.info:
+            return
+        unit = session.info.pop("query_unit")
+        for info in session.info.pop("query_connections"):
+            info.pop("query_unit", None)
+        self._finish_unit(unit)
+
+    def _finish_unit(self, unit: UnitOfWork):
+        if not unit.queries or not self.enabled:
+            return
+        repeated = [
+            (key, count) for key, count in unit.by_fingerprint.items()
+            if count > self.n_plus_one_threshold
+        ]
+        with self._lock:
+            self.unit_queries[unit.queries] = self.unit_queries.get(unit.queries, 0) + 1
+            for key, count in repeated:
+                self.findings.append({"unit": unit.label, "fingerprint": key, "executions": count})
+                self.n_plus_one_counts[key] = self.n_plus_one_counts.get(key, 0) + 1
+        for key, count in repeated:
+            logger.warning(f"⚠ Possible N+1 in {unit.label}: {count}x {_display(key, 120)}")
+
+    # -- results --
+
+    def reset(self):
+        with self._lock:
+            self.statements = {}
+            self.unit_queries = {}
+            self.findings.clear()
+            self.n_plus_one_counts = {}
+
+    def dump(self) -> dict:
+        with self._lock:
+            units = sum(self.unit_queries.values())
+            queries = sum(q * n for q, n in self.unit_queries.items())
+            p99_queries, seen = 0, 0
+            for q in sorted(self.unit_queries):
+                seen += self.unit_queries[q]
+                p99_queries = q
+                if seen >= 0.99 * units:
+                    break
+            return {
+                "statements": {
+                    key: stats.summary()
+                    for key, stats in sorted(self.statements.items(), key=lambda item: -item[1].total)
+                },
+                "units": {
+                    "count": units,
+                    "mean_queries": round(queries / units, 2) if units else 0.0,
+                    "p99_queries": p99_queries,
+                    "max_queries": max(self.unit_queries, default=0),
+                },
+                "n_plus_one": dict(sorted(self.n_plus_one_counts.items(), key=lambda item: -item[1])),
+                "findings": list(self.findings),
+            }
+
+    def report(self, top: int = 20) -> str:
+        """Human readable summary: slowest fingerprints by total time, units of work, N+1 suspects."""
+        dump = self.dump()
+        lines = [f"{'count':>8}{'total_ms':>12}{'mean_ms':>10}{'p99_ms':>10}{'rows':>10}  statement"]
+        for key, s in list(dump["statements"].items())[:top]:
+            lines.append(
+                f"{s['count']:>8}{s['total_ms']:>12}{s['mean_ms']:>10}{s['p99_ms']:>10}{s['rows']:>10}  {_display(key, 100)}"
+            )
+        units = dump["units"]
+        lines.append(
+            f"\nUnits of work: {units['count']}, queries per unit mean {units['mean_queries']}, "
+            f"p99 {units['p99_queries']}, max {units['max_queries']}"
+        )
+        if dump["n_plus_one"]:
+            lines.append(f"\nPossible N+1 (more than {self.n_plus_one_threshold} executions in one unit):")
+            for key, units_flagged in dump["n_plus_one"].items():
+                lines.append(f"  {units_flagged} unit(s): {_display(key, 120)}")
+        return "\n".join(lines)
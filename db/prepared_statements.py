@@ -0,0 +1,113 @@
+import re
+import logging
+import threading
+
+import psycopg2
+import psycopg2.errors
+import psycopg2.extensions
+
+from db.sql_params import to_numbered_placeholders
+
+logger = logging.getLogger(__name__)
+
+_NAME = re.compile(r"^[a-z_][a-z0-9_]*$")
+
+
+class PreparingConnection(psycopg2.extensions.connection):
+    """psycopg2 connection that remembers which named statements it has prepared."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared = set()
+
+
+class PreparedStatementRegistry:
+    """
+    Named server-side prepared statements for hot raw queries. Statements are
+    registered once with psycopg2 style '%s' placeholders and PREPAREd lazily
+    on each pooled connection the first time they run there, so Postgres
+    parses them once per connection and can reuse the plan afterwards.
+    A connection that lost its statements (DEALLOCATE, DISCARD ALL, a
+    reconnect) is detected and prepared again.
+    Connections must be PreparingConnection instances (see connection_factory).
+    """
+
+    def __init__(self):
+        self._statements = {}
+        self._queries = {}
+        self._lock = threading.Lock()
+        # name -> [prepares, executions, re-prepares after a lost statement]
+        self._counters = {}
+
+    def register(self, name: str, query: str):
+        if not _NAME.match(name):
+            raise ValueError(f"Invalid prepared statement name: {name!r}")
+        prepare = f"PREPARE {name} AS {to_numbered_placeholders(query)}"
+        arity = query.replace("%%", "").count("%s")
+        placeholders = ", ".join(["%s"] * arity)
+        execute = f"EXECUTE {name} ({placeholders})" if arity else f"EXECUTE {name}"
+        self._statements[name] = (prepare, execute, arity)
+        self._queries[name] = query
+        self._counters.setdefault(name, [0, 0, 0])
+
+    def query(self, name: str) -> str:
+        """The registered statement as a plain psycopg2 style query."""
+        return self._queries[name]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._statements
+
+    def _count(self, name: str, column: int):
+        with self._lock:
+            self._counters[name][column] += 1
+
+    def execute(self, cur, name: str, params=()):
+        """Run statement 'name' on the cursor, preparing it on this connection first if needed."""
+        prepare, execute, arity = self._statements[name]
+        params = tuple(params or ())
+        if len(params) != arity:
+            raise ValueError(f"{name} takes {arity} parameters, got {len(params)}")
+
+        conn = cur.connection
+        # Only a statement that opens its transaction can be retried after a rollback
+        fresh = conn.info.transaction_status == psycopg2.extensions.TRANSACTION_STATUS_IDLE
+        if name not in conn.prepared:
+            cur.execute(prepare)
+            conn.prepared.add(name)
+            self._count(name, 0)
+        try:
+            cur.execute(execute, params or None)
+        except psycopg2.errors.InvalidSqlStatementName:
+            # Deallocated behind our back (DEALLOCATE, DISCARD ALL)
+            conn.prepared.discard(name)
+            if not fresh:
+                raise
+            logger.warning(f"Prepared statement {name} was deallocated, preparing it again")
+            conn.rollback()
+            cur.execute(prepare)
+            conn.prepared.add(name)
+            self._count(name, 2)
+            cur.execute(execute, params or None)
+        self._count(name, 1)
+
+    def stats(self) -> dict:
+        """Per statement: prepares, executions and executions that reused an existing statement."""
+        with self._lock:
+            return {
+                name: {
+                    "prepares": prepares,
+                    "executions": executions,
+                    "reuses": executions - prepares - reprepared,
+                    "reprepared": reprepared,
+                }
+                for name, (prepares, executions, reprepared) in sorted(self._counters.items())
+            }
+
+    @staticmethod
+    def server_stats(cur) -> list:
+        """
+        Plan usage of the statements prepared on this cursor's connection
+        (name, generic_plans, custom_plans); needs PostgreSQL 14 or newer.
+        """
+        cur.execute("SELECT name, generic_plans, custom_plans FROM pg_prepared_statements ORDER BY name")
+        return cur.fetchall()
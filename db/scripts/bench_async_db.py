@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+import sys
+import time
+import asyncio
+import logging
+import argparse
+import statistics
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from db.db_utils import DBInterface
+from db.async_db_utils import AsyncDBInterface
+
+
+def _summary(name, latencies, elapsed, count):
+    latencies = sorted(latencies)
+    result = {
+        'path': name,
+        'readings': count,
+        'seconds': round(elapsed, 3),
+        'readings_per_second': round(count / elapsed) if elapsed else None,
+    }
+    if latencies:
+        result['p50_ms'] = round(statistics.median(latencies) * 1000, 2)
+        result['p99_ms'] = round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000, 2)
+    return result
+
+
+def bench_sync(db, device_id, count):
+    latencies = []
+    started = time.perf_counter()
+    for i in range(count):
+        t = time.perf_counter()
+        db.insert_sensor_data(device_id, 20 + i % 10, '°C')
+        latencies.append(time.perf_counter() - t)
+    return _summary('sync insert_sensor_data', latencies, time.perf_counter() - started, count)
+
+
+async def bench_async_concurrent(db, device_id, count, concurrency):
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def insert(i):
+        async with semaphore:
+            t = time.perf_counter()
+            await db.insert_sensor_data(device_id, 20 + i % 10, '°C')
+            latencies.append(time.perf_counter() - t)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(insert(i) for i in range(count)))
+    return _summary(f'async insert_sensor_data x{concurrency}', latencies, time.perf_counter() - started, count)
+
+
+async def bench_async_batch(db, device_id, count, batch_size, use_copy):
+    readings = [(device_id, 20 + i % 10, '°C') for i in range(count)]
+    latencies = []
+    started = time.perf_counter()
+    for i in range(0, count, batch_size):
+        t = time.perf_counter()
+        await db.insert_sensor_data_many(readings[i:i + batch_size], use_copy=use_copy)
+        latencies.append(time.perf_counter() - t)
+    name = f"async {'COPY' if use_copy else 'pipelined'} batches of {batch_size}"
+    return _summary(name, latencies, time.perf_counter() - started, count)
+
+
+async def run_async(args, device_id):
+    db = AsyncDBInterface(max_pool_size=args.concurrency)
+    try:
+        return [
+            await bench_async_concurrent(db, device_id, args.count, args.concurrency),
+            await bench_async_batch(db, device_id, args.count, args.batch_size, use_copy=False),
+            await bench_async_batch(db, device_id, args.count, args.batch_size, use_copy=True),
+        ]
+    finally:
+        await db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Compare sync and async sensor_data inserts (writes into sensor_data, use a test database)'
+    )
+    parser.add_argument('--count', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=10)
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--device-id', type=int, help='Device to attach the readings to (default: first device)')
+    args = parser.parse_args()
+
+    # DBInterface logs every connection at INFO, which would drown the results
+    logging.getLogger('db.db_utils').setLevel(logging.WARNING)
+
+    sync_db = DBInterface()
+    device_id = args.device_id
+    if device_id is None:
+        rows = sync_db.execute_query("SELECT id FROM devices ORDER BY id LIMIT 1")
+        if not rows:
+            print("✗ No devices found, run 'db_manager.py seed' first")
+            return 1
+        device_id = rows[0][0]
+
+    started_at = sync_db.execute_query("SELECT NOW()")[0][0]
+    results = [bench_sync(sync_db, device_id, args.count)]
+    results += asyncio.run(run_async(args, device_id))
+
+    for result in results:
+        print(result)
+
+    deleted = sync_db.execute_update(
+        "DELETE FROM sensor_data WHERE device_id = %s AND timestamp >= %s",
+        (device_id, started_at)
+    )
+    print(f"🧹 Removed {deleted} benchmark readings")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+import sys
+import time
+import logging
+import argparse
+import statistics
+from pathlib import Path
+
+import psycopg2
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from db.db_utils import DBInterface, PREPARED_STATEMENTS
+
+
+def _summary(name, latencies):
+    latencies = sorted(latencies)
+    return {
+        'path': name,
+        'queries': len(latencies),
+        'mean_us': round(statistics.fmean(latencies) * 1e6, 1),
+        'p50_us': round(statistics.median(latencies) * 1e6, 1),
+        'p99_us': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1e6, 1),
+    }
+
+
+def _time(call, count):
+    latencies = []
+    for _ in range(count):
+        t = time.perf_counter()
+        call()
+        latencies.append(time.perf_counter() - t)
+    return latencies
+
+
+def bench_statement(db, name, params, count):
+    query = PREPARED_STATEMENTS[name]
+
+    def connect_per_call():
+        # What every raw helper did before the pool: connect, run, commit, close
+        conn = psycopg2.connect(**db._connection_params('primary'))
+        try:
+            with conn.cursor() as cur:
+                cur.execute(query, params)
+                cur.fetchall()
+            conn.commit()
+        finally:
+            conn.close()
+
+    results = [_summary(f'{name} connect per call', _time(connect_per_call, max(1, count // 10)))]
+    # Warm the pool and the prepared statement before timing
+    db.execute_query(query, params)
+    db.execute_prepared(name, params)
+    results.append(_summary(f'{name} pooled', _time(lambda: db.execute_query(query, params), count)))
+    results.append(_summary(f'{name} pooled + prepared', _time(lambda: db.execute_prepared(name, params), count)))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Per-query latency of the hot raw queries with and without prepared statements')
+    parser.add_argument('--count', type=int, default=5000)
+    args = parser.parse_args()
+
+    logging.getLogger('db.db_utils').setLevel(logging.WARNING)
+
+    db = DBInterface()
+    device = db.execute_query("SELECT id FROM devices ORDER BY id LIMIT 1")
+    plant_type = db.execute_query("SELECT name FROM plant_types ORDER BY id LIMIT 1")
+    if not device or not plant_type:
+        print("✗ No devices or plant types found, run 'db_manager.py seed' first")
+        return 1
+
+    try:
+        results = bench_statement(db, 'get_device_by_id', (device[0][0],), args.count)
+        results += bench_statement(db, 'get_plant_details', (plant_type[0][0],), args.count)
+        for result in results:
+            print(result)
+        print(db.prepared.stats())
+        with db.connect_to_db() as (cur, conn):
+            print(db.prepared.server_stats(cur))
+    finally:
+        db.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -5,7 +5,7 @@ from pathlib import Path
 from datetime import datetime, timedelta
 import argparse
 
-sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
 
 from db.base import DeviceTypeEnum, AlertSeverityEnum, AlertStatusEnum
 from db.user_models import User
@@ -14,6 +14,8 @@ from db.plant_models import PlantType, Plant, PlantDeviceAssignment
 from db.sensor_models import SensorData
 from db.alert_models import AlertRule, Alert
 from db.db_utils import DBInterface, get_session, init_db, drop_all_tables
+from db.synthetic import SeedConfig, seed_synthetic
+from db.stats import collect_stats, format_stats
 
 
 def seed_demo_data(session):
@@ -297,6 +299,27 @@ def print_database_info(session):
     print(f"  Alerts: {session.query(Alert).count()}")
 
 
+def profile_queries(db, n_plus_one_threshold=10, user_limit=50):
+    # Runs the info counts and the examples.py access pattern (lazy loads in loops,
+    # one unit of work per user) with query instrumentation on, then prints the report
+    instrumentation = db.enable_instrumentation(n_plus_one_threshold)
+    session = db.get_session()
+    try:
+        print_database_info(session)
+        users = session.query(User).order_by(User.id).limit(user_limit).all()
+        session.commit()
+        for user in users:
+            with instrumentation.unit_of_work(f"user {user.id} plants"):
+                for plant in user.plants:
+                    for assignment in plant.device_assignments:
+                        assignment.device.device_type
+                    plant.alerts
+    finally:
+        session.close()
+    print("\n🔍 Query profile:")
+    print(instrumentation.report())
+
+
 def main():
     parser = argparse.ArgumentParser(
         description='IoT Plant Monitoring System - Database Management'
@@ -304,7 +327,7 @@ def main():
     
     parser.add_argument(
         'action',
-        choices=['init', 'seed', 'info', 'reset'],
+        choices=['init', 'seed', 'info', 'stats', 'profile', 'reset'],
         help='Database action to perform'
     )
     parser.add_argument('--host', default='localhost')
@@ -312,6 +335,23 @@ def main():
     parser.add_argument('--user', default='iot_user')
     parser.add_argument('--password', default='iot_password')
     parser.add_argument('--database', default='iot_plant_db')
+    parser.add_argument('--url', default=os.environ.get('DATABASE_URL'),
+                        help='Database URL instead of the options above, e.g. sqlite:///plants.db')
+    parser.add_argument('--n-plus-one-threshold', type=int, default=10,
+                        help='profile: flag statements run more often than this in one unit of work')
+    parser.add_argument('--exact', action='store_true',
+                        help='stats: also count the rows of every table (a full scan each)')
+    parser.add_argument('--top', type=int, default=10, help='stats: statements to list from pg_stat_statements')
+    parser.add_argument('--users', type=int,
+                        help='seed: generate this many synthetic users instead of the demo data')
+    parser.add_argument('--plants-per-user', type=int, default=5)
+    parser.add_argument('--days', type=float, default=30, help='seed: days of readings per device')
+    parser.add_argument('--interval', type=int, default=900, help='seed: seconds between readings')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='seed: processes loading separate user ranges (PostgreSQL only)')
+    parser.add_argument('--seed', type=int, default=42, help='seed: random seed, same seed gives the same data')
+    parser.add_argument('--defer-indexes', action='store_true',
+                        help='seed: drop the sensor_data indexes during the load and rebuild them after')
     
     args = parser.parse_args()
     
@@ -322,26 +362,41 @@ def main():
     os.environ['POSTGRES_DB_NAME'] = args.database
     
     print("🌱 IoT Plant Monitoring System - Database Manager")
-    print(f"📍 Database URL: postgresql://{args.user}:***@{args.host}:{args.port}/{args.database}")
-    
-    db = DBInterface()
+    if args.url:
+        db = DBInterface(args.url)
+        print(f"📍 Database URL: {db.url.render_as_string(hide_password=True)}")
+    else:
+        print(f"📍 Database URL: postgresql://{args.user}:***@{args.host}:{args.port}/{args.database}")
+        db = DBInterface()
     
     try:
         if args.action == 'init':
             print("\n🔧 Initializing database...")
             db.init_db()
             
+        elif args.action == 'seed' and args.users:
+            config = SeedConfig(args.users, args.plants_per_user, args.days, args.interval, args.seed)
+            print(f"\n🌿 Seeding {config.users} users x {config.plants_per_user} plants, "
+                  f"{config.total_readings:,} readings...")
+            summary = seed_synthetic(db, config, workers=args.workers, defer_indexes=args.defer_indexes)
+            print(f"✓ Loaded {summary['readings']:,} readings in {summary['load_seconds']}s "
+                  f"({summary['readings_per_second']:,} readings/s), {summary['total_seconds']}s "
+                  f"including index rebuild and ANALYZE")
+
         elif args.action == 'seed':
             print("\n🌿 Seeding database with demo data...")
             session = db.get_session()
             seed_demo_data(session)
             session.close()
             
-        elif args.action == 'info':
-            print("\n📊 Fetching database information...")
-            session = db.get_session()
-            print_database_info(session)
-            session.close()
+        elif args.action in ('info', 'stats'):
+            # 'info' used to COUNT(*) every table; estimates from the statistics views instead
+            print("\n📊 Fetching database statistics...")
+            print(format_stats(collect_stats(db, exact=args.exact, top_statements=args.top)))
+            
+        elif args.action == 'profile':
+            print("\n⏱️  Profiling ORM queries...")
+            profile_queries(db, args.n_plus_one_threshold)
             
         elif args.action == 'reset':
             print("\n⚠️  WARNING: This will drop all tables and data!")
@@ -0,0 +1,16 @@
+import re
+import itertools
+
+# psycopg2 style placeholders, skipping the escaped '%%'
+_PLACEHOLDER = re.compile(r"%%|%s")
+
+
+def to_numbered_placeholders(query: str) -> str:
+    """Rewrite a psycopg2 query ('%s' placeholders) for PREPARE and asyncpg ('$1', '$2', ...)."""
+    counter = itertools.count(1)
+    return _PLACEHOLDER.sub(lambda m: "%" if m.group() == "%%" else f"${next(counter)}", query)
+
+
+def to_qmark_placeholders(query: str) -> str:
+    """Rewrite a psycopg2 query ('%s' placeholders) for sqlite3 ('?')."""
+    return _PLACEHOLDER.sub(lambda m: "%" if m.group() == "%%" else "?", query)
@@ -0,0 +1,147 @@
+import json
+import re
+from functools import lru_cache
+
+from sqlalchemy import DDL, create_engine, event
+from sqlalchemy.pool import StaticPool
+
+from db.alert_models import Alert
+from db.sql_params import to_qmark_placeholders
+
+# Applied to every new connection. WAL lets readers run while the single writer
+# commits; synchronous=NORMAL only syncs at checkpoints, which WAL makes safe
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "foreign_keys": "ON",         # the models rely on ON DELETE CASCADE
+    "busy_timeout": "5000",       # wait for a concurrent writer instead of failing
+    "cache_size": "-16000",       # 16 MB page cache
+    "temp_store": "MEMORY",
+    "mmap_size": "134217728",     # 128 MB
+}
+
+_ANY = re.compile(r"=\s*ANY\(\s*%s\s*\)", re.IGNORECASE)
+_NOW = re.compile(r"\bNOW\(\)", re.IGNORECASE)
+
+
+def is_memory_url(url) -> bool:
+    return url.database in (None, "", ":memory:")
+
+
+def create_sqlite_engine(url):
+    """Engine for a SQLite file (WAL, tuned pragmas) or an in-memory database shared by all sessions."""
+    if is_memory_url(url):
+        # One connection for everything, otherwise each connection would see its own empty database
+        engine = create_engine(url, echo=False, poolclass=StaticPool,
+                               connect_args={"check_same_thread": False})
+        pragmas = {k: v for k, v in SQLITE_PRAGMAS.items() if k not in ("journal_mode", "mmap_size")}
+    else:
+        engine = create_engine(url, echo=False, pool_size=5, max_overflow=5,
+                               connect_args={"check_same_thread": False, "timeout": 5})
+        pragmas = SQLITE_PRAGMAS
+
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+        cursor.close()
+
+    return engine
+
+
+@lru_cache(maxsize=512)
+def translate_query(query: str) -> str:
+    """Rewrite a psycopg2 query for sqlite3: '%s' -> '?', '= ANY(%s)' -> IN over a JSON array, NOW()."""
+    query = _ANY.sub("IN (SELECT value FROM json_each(%s))", query)
+    query = _NOW.sub("CURRENT_TIMESTAMP", query)
+    return to_qmark_placeholders(query)
+
+
+def _adapt(params):
+    # Lists are bound as JSON arrays (see '= ANY(%s)' in translate_query)
+    return tuple(json.dumps(list(p)) if isinstance(p, (list, tuple, set)) else p for p in params)
+
+
+class SQLiteCursor:
+    """
+    sqlite3 cursor accepting the psycopg2 style queries of DBInterface, so the
+    raw helpers and connect_to_db() callers run unchanged on both backends.
+    Timestamps come back as ISO strings rather than datetime objects.
+    """
+
+    def __init__(self, cursor, connection):
+        self._cursor = cursor
+        self.connection = connection
+
+    def execute(self, query: str, params=None):
+        if params:
+            self._cursor.execute(translate_query(query), _adapt(params))
+        else:
+            self._cursor.execute(translate_query(query))
+        return self
+
+    def executemany(self, query: str, params_seq):
+        self._cursor.executemany(translate_query(query), (_adapt(p) for p in params_seq))
+        return self
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchmany(self, size=None):
+        return self._cursor.fetchmany(size) if size is not None else self._cursor.fetchmany()
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    @property
+    def closed(self):
+        return self._cursor is None
+
+    def close(self):
+        if self._cursor is not None:
+            self._cursor.close()
+            self._cursor = None
+
+
+# users.unresolved_alert_count on SQLite: row level triggers doing what the
+# PostgreSQL statement level ones in alert_models do
+_SQLITE_TRIGGERS = [
+    DDL("""
+CREATE TRIGGER trg_alerts_unresolved_insert AFTER INSERT ON alerts
+WHEN NEW.status <> 'RESOLVED'
+BEGIN
+    UPDATE users SET unresolved_alert_count = unresolved_alert_count + 1 WHERE id = NEW.user_id;
+END
+"""),
+    DDL("""
+CREATE TRIGGER trg_alerts_unresolved_update AFTER UPDATE OF status, user_id ON alerts
+BEGIN
+    UPDATE users SET unresolved_alert_count = unresolved_alert_count - 1
+    WHERE id = OLD.user_id AND OLD.status <> 'RESOLVED';
+    UPDATE users SET unresolved_alert_count = unresolved_alert_count + 1
+    WHERE id = NEW.user_id AND NEW.status <> 'RESOLVED';
+END
+"""),
+    DDL("""
+CREATE TRIGGER trg_alerts_unresolved_delete AFTER DELETE ON alerts
+WHEN OLD.status <> 'RESOLVED'
+BEGIN
+    UPDATE users SET unresolved_alert_count = unresolved_alert_count - 1 WHERE id = OLD.user_id;
+END
+"""),
+]
+
+for _trigger in _SQLITE_TRIGGERS:
+    event.listen(Alert.__table__, 'after_create', _trigger.execute_if(dialect='sqlite'))
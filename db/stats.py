@@ -0,0 +1,255 @@
+import psycopg2
+
+# Catalog and statistics views only: no table is scanned unless exact counts are asked for.
+# relpages / reltuples are maintained by VACUUM and ANALYZE (reltuples is -1 before the first one)
+TABLES_QUERY = """
+    SELECT c.relname,
+           c.reltuples::bigint,
+           c.relpages::bigint,
+           pg_table_size(c.oid),
+           pg_indexes_size(c.oid),
+           COALESCE(s.n_live_tup, 0),
+           COALESCE(s.n_dead_tup, 0),
+           COALESCE(s.seq_scan, 0),
+           COALESCE(s.idx_scan, 0),
+           GREATEST(s.last_vacuum, s.last_autovacuum),
+           GREATEST(s.last_analyze, s.last_autoanalyze),
+           (SELECT SUM(st.avg_width) FROM pg_stats st
+            WHERE st.schemaname = n.nspname AND st.tablename = c.relname),
+           COALESCE((SELECT option_value::int FROM pg_options_to_table(c.reloptions)
+                     WHERE option_name = 'fillfactor'), 100)
+    FROM pg_class c
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    LEFT JOIN pg_stat_user_tables s ON s.relid = c.oid
+    WHERE c.relkind IN ('r', 'p') AND n.nspname = current_schema()
+    ORDER BY pg_total_relation_size(c.oid) DESC
+"""
+
+INDEXES_QUERY = """
+    SELECT s.relname, s.indexrelname, s.idx_scan, s.idx_tup_read,
+           pg_relation_size(s.indexrelid), i.indisunique OR i.indisprimary
+    FROM pg_stat_user_indexes s
+    JOIN pg_index i ON i.indexrelid = s.indexrelid
+    WHERE s.schemaname = current_schema()
+    ORDER BY pg_relation_size(s.indexrelid) DESC
+"""
+
+STATEMENTS_QUERY = """
+    SELECT calls, {total} AS total_ms, {mean} AS mean_ms, rows,
+           shared_blks_hit, shared_blks_read, query
+    FROM pg_stat_statements
+    WHERE dbid = (SELECT oid FROM pg_database WHERE datname = current_database())
+    ORDER BY {total} DESC
+    LIMIT %s
+"""
+
+# Per-row overhead of a heap tuple: 23 byte header (aligned to 24) + 4 byte line pointer
+_TUPLE_OVERHEAD = 28
+
+
+def _bloat(relpages, reltuples, row_width, fillfactor, block_size):
+    """
+    Estimated wasted bytes of a table: its size on disk minus what its live
+    rows would take when packed at the table's fillfactor. Uses the planner
+    statistics (pg_stats widths), so it is only as fresh as the last ANALYZE
+    and ignores alignment padding; treat small values as noise.
+    """
+    if reltuples <= 0 or row_width is None:
+        return None
+    actual = relpages * block_size
+    expected = reltuples * (_TUPLE_OVERHEAD + row_width) * 100 / fillfactor
+    return max(0, int(actual - expected))
+
+
+def _postgres_stats(cur, exact: bool, top_statements: int):
+    # Guard against a busy catalog rather than wait behind it; exact counts may run long
+    cur.execute("SET LOCAL lock_timeout = '1s'")
+    if not exact:
+        cur.execute("SET LOCAL statement_timeout = '10s'")
+    cur.execute("SELECT current_setting('block_size')::int, current_setting('server_version_num')::int")
+    block_size, version = cur.fetchone()
+    cur.execute("SELECT stats_reset FROM pg_stat_database WHERE datname = current_database()")
+    stats_reset = cur.fetchone()[0]
+
+    cur.execute(TABLES_QUERY)
+    tables = []
+    for (name, reltuples, relpages, table_bytes, index_bytes, live, dead, seq_scan, idx_scan,
+         vacuumed, analyzed, row_width, fillfactor) in cur.fetchall():
+        tables.append({
+            'table': name,
+            # Never analyzed: fall back to the live tuple counter
+            'estimated_rows': reltuples if reltuples >= 0 else live,
+            'table_bytes': table_bytes,
+            'index_bytes': index_bytes,
+            'dead_rows': dead,
+            'dead_ratio': round(dead / (live + dead), 3) if live + dead else 0.0,
+            'bloat_bytes': _bloat(relpages, reltuples, row_width, fillfactor, block_size),
+            'seq_scan': seq_scan,
+            'idx_scan': idx_scan,
+            'last_vacuum': vacuumed,
+            'last_analyze': analyzed,
+        })
+    if exact:
+        for table in tables:
+            cur.execute(f'SELECT COUNT(*) FROM "{table["table"]}"')
+            table['exact_rows'] = cur.fetchone()[0]
+
+    cur.execute(INDEXES_QUERY)
+    indexes = [
+        {
+            'table': table, 'index': index, 'scans': scans, 'tuples_read': tuples_read,
+            'bytes': size, 'enforces_constraint': constraint,
+        }
+        for table, index, scans, tuples_read, size, constraint in cur.fetchall()
+    ]
+
+    statements, statements_error = [], None
+    cur.execute("SAVEPOINT pg_stat_statements")
+    try:
+        # Renamed in PostgreSQL 13
+        total, mean = ('total_exec_time', 'mean_exec_time') if version >= 130000 else ('total_time', 'mean_time')
+        cur.execute(STATEMENTS_QUERY.format(total=total, mean=mean), (top_statements,))
+        statements = [
+            {
+                'calls': calls, 'total_ms': round(total_ms, 1), 'mean_ms': round(mean_ms, 3), 'rows': rows,
+                'hit_ratio': round(hit / (hit + read), 3) if hit + read else None, 'query': query,
+            }
+            for calls, total_ms, mean_ms, rows, hit, read, query in cur.fetchall()
+        ]
+    except psycopg2.Error as e:
+        # Extension not installed, or not in shared_preload_libraries
+        cur.execute("ROLLBACK TO SAVEPOINT pg_stat_statements")
+        statements_error = str(e).strip().splitlines()[0]
+
+    return {
+        'backend': 'postgresql',
+        'stats_reset': stats_reset,
+        'tables': tables,
+        'indexes': indexes,
+        'statements': statements,
+        'statements_error': statements_error,
+    }
+
+
+def _sqlite_stats(cur, exact: bool):
+    # Row estimates come from sqlite_stat1 (written by ANALYZE); sizes need the
+    # dbstat table, which reads every page, so they are only collected with 'exact'
+    cur.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY name")
+    names = [row[0] for row in cur.fetchall()]
+    estimates = {}
+    cur.execute("SELECT name FROM sqlite_master WHERE name = 'sqlite_stat1'")
+    if cur.fetchone():
+        cur.execute("SELECT tbl, stat FROM sqlite_stat1")
+        for table, stat in cur.fetchall():
+            estimates[table] = max(estimates.get(table, 0), int(stat.split()[0]))
+    sizes = {}
+    if exact:
+        try:
+            cur.execute("SELECT name, SUM(pgsize) FROM dbstat GROUP BY name")
+            sizes = dict(cur.fetchall())
+        except Exception:
+            sizes = {}
+        cur.execute("SELECT name, tbl_name FROM sqlite_master WHERE type = 'index'")
+        index_tables = cur.fetchall()
+
+    tables = []
+    for name in names:
+        table = {'table': name, 'estimated_rows': estimates.get(name)}
+        if exact:
+            cur.execute(f'SELECT COUNT(*) FROM "{name}"')
+            table['exact_rows'] = cur.fetchone()[0]
+            if sizes:
+                table['table_bytes'] = sizes.get(name, 0)
+                table['index_bytes'] = sum(sizes.get(index, 0) for index, tbl in index_tables if tbl == name)
+        tables.append(table)
+
+    cur.execute("PRAGMA page_size")
+    page_size = cur.fetchone()[0]
+    cur.execute("PRAGMA page_count")
+    page_count = cur.fetchone()[0]
+    cur.execute("PRAGMA freelist_count")
+    free_pages = cur.fetchone()[0]
+    return {
+        'backend': 'sqlite',
+        'database_bytes': page_size * page_count,
+        # Pages freed by deletes and not reused yet; VACUUM gives them back
+        'free_bytes': page_size * free_pages,
+        'tables': tables,
+    }
+
+
+def collect_stats(db, exact: bool = False, top_statements: int = 10) -> dict:
+    """
+    Table, index and statement statistics of a DBInterface database, read from
+    the catalog and statistics views so it stays cheap on any table size.
+    Row counts are planner estimates; 'exact' adds COUNT(*) per table (a full scan each).
+    """
+    with db.connect_to_db() as (cur, conn):
+        if db.is_sqlite:
+            return _sqlite_stats(cur, exact)
+        return _postgres_stats(cur, exact, top_statements)
+
+
+def _size(value) -> str:
+    if value is None:
+        return '?'
+    for unit in ('B', 'kB', 'MB', 'GB'):
+        if abs(value) < 1024:
+            return f"{value:.0f} {unit}" if unit == 'B' else f"{value:.1f} {unit}"
+        value /= 1024
+    return f"{value:.1f} TB"
+
+
+def _count(value) -> str:
+    return '?' if value is None else f"{value:,}"
+
+
+def format_stats(stats: dict, dead_ratio_warning: float = 0.2) -> str:
+    """Human readable report of collect_stats()."""
+    lines = []
+    exact = any('exact_rows' in t for t in stats['tables'])
+    if stats['backend'] == 'sqlite':
+        lines.append(f"Database {_size(stats['database_bytes'])}, free pages {_size(stats['free_bytes'])}")
+        header = f"{'table':<28}{'est. rows':>14}" + (f"{'rows':>14}{'table':>12}{'indexes':>12}" if exact else '')
+        lines.append(header)
+        for t in stats['tables']:
+            line = f"{t['table']:<28}{_count(t['estimated_rows']):>14}"
+            if exact:
+                line += f"{_count(t['exact_rows']):>14}{_size(t.get('table_bytes')):>12}{_size(t.get('index_bytes')):>12}"
+            lines.append(line)
+        if not any(t['estimated_rows'] is not None for t in stats['tables']):
+            lines.append("(no estimates: run ANALYZE, or use --exact)")
+        return "\n".join(lines)
+
+    lines.append(f"Statistics collected since {stats['stats_reset'] or 'cluster start'}")
+    lines.append(
+        f"\n{'table':<28}{'est. rows':>14}" + (f"{'rows':>14}" if exact else '')
+        + f"{'table':>11}{'indexes':>11}{'dead rows':>12}{'dead %':>8}{'bloat':>11}{'seq scans':>11}{'idx scans':>12}"
+    )
+    for t in stats['tables']:
+        lines.append(
+            f"{t['table']:<28}{_count(t['estimated_rows']):>14}" + (f"{_count(t['exact_rows']):>14}" if exact else '')
+            + f"{_size(t['table_bytes']):>11}{_size(t['index_bytes']):>11}{_count(t['dead_rows']):>12}"
+            f"{t['dead_ratio'] * 100:>7.1f}%{_size(t['bloat_bytes']):>11}{t['seq_scan']:>11,}{t['idx_scan']:>12,}"
+        )
+    vacuum = [t['table'] for t in stats['tables'] if t['dead_ratio'] >= dead_ratio_warning]
+    if vacuum:
+        lines.append(f"⚠ Over {dead_ratio_warning:.0%} dead rows, check autovacuum: {', '.join(vacuum)}")
+
+    lines.append(f"\n{'index':<44}{'table':<26}{'size':>11}{'scans':>14}{'tuples read':>16}")
+    for i in stats['indexes']:
+        lines.append(f"{i['index']:<44}{i['table']:<26}{_size(i['bytes']):>11}{i['scans']:>14,}{i['tuples_read']:>16,}")
+    unused = [i for i in stats['indexes'] if i['scans'] == 0 and not i['enforces_constraint']]
+    if unused:
+        lines.append(f"⚠ Never scanned since the statistics reset ({_size(sum(i['bytes'] for i in unused))}): "
+                     + ", ".join(i['index'] for i in unused))
+
+    if stats['statements_error']:
+        lines.append(f"\npg_stat_statements not available: {stats['statements_error']}")
+    elif stats['statements']:
+        lines.append(f"\n{'calls':>10}{'total_ms':>14}{'mean_ms':>10}{'rows':>12}{'hit %':>8}  statement")
+        for s in stats['statements']:
+            hit = '?' if s['hit_ratio'] is None else f"{s['hit_ratio'] * 100:.1f}"
+            query = ' '.join(s['query'].split())[:100]
+            lines.append(f"{s['calls']:>10,}{s['total_ms']:>14,}{s['mean_ms']:>10}{s['rows']:>12,}{hit:>8}  {query}")
+    return "\n".join(lines)
@@ -0,0 +1,401 @@
+import math
+import time
+import random
+import itertools
+import logging
+from dataclasses import dataclass, replace
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from sqlalchemy import text
+
+from db.base import DeviceTypeEnum, AlertSeverityEnum, AlertStatusEnum
+from db.device_models import Manufacturer, DeviceType
+from db.plant_models import PlantType
+from db.sensor_models import SensorData
+
+logger = logging.getLogger(__name__)
+
+# One device of each kind per plant: (parameter, unit, device type name)
+SENSOR_KINDS = (
+    ('temperature', '°C', 'Synthetic Thermometer'),
+    ('humidity', '%', 'Synthetic Hygrometer'),
+    ('soil_moisture', '%', 'Synthetic Soil Probe'),
+)
+
+# (name, optimal temperature, optimal humidity, optimal light, water frequency days)
+PLANT_TYPES = (
+    ('Monstera Deliciosa', 22.0, 60.0, 15000.0, 7),
+    ('Snake Plant', 24.0, 40.0, 8000.0, 14),
+    ('Peace Lily', 21.0, 65.0, 6000.0, 5),
+    ('Fiddle Leaf Fig', 23.0, 55.0, 20000.0, 7),
+    ('Basil', 24.0, 50.0, 25000.0, 2),
+    ('Aloe Vera', 25.0, 35.0, 30000.0, 21),
+)
+
+DRY_THRESHOLD = 25.0
+# Alert ids are reserved per plant, so the generated ids do not depend on the processing order
+MAX_ALERTS_PER_PLANT = 64
+ANOMALY_RATE = 0.0005
+
+_ID_TABLES = ('users', 'plants', 'devices', 'plant_device_assignments', 'alert_rules', 'alerts')
+
+
+@dataclass(frozen=True)
+class SeedConfig:
+    users: int
+    plants_per_user: int = 5
+    days: float = 30.0
+    interval_seconds: int = 900
+    seed: int = 42
+    end: datetime = None
+
+    @property
+    def readings_per_device(self) -> int:
+        return int(self.days * 86400 // self.interval_seconds)
+
+    @property
+    def total_readings(self) -> int:
+        return self.users * self.plants_per_user * len(SENSOR_KINDS) * self.readings_per_device
+
+
+@dataclass(frozen=True)
+class SeedLayout:
+    # Highest existing id per table (new rows are numbered above them) and the reference rows
+    id_bases: dict
+    plant_type_ids: tuple
+    device_type_ids: tuple
+
+
+class _CopyStream:
+    """File-like view of an iterator of text lines for copy_expert; only one read buffer is held."""
+
+    def __init__(self, lines):
+        self._lines = lines
+        self._buffer = bytearray()
+
+    def read(self, size=-1):
+        while size < 0 or len(self._buffer) < size:
+            chunk = ''.join(itertools.islice(self._lines, 1024))
+            if not chunk:
+                break
+            self._buffer += chunk.encode('utf-8')
+        if size < 0:
+            size = len(self._buffer)
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return data
+
+
+def _copy_value(value):
+    if value is None:
+        return '\\N'
+    if value is True:
+        return 't'
+    if value is False:
+        return 'f'
+    return str(value)
+
+
+def _time_grid(config: SeedConfig, sqlite: bool):
+    # Shared by every device: timestamps as text and the diurnal phase (-1 .. 1, peak at 15:00)
+    end = config.end or datetime.now(timezone.utc).replace(second=0, microsecond=0)
+    count = config.readings_per_device
+    start = end - timedelta(seconds=config.interval_seconds * count)
+    stamps, diurnal = [], []
+    for i in range(count):
+        moment = start + timedelta(seconds=config.interval_seconds * (i + 1))
+        stamps.append(moment.strftime('%Y-%m-%d %H:%M:%S.000000' if sqlite else '%Y-%m-%d %H:%M:%S+00'))
+        hours = moment.hour + moment.minute / 60
+        diurnal.append(math.sin((hours - 9) / 24 * 2 * math.pi))
+    return stamps, diurnal
+
+
+class _UserGenerator:
+    """Rows of one synthetic user, numbered from the layout so any process can generate any user."""
+
+    def __init__(self, config: SeedConfig, layout: SeedLayout, grid, index: int):
+        self.config = config
+        self.layout = layout
+        self.stamps, self.diurnal = grid
+        self.index = index
+        self.rng = random.Random(config.seed * 1_000_003 + index)
+        self.user_id = layout.id_bases['users'] + index + 1
+        self.alerts = []
+        self._alert_counts = {}
+
+    def plant_index(self, p):
+        return self.index * self.config.plants_per_user + p
+
+    def fleet(self):
+        """Rows per table for the user, its plants, devices, assignments and alert rules."""
+        base = self.layout.id_bases
+        rows = {table: [] for table in _ID_TABLES if table != 'alerts'}
+        rows['users'].append((
+            self.user_id, f'seed{self.user_id}@example.com', f'seed_user_{self.user_id}',
+            '$2b$12$synthetic', True, True
+        ))
+        for p in range(self.config.plants_per_user):
+            plant_index = self.plant_index(p)
+            plant_id = base['plants'] + plant_index + 1
+            plant_type_id = self.rng.choice(self.layout.plant_type_ids)
+            rows['plants'].append((
+                plant_id, self.user_id, plant_type_id, f'Plant {p + 1}', f'Room {p % 4 + 1}', True
+            ))
+            for k, (parameter, unit, _) in enumerate(SENSOR_KINDS):
+                device_id = base['devices'] + plant_index * len(SENSOR_KINDS) + k + 1
+                rows['devices'].append((
+                    device_id, self.user_id, self.layout.device_type_ids[k],
+                    f'seed-{device_id}', f'{parameter} sensor {p + 1}', True
+                ))
+                rows['plant_device_assignments'].append((
+                    base['plant_device_assignments'] + plant_index * len(SENSOR_KINDS) + k + 1,
+                    plant_id, device_id, parameter, True
+                ))
+            rows['alert_rules'].append((
+                base['alert_rules'] + plant_index + 1, self.user_id, plant_id, 'Soil too dry', 'threshold',
+                'soil_moisture', '<', DRY_THRESHOLD, AlertSeverityEnum.WARNING.name, True
+            ))
+        return rows
+
+    def readings(self):
+        """(device_id, value, unit, quality, is_anomaly, timestamp) for every device, device by device."""
+        base = self.layout.id_bases
+        for p in range(self.config.plants_per_user):
+            plant_index = self.plant_index(p)
+            for k, (parameter, unit, _) in enumerate(SENSOR_KINDS):
+                device_id = base['devices'] + plant_index * len(SENSOR_KINDS) + k + 1
+                if parameter == 'soil_moisture':
+                    yield from self._soil_moisture(device_id, unit, plant_index)
+                else:
+                    yield from self._diurnal(device_id, unit, parameter)
+
+    def _diurnal(self, device_id, unit, parameter):
+        rng = self.rng
+        if parameter == 'temperature':
+            level, swing, noise = rng.uniform(19, 25), rng.uniform(1.5, 4), 0.3
+        else:
+            level, swing, noise = rng.uniform(45, 65), -rng.uniform(5, 12), 1.5
+        for stamp, phase in zip(self.stamps, self.diurnal):
+            value = level + swing * phase + (rng.random() - 0.5) * 2 * noise
+            if rng.random() < ANOMALY_RATE:
+                yield device_id, round(value * 1.6, 2), unit, 40, True, stamp
+            else:
+                yield device_id, round(value, 2), unit, 100, False, stamp
+
+    def _soil_moisture(self, device_id, unit, plant_index):
+        # Dries out at a per-plant rate, raises an alert below the threshold and is
+        # watered (alert resolved) a few hours later
+        rng = self.rng
+        steps_per_day = 86400 / self.config.interval_seconds
+        drying = rng.uniform(2, 8) / steps_per_day
+        moisture = rng.uniform(40, 80)
+        plant_id = self.layout.id_bases['plants'] + plant_index + 1
+        rule_id = self.layout.id_bases['alert_rules'] + plant_index + 1
+        alert = None
+        water_in = 0
+        for stamp in self.stamps:
+            moisture -= drying * (0.5 + rng.random())
+            if alert is None and moisture < DRY_THRESHOLD:
+                alert = [plant_id, rule_id, round(moisture, 2), stamp]
+                water_in = int(rng.uniform(0, 12) * steps_per_day / 24)
+            elif alert is not None:
+                if water_in <= 0:
+                    moisture = rng.uniform(65, 80)
+                    self._record_alert(plant_index, alert, stamp)
+                    alert = None
+                water_in -= 1
+            yield device_id, round(max(moisture, 0.0), 2), unit, 100, False, stamp
+        if alert is not None:
+            self._record_alert(plant_index, alert, None)
+
+    def _record_alert(self, plant_index, alert, resolved_at):
+        plant_id, rule_id, value, triggered_at = alert
+        sequence = self._alert_counts.get(plant_id, 0)
+        if sequence >= MAX_ALERTS_PER_PLANT:
+            return
+        self._alert_counts[plant_id] = sequence + 1
+        status = AlertStatusEnum.RESOLVED if resolved_at else AlertStatusEnum.ACTIVE
+        self.alerts.append((
+            self.layout.id_bases['alerts'] + plant_index * MAX_ALERTS_PER_PLANT + sequence + 1,
+            self.user_id, plant_id, rule_id, AlertSeverityEnum.WARNING.name, status.name,
+            f'Soil moisture {value}% is below {DRY_THRESHOLD}%', value, DRY_THRESHOLD,
+            triggered_at, resolved_at
+        ))
+
+
+_COLUMNS = {
+    'users': ('id', 'email', 'username', 'password_hash', 'is_active', 'is_verified'),
+    'plants': ('id', 'user_id', 'plant_type_id', 'plant_name', 'location', 'is_healthy'),
+    'devices': ('id', 'user_id', 'device_type_id', 'unique_identifier', 'device_name', 'is_active'),
+    'plant_device_assignments': ('id', 'plant_id', 'device_id', 'assignment_type', 'is_active'),
+    'alert_rules': ('id', 'user_id', 'plant_id', 'rule_name', 'rule_type', 'parameter_name',
+                    'condition_operator', 'threshold_value', 'severity', 'is_active'),
+    'sensor_data': ('device_id', 'measurement_value', 'measurement_unit', 'data_quality', 'is_anomaly', 'timestamp'),
+    'alerts': ('id', 'user_id', 'plant_id', 'rule_id', 'severity', 'status', 'message',
+               'triggered_value', 'threshold_value', 'triggered_at', 'resolved_at'),
+}
+
+
+def _write(cur, sqlite: bool, table: str, rows, chunk_rows: int = 10000):
+    columns = _COLUMNS[table]
+    if not sqlite:
+        if table == 'sensor_data':
+            # The hot path: no NULLs, a fixed layout, so skip the generic per-value formatting
+            lines = (f"{d}\t{v}\t{u}\t{q}\t{'t' if a else 'f'}\t{ts}\n" for d, v, u, q, a, ts in rows)
+        else:
+            lines = ('\t'.join(map(_copy_value, row)) + '\n' for row in rows)
+        cur.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN", _CopyStream(lines))
+        return
+    # SQLite has no COPY: chunked executemany inside the caller's transaction
+    query = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})"
+    rows = iter(rows)
+    while True:
+        chunk = list(itertools.islice(rows, chunk_rows))
+        if not chunk:
+            break
+        cur.executemany(query, chunk)
+
+
+def seed_user_range(db, config: SeedConfig, layout: SeedLayout, start: int, stop: int):
+    """Generate and load users [start, stop); one transaction per user. Returns (users, readings)."""
+    grid = _time_grid(config, db.is_sqlite)
+    readings = 0
+    for index in range(start, stop):
+        generator = _UserGenerator(config, layout, grid, index)
+        fleet = generator.fleet()
+        with db.connect_to_db() as (cur, conn):
+            for table in ('users', 'plants', 'devices', 'plant_device_assignments', 'alert_rules'):
+                _write(cur, db.is_sqlite, table, fleet[table])
+            _write(cur, db.is_sqlite, 'sensor_data', generator.readings())
+            _write(cur, db.is_sqlite, 'alerts', generator.alerts)
+        readings += len(fleet['devices']) * config.readings_per_device
+    return stop - start, readings
+
+
+def _seed_worker(database_url, config, layout, start, stop):
+    from db.db_utils import DBInterface
+
+    logging.getLogger('db.db_utils').setLevel(logging.WARNING)
+    db = DBInterface(database_url)
+    try:
+        return seed_user_range(db, config, layout, start, stop)
+    finally:
+        db.close()
+
+
+def prepare_layout(db) -> SeedLayout:
+    """Create the shared reference rows if missing and read the current id high-water marks."""
+    session = db.get_session()
+    try:
+        manufacturer = session.query(Manufacturer).filter_by(name='Synthetic Sensors').first()
+        if manufacturer is None:
+            manufacturer = Manufacturer(name='Synthetic Sensors', description='Generated test fleet')
+            session.add(manufacturer)
+            session.flush()
+        device_type_ids = []
+        for parameter, unit, name in SENSOR_KINDS:
+            device_type = session.query(DeviceType).filter_by(manufacturer_id=manufacturer.id, name=name).first()
+            if device_type is None:
+                device_type = DeviceType(manufacturer_id=manufacturer.id, name=name,
+                                         device_type=DeviceTypeEnum.SENSOR, data_unit=unit,
+                                         supported_functions=f'read_{parameter}')
+                session.add(device_type)
+                session.flush()
+            device_type_ids.append(device_type.id)
+        plant_type_ids = []
+        for name, temperature, humidity, light, water_days in PLANT_TYPES:
+            plant_type = session.query(PlantType).filter_by(name=name).first()
+            if plant_type is None:
+                plant_type = PlantType(name=name, optimal_temperature=temperature, optimal_humidity=humidity,
+                                       optimal_light=light, water_frequency_days=water_days)
+                session.add(plant_type)
+                session.flush()
+            plant_type_ids.append(plant_type.id)
+        session.commit()
+        id_bases = {
+            table: session.execute(text(f"SELECT COALESCE(MAX(id), 0) FROM {table}")).scalar()
+            for table in _ID_TABLES
+        }
+    finally:
+        session.close()
+    return SeedLayout(id_bases, tuple(plant_type_ids), tuple(device_type_ids))
+
+
+def _create_sensor_indexes(db):
+    with db.engine.begin() as conn:
+        for index in SensorData.__table__.indexes:
+            index.create(conn, checkfirst=True)
+
+
+def _finish(db):
+    with db.engine.begin() as conn:
+        if not db.is_sqlite:
+            # Explicit ids bypassed the sequences
+            for table in _ID_TABLES:
+                conn.execute(text(
+                    f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                    f"GREATEST((SELECT COALESCE(MAX(id), 0) FROM {table}), 1))"
+                ))
+        conn.execute(text("ANALYZE"))
+
+
+def seed_synthetic(db, config: SeedConfig, workers: int = 1, defer_indexes: bool = False, progress=print):
+    """
+    Load config.users synthetic users with plants, devices and config.days of
+    readings every config.interval_seconds. Rows are streamed with COPY
+    (chunked executemany on SQLite), one transaction per user; with workers > 1
+    user ranges are loaded by separate processes (PostgreSQL only).
+    'defer_indexes' drops the sensor_data indexes during the load and rebuilds them after,
+    also when the load fails.
+    """
+    if config.end is None:
+        # Fixed here so every worker builds the same time grid
+        config = replace(config, end=datetime.now(timezone.utc).replace(second=0, microsecond=0))
+    db.init_db()
+    layout = prepare_layout(db)
+    if db.is_sqlite:
+        workers = 1
+    if defer_indexes:
+        with db.engine.begin() as conn:
+            for index in SensorData.__table__.indexes:
+                index.drop(conn, checkfirst=True)
+
+    started = time.perf_counter()
+    done_users = done_readings = 0
+    batch = max(1, min(50, config.users // (workers * 4) or 1))
+    ranges = [(start, min(start + batch, config.users)) for start in range(0, config.users, batch)]
+
+    def report(users, readings):
+        nonlocal done_users, done_readings
+        done_users += users
+        done_readings += readings
+        elapsed = time.perf_counter() - started
+        progress(f"  {done_users}/{config.users} users, {done_readings:,} readings, "
+                 f"{done_readings / elapsed:,.0f} readings/s")
+
+    try:
+        if workers == 1:
+            for start, stop in ranges:
+                report(*seed_user_range(db, config, layout, start, stop))
+        else:
+            database_url = db.get_database_url()
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = [pool.submit(_seed_worker, database_url, config, layout, start, stop)
+                           for start, stop in ranges]
+                for future in as_completed(futures):
+                    report(*future.result())
+        loaded = time.perf_counter() - started
+    finally:
+        if defer_indexes:
+            _create_sensor_indexes(db)
+    _finish(db)
+    return {
+        'users': done_users,
+        'plants': done_users * config.plants_per_user,
+        'devices': done_users * config.plants_per_user * len(SENSOR_KINDS),
+        'readings': done_readings,
+        'load_seconds': round(loaded, 1),
+        'total_seconds': round(time.perf_counter() - started, 1),
+        'readings_per_second': round(done_readings / loaded) if loaded else None,
+    }
@@ -20,6 +20,7 @@ class User(Base):
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), 
                        onupdate=func.now(), nullable=False)
     last_login = Column(DateTime(timezone=True))
+    unresolved_alert_count = Column(Integer, default=0, server_default='0', nullable=False)
 
     devices = relationship('Device', back_populates='owner', cascade='all, delete-orphan')
     plants = relationship('Plant', back_populates='owner', cascade='all, delete-orphan')